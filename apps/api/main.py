@@ -1,28 +1,47 @@
 from __future__ import annotations
 
+import functools
 import json
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 from pathlib import Path
-from typing import Any, cast
-
-from fastapi import FastAPI, HTTPException
-
-from apps.api.models import DatasetSummary
+from typing import Annotated, Any, cast
+
+from exporters.fhir_index import (
+    FhirIndex,
+    load_fhir_index,
+    patient_everything,
+    patient_resource,
+    search_observations,
+)
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+from apps.api.models import BuildRequest, DatasetSummary
+from hdb.catalog import latest_catalog_entries, latest_manifest_entry, poll_states
+from hdb.jobs import JOB_CANCELLED, cancel_job, enqueue_build, get_job, list_jobs
 from hdb.registry import load_registry
 from hdb.settings import get_settings
 
-app = FastAPI(title="health-dataset-builder API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    settings = get_settings()
+    app.state.build_pool = None
+    if settings.build_workers > 0:
+        from pipelines.worker import BuildWorkerPool
+
+        app.state.build_pool = BuildWorkerPool(settings.queue_path, settings.build_workers)
+        app.state.build_pool.start()
+    try:
+        yield
+    finally:
+        if app.state.build_pool is not None:
+            app.state.build_pool.stop()
 
 
-def _latest_manifest_path(dataset_id: str, manifest_root: Path) -> Path | None:
-    dataset_dir = manifest_root / dataset_id
-    if not dataset_dir.exists():
-        return None
-    candidates = sorted([item for item in dataset_dir.iterdir() if item.is_dir()], reverse=True)
-    for candidate in candidates:
-        manifest = candidate / "manifest.json"
-        if manifest.exists():
-            return manifest
-    return None
+app = FastAPI(title="health-dataset-builder API", version="0.1.0", lifespan=lifespan)
 
 
 @app.get("/health")
@@ -47,13 +66,67 @@ def tb_datasets() -> list[DatasetSummary]:
     return [item for item in datasets() if item.id.startswith("tb_")]
 
 
+@app.get("/datasets/polling")
+def polling() -> list[dict[str, Any]]:
+    return [asdict(state) for state in poll_states(get_settings().catalog_path)]
+
+
+@app.get("/datasets/{dataset_id}/polling")
+def dataset_polling(dataset_id: str) -> dict[str, Any]:
+    states = poll_states(get_settings().catalog_path, dataset_id)
+    if not states:
+        raise HTTPException(status_code=404, detail="No polling history")
+    return asdict(states[0])
+
+
+@app.post("/datasets/{dataset_id}/builds", status_code=202)
+def enqueue_dataset_build(
+    dataset_id: str, request: Request, body: BuildRequest | None = None
+) -> dict[str, Any]:
+    settings = get_settings()
+    if dataset_id not in load_registry(settings.registry_path).dataset_map():
+        raise HTTPException(status_code=404, detail="Unknown dataset_id")
+    job, created = enqueue_build(
+        settings.queue_path, dataset_id, full_refresh=body is not None and body.full_refresh
+    )
+    pool = getattr(request.app.state, "build_pool", None)
+    if pool is not None:
+        pool.wake()
+    return {"job": asdict(job), "deduplicated": not created}
+
+
+@app.get("/builds")
+def builds(
+    status: str | None = None, dataset_id: str | None = None, limit: int = 100
+) -> list[dict[str, Any]]:
+    jobs = list_jobs(get_settings().queue_path, status=status, dataset_id=dataset_id, limit=limit)
+    return [asdict(job) for job in jobs]
+
+
+@app.get("/builds/{job_id}")
+def build_status(job_id: int) -> dict[str, Any]:
+    job = get_job(get_settings().queue_path, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown build job")
+    return asdict(job)
+
+
+@app.post("/builds/{job_id}/cancel")
+def cancel_build(job_id: int) -> dict[str, Any]:
+    job = cancel_job(get_settings().queue_path, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown build job")
+    if job.status != JOB_CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Build job is {job.status}")
+    return asdict(job)
+
+
 @app.get("/datasets/{dataset_id}/latest-manifest")
 def latest_manifest(dataset_id: str) -> dict[str, Any]:
-    settings = get_settings()
-    path = _latest_manifest_path(dataset_id, settings.manifest_dir)
-    if path is None:
+    entry = latest_manifest_entry(dataset_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="No manifest found")
-    payload = json.loads(path.read_text(encoding="utf-8"))
+    payload = json.loads(entry.manifest_path.read_text(encoding="utf-8"))
     return cast(dict[str, Any], payload)
 
 
@@ -86,4 +159,92 @@ def tb_forecast(dataset_id: str) -> dict[str, Any]:
         "dataset_id": dataset_id,
         "forecast": models.get("forecast"),
         "forecast_metrics": models.get("forecast_metrics"),
+        "selected_forecast": models.get("selected_forecast"),
+        "backtest_metrics": models.get("backtest_metrics"),
+    }
+
+
+FHIR_JSON = "application/fhir+json"
+FHIR_MAX_COUNT = 1000
+FhirCount = Annotated[int, Query(alias="_count", ge=1, le=FHIR_MAX_COUNT)]
+
+
+@functools.lru_cache(maxsize=64)
+def _dataset_fhir_index(dataset_id: str, timestamp: str, manifest_path: str) -> FhirIndex:
+    # Keyed by the catalog's latest run, so a new build is picked up and old indexes age out.
+    # Misses raise and are not cached, so an index exported later is found on the next call.
+    manifest = json.loads(Path(manifest_path).read_text(encoding="utf-8"))
+    index_dir = manifest.get("exporters", {}).get("fhir_index") or str(
+        Path(manifest["gold_outputs"][0]).parent / "fhir" / "index"
+    )
+    return load_fhir_index(Path(index_dir))
+
+
+def _fhir_indexes() -> list[FhirIndex]:
+    settings = get_settings()
+    latest = latest_catalog_entries(settings.catalog_path)
+    indexes: list[FhirIndex] = []
+    for dataset in load_registry(settings.registry_path).datasets:
+        entry = latest.get(dataset.id)
+        if entry is None:
+            continue
+        try:
+            indexes.append(
+                _dataset_fhir_index(dataset.id, entry.timestamp, str(entry.manifest_path))
+            )
+        except (FileNotFoundError, ValueError):
+            # No index, or one from an older format: run export-fhir for this dataset.
+            continue
+    return indexes
+
+
+def _searchset(resources: list[dict[str, Any]], total: int) -> JSONResponse:
+    bundle = {
+        "resourceType": "Bundle",
+        "type": "searchset",
+        "total": total,
+        "entry": [{"resource": resource} for resource in resources],
     }
+    return JSONResponse(bundle, media_type=FHIR_JSON)
+
+
+@app.get("/fhir/Patient/{patient_id}")
+def fhir_patient(patient_id: str) -> JSONResponse:
+    for index in _fhir_indexes():
+        resource = patient_resource(index, patient_id)
+        if resource is not None:
+            return JSONResponse(resource, media_type=FHIR_JSON)
+    raise HTTPException(status_code=404, detail="Unknown Patient")
+
+
+@app.get("/fhir/Patient/{patient_id}/$everything")
+def fhir_patient_everything(patient_id: str, count: FhirCount = FHIR_MAX_COUNT) -> JSONResponse:
+    for index in _fhir_indexes():
+        resources = patient_everything(index, patient_id)
+        if resources:
+            return _searchset(resources[:count], len(resources))
+    raise HTTPException(status_code=404, detail="Unknown Patient")
+
+
+@app.get("/fhir/Observation")
+def fhir_observations(
+    subject: str | None = None,
+    code: str | None = None,
+    date: Annotated[list[str] | None, Query()] = None,
+    count: FhirCount = 100,
+) -> JSONResponse:
+    # Searches must be anchored on an indexed parameter so no request scans a gold file.
+    if subject is None and code is None:
+        raise HTTPException(status_code=400, detail="subject or code is required")
+    resources: list[dict[str, Any]] = []
+    total = 0
+    try:
+        for index in _fhir_indexes():
+            found, matches = search_observations(
+                index, subject=subject, code=code, dates=date, count=count - len(resources)
+            )
+            resources.extend(found)
+            total += matches
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _searchset(resources, total)
@@ -8,3 +8,7 @@ class DatasetSummary(BaseModel):
     title: str
     description: str
     refresh_cron: str
+
+
+class BuildRequest(BaseModel):
+    full_refresh: bool = False
@@ -1,7 +1,8 @@
+from connectors.base import BaseConnector
 from connectors.http_file import HttpCsvConnector
 from connectors.local_file import LocalFileConnector
 
-CONNECTOR_REGISTRY = {
+CONNECTOR_REGISTRY: dict[str, type[BaseConnector]] = {
     "http_csv": HttpCsvConnector,
     "local_file": LocalFileConnector,
 }
@@ -3,6 +3,7 @@ from __future__ import annotations
 import hashlib
 import json
 import logging
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
@@ -12,10 +13,34 @@ from urllib.robotparser import RobotFileParser
 
 import requests
 from requests import Response
-from tenacity import retry, stop_after_attempt, wait_fixed
+from tenacity import RetryCallState, Retrying, retry_if_exception, stop_after_attempt
+
+from connectors.policy import (
+    BackoffWait,
+    RateLimitPolicy,
+    RetryAfterTooLong,
+    RetryPolicy,
+    host_bucket,
+    is_retryable,
+    retry_after_seconds,
+    should_retry,
+)
 
 LOGGER = logging.getLogger(__name__)
 
+PROBE_TIMEOUT_SECONDS = 10
+
+_SESSIONS = threading.local()
+
+
+def http_session() -> requests.Session:
+    # One pooled session per thread keeps connections warm across builds in long-lived workers.
+    session: requests.Session | None = getattr(_SESSIONS, "session", None)
+    if session is None:
+        session = requests.Session()
+        _SESSIONS.session = session
+    return session
+
 
 @dataclass(frozen=True)
 class FetchResult:
@@ -23,12 +48,37 @@ class FetchResult:
     source_url: str
     fetched_at: str
     not_modified: bool
+    fingerprint: str | None = None
+
+
+def http_fingerprint(etag: str | None, last_modified: str | None) -> str | None:
+    if etag:
+        return f"etag:{etag}"
+    if last_modified:
+        return f"last-modified:{last_modified}"
+    return None
+
+
+def stat_fingerprint(path: Path) -> str:
+    stat = path.stat()
+    return f"stat:{stat.st_size}:{stat.st_mtime_ns}"
 
 
 class ComplianceError(RuntimeError):
     pass
 
 
+def _log_retry(retry_state: RetryCallState) -> None:
+    exc = None if retry_state.outcome is None else retry_state.outcome.exception()
+    delay = None if retry_state.next_action is None else retry_state.next_action.sleep
+    LOGGER.warning(
+        "retrying request attempt=%s delay=%.2fs error=%s",
+        retry_state.attempt_number,
+        delay or 0.0,
+        exc,
+    )
+
+
 class BaseConnector(ABC):
     name: str = "base"
     description: str = ""
@@ -36,11 +86,20 @@ class BaseConnector(ABC):
     homepage_url: str = ""
     access_type: str = "file"
 
-    def __init__(self, cache_dir: Path, user_agent: str, timeout_seconds: int = 30) -> None:
+    def __init__(
+        self,
+        cache_dir: Path,
+        user_agent: str,
+        timeout_seconds: int = 30,
+        retry_policy: RetryPolicy | None = None,
+        rate_limit: RateLimitPolicy | None = None,
+    ) -> None:
         self.cache_dir = cache_dir
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.user_agent = user_agent
         self.timeout_seconds = timeout_seconds
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limit = rate_limit
 
     @abstractmethod
     def fetch(
@@ -48,6 +107,16 @@ class BaseConnector(ABC):
     ) -> FetchResult:
         raise NotImplementedError
 
+    def probe(self, params: dict[str, Any]) -> str | None:
+        # A cheap fingerprint of the source, comparable with FetchResult.fingerprint.
+        # None means the source cannot be probed and a build should go ahead.
+        return None
+
+    def check_health(self, params: dict[str, Any]) -> None:
+        # Raises when the source is clearly down; used as the half-open circuit breaker probe.
+        # Connectors that cannot check cheaply pass, and the trial build decides.
+        _ = params
+
     def _cache_prefix(self, url: str) -> str:
         return hashlib.sha256(url.encode("utf-8")).hexdigest()
 
@@ -65,12 +134,36 @@ class BaseConnector(ABC):
                 headers["If-Modified-Since"] = modified
         return headers, metadata_path
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    def _get(self, url: str, headers: dict[str, str]) -> Response:
-        response = requests.get(url, headers=headers, timeout=self.timeout_seconds)
+    def _send(self, method: str, url: str, headers: dict[str, str], timeout: float) -> Response:
+        if self.rate_limit is not None:
+            host_bucket(urlparse(url).netloc.lower(), self.rate_limit).acquire()
+        response = http_session().request(
+            method, url, headers=headers, timeout=timeout, allow_redirects=True
+        )
         response.raise_for_status()
         return response
 
+    def _get(self, url: str, headers: dict[str, str]) -> Response:
+        retrying = Retrying(
+            stop=stop_after_attempt(self.retry_policy.max_attempts),
+            wait=BackoffWait(self.retry_policy),
+            retry=retry_if_exception(lambda exc: should_retry(exc, self.retry_policy)),
+            before_sleep=_log_retry,
+            reraise=True,
+        )
+        try:
+            return retrying(self._send, "GET", url, headers, self.timeout_seconds)
+        except requests.HTTPError as exc:
+            retry_after = retry_after_seconds(exc)
+            limit = self.retry_policy.max_retry_after_seconds
+            if is_retryable(exc) and retry_after is not None and retry_after > limit:
+                raise RetryAfterTooLong(exc, retry_after, limit) from exc
+            raise
+
+    def _head(self, url: str, headers: dict[str, str]) -> Response:
+        # Probes are cheap hints: rate limited like fetches, but never retried.
+        return self._send("HEAD", url, headers, min(self.timeout_seconds, PROBE_TIMEOUT_SECONDS))
+
     def _check_html_compliance(self, url: str, html_allowlist: list[str]) -> None:
         domain = urlparse(url).netloc.lower()
         if domain not in html_allowlist:
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import logging
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
 
-from connectors.base import BaseConnector, ComplianceError, FetchResult
+import requests
+
+from connectors.base import BaseConnector, ComplianceError, FetchResult, http_fingerprint
+from connectors.policy import is_retryable
+
+LOGGER = logging.getLogger(__name__)
 
 
 class HttpCsvConnector(BaseConnector):
@@ -14,6 +20,27 @@ class HttpCsvConnector(BaseConnector):
     homepage_url = "https://github.com"
     access_type = "file"
 
+    def probe(self, params: dict[str, Any]) -> str | None:
+        if str(params.get("access_type", self.access_type)) == "html":
+            return None
+        url = str(params["url"])
+        try:
+            response = self._head(url=url, headers={"User-Agent": self.user_agent})
+        except requests.RequestException as exc:
+            LOGGER.warning("source probe failed for %s: %s", url, exc)
+            return None
+        return http_fingerprint(response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+    def check_health(self, params: dict[str, Any]) -> None:
+        if str(params.get("access_type", self.access_type)) == "html":
+            return
+        try:
+            self._head(url=str(params["url"]), headers={"User-Agent": self.user_agent})
+        except requests.HTTPError as exc:
+            # A server answering 403/405 to HEAD is up; only transient statuses count as down.
+            if is_retryable(exc):
+                raise
+
     def fetch(
         self, params: dict[str, Any], run_dir: Path, html_allowlist: list[str]
     ) -> FetchResult:
@@ -39,6 +66,9 @@ class HttpCsvConnector(BaseConnector):
                 source_url=url,
                 fetched_at=datetime.now(UTC).isoformat(),
                 not_modified=True,
+                fingerprint=http_fingerprint(
+                    headers.get("If-None-Match"), headers.get("If-Modified-Since")
+                ),
             )
 
         content_type = response.headers.get("Content-Type", "")
@@ -60,4 +90,7 @@ class HttpCsvConnector(BaseConnector):
             source_url=url,
             fetched_at=datetime.now(UTC).isoformat(),
             not_modified=False,
+            fingerprint=http_fingerprint(
+                response.headers.get("ETag"), response.headers.get("Last-Modified")
+            ),
         )
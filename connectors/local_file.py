@@ -4,7 +4,7 @@ from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
 
-from connectors.base import BaseConnector, ComplianceError, FetchResult
+from connectors.base import BaseConnector, ComplianceError, FetchResult, stat_fingerprint
 
 
 class LocalFileConnector(BaseConnector):
@@ -14,6 +14,17 @@ class LocalFileConnector(BaseConnector):
     homepage_url = "local"
     access_type = "file"
 
+    def probe(self, params: dict[str, Any]) -> str | None:
+        source_path = Path(str(params["path"]))
+        if not source_path.exists():
+            return None
+        return stat_fingerprint(source_path)
+
+    def check_health(self, params: dict[str, Any]) -> None:
+        source_path = Path(str(params["path"]))
+        if not source_path.exists():
+            raise ComplianceError(f"local source path does not exist: {source_path}")
+
     def fetch(
         self, params: dict[str, Any], run_dir: Path, html_allowlist: list[str]
     ) -> FetchResult:
@@ -21,6 +32,7 @@ class LocalFileConnector(BaseConnector):
         source_path = Path(str(params["path"]))
         if not source_path.exists():
             raise ComplianceError(f"local source path does not exist: {source_path}")
+        fingerprint = stat_fingerprint(source_path)
         run_dir.mkdir(parents=True, exist_ok=True)
         output_path = run_dir / source_path.name
         output_path.write_bytes(source_path.read_bytes())
@@ -29,5 +41,5 @@ class LocalFileConnector(BaseConnector):
             source_url=str(source_path),
             fetched_at=datetime.now(UTC).isoformat(),
             not_modified=False,
+            fingerprint=fingerprint,
         )
-
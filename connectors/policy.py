@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import requests
+from pydantic import BaseModel, Field
+from tenacity import RetryCallState
+from tenacity.wait import wait_base
+
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class RetryPolicy(BaseModel):
+    max_attempts: int = Field(default=4, ge=1)
+    base_delay_seconds: float = Field(default=1.0, ge=0)
+    max_delay_seconds: float = Field(default=60.0, ge=0)
+    jitter: float = Field(default=1.0, ge=0, le=1)
+    # Retry-After is honored exactly up to this long; a longer request ends the retries.
+    max_retry_after_seconds: float = Field(default=300.0, ge=0)
+
+    @classmethod
+    def from_params(cls, params: dict[str, Any]) -> RetryPolicy:
+        return cls.model_validate(params.get("retry") or {})
+
+
+class RateLimitPolicy(BaseModel):
+    requests_per_second: float = Field(gt=0)
+    burst: int = Field(default=1, ge=1)
+
+    @classmethod
+    def from_params(cls, params: dict[str, Any]) -> RateLimitPolicy | None:
+        config = params.get("rate_limit")
+        return None if config is None else cls.model_validate(config)
+
+
+def is_retryable(exc: BaseException | None) -> bool:
+    if isinstance(exc, requests.ConnectionError | requests.Timeout):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+class RetryAfterTooLong(requests.HTTPError):
+    def __init__(self, error: requests.HTTPError, retry_after: float, limit: float) -> None:
+        super().__init__(
+            f"server asked to retry after {retry_after:.0f}s, over the {limit:.0f}s limit",
+            response=error.response,
+            request=error.request,
+        )
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(exc: BaseException | None, now: datetime | None = None) -> float | None:
+    if not isinstance(exc, requests.HTTPError) or exc.response is None:
+        return None
+    value = exc.response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max((retry_at - (now or datetime.now(UTC))).total_seconds(), 0.0)
+
+
+def should_retry(exc: BaseException | None, policy: RetryPolicy) -> bool:
+    if not is_retryable(exc):
+        return False
+    retry_after = retry_after_seconds(exc)
+    return retry_after is None or retry_after <= policy.max_retry_after_seconds
+
+
+class BackoffWait(wait_base):
+    def __init__(self, policy: RetryPolicy, rng: Callable[[], float] = random.random) -> None:
+        self.policy = policy
+        self.rng = rng
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        exc = None if retry_state.outcome is None else retry_state.outcome.exception()
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            return min(retry_after, self.policy.max_retry_after_seconds)
+        ceiling = min(
+            self.policy.max_delay_seconds,
+            self.policy.base_delay_seconds * 2.0 ** (retry_state.attempt_number - 1),
+        )
+        return ceiling * (1 - self.policy.jitter) + ceiling * self.policy.jitter * self.rng()
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, capacity: int) -> None:
+        with self._lock:
+            self.rate = rate
+            self.capacity = capacity
+            self._tokens = min(self._tokens, float(capacity))
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    float(self.capacity), self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+# Sources sharing a host share one bucket, paced to the strictest limit among the sources
+# currently configured for it (see configure_host_limits).
+_HOST_BUCKETS: dict[str, TokenBucket] = {}
+_HOST_LIMITS: dict[str, RateLimitPolicy] = {}
+_HOST_BUCKETS_LOCK = threading.Lock()
+
+
+def configure_host_limits(sources: Iterable[tuple[str, RateLimitPolicy]]) -> None:
+    # Recomputed from the full current set of (host, policy) pairs, so a limit that is loosened
+    # or removed takes effect too. Cheap when nothing changed.
+    limits: dict[str, RateLimitPolicy] = {}
+    for host, policy in sources:
+        current = limits.get(host)
+        limits[host] = (
+            policy
+            if current is None
+            else RateLimitPolicy(
+                requests_per_second=min(current.requests_per_second, policy.requests_per_second),
+                burst=min(current.burst, policy.burst),
+            )
+        )
+    with _HOST_BUCKETS_LOCK:
+        if limits == _HOST_LIMITS:
+            return
+        _HOST_LIMITS.clear()
+        _HOST_LIMITS.update(limits)
+        for host in list(_HOST_BUCKETS):
+            if host in limits:
+                _HOST_BUCKETS[host].configure(limits[host].requests_per_second, limits[host].burst)
+            else:
+                del _HOST_BUCKETS[host]
+
+
+def host_bucket(host: str, policy: RateLimitPolicy) -> TokenBucket:
+    # A host missing from the configured limits paces to the calling source's own policy.
+    with _HOST_BUCKETS_LOCK:
+        effective = _HOST_LIMITS.get(host, policy)
+        bucket = _HOST_BUCKETS.get(host)
+        if bucket is None:
+            bucket = TokenBucket(effective.requests_per_second, effective.burst)
+            _HOST_BUCKETS[host] = bucket
+            return bucket
+    if (bucket.rate, bucket.capacity) != (effective.requests_per_second, effective.burst):
+        bucket.configure(effective.requests_per_second, effective.burst)
+    return bucket
@@ -1,48 +1,175 @@
 from __future__ import annotations
 
 import json
+import multiprocessing
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa  # type: ignore[import-untyped]
+import pyarrow.compute as pc  # type: ignore[import-untyped]
 
+from exporters.fhir_bulk import (
+    BULK_WORKERS,
+    SOURCE_COLUMNS,
+    condition_lines,
+    join_text,
+    observation_lines,
+    patient_lines,
+    quoted_ids,
+)
+from exporters.omop import BATCH_ROWS
+from hdb.manifest import HashingWriter
 
-def export_fhir_bundle(df: pd.DataFrame, output_dir: Path, dataset_id: str) -> Path:
+# Transaction Bundles sized for FHIR servers' request limits. Each page carries the Patients
+# its Observations and Conditions reference, so pages can be posted in any order or in parallel.
+MAX_BUNDLE_ENTRIES = 1000
+MAX_BUNDLE_BYTES = 4 * 1024 * 1024
+BUNDLE_PREFIX = "fhir_bundle"
+# Room kept below MAX_BUNDLE_BYTES for the envelope and the paging links.
+_ENVELOPE_BYTES = 1024
+_HEADER = '{"resourceType":"Bundle","type":"transaction","entry":['
+
+
+def _entries(resources: pa.Array, resource_type: str, ids: pa.Array) -> pa.Array:
+    # resources are NDJSON lines; drop the newline and wrap each one as a PUT entry.
+    bodies = pc.utf8_slice_codeunits(resources, 0, -1)
+    return join_text(
+        '{"resource":',
+        bodies,
+        ',"request":{"method":"PUT","url":',
+        quoted_ids(ids, f"{resource_type}/"),
+        "}}",
+    )
+
+
+def _row_entries(table: pa.Table) -> tuple[list[str], list[str], list[str], list[str]]:
+    # Per row: patient id, Patient entry, Observation entry and Condition entry ("" if none).
+    patients = table.select(["patient_id", "sex"])
+    patient_ids = patients["patient_id"].combine_chunks()
+    has_condition = pc.fill_null(pc.not_equal(table["condition_code"], ""), False)
+    conditions = pa.array([""] * table.num_rows, type=pa.large_string())
+    if pc.any(has_condition).as_py():
+        condition_rows = table.filter(has_condition)
+        positions = pc.indices_nonzero(has_condition)
+        entries = _entries(
+            condition_lines(condition_rows), "Condition", condition_rows["record_id"]
+        ).to_pylist()
+        values = conditions.to_pylist()
+        for position, entry in zip(positions.to_pylist(), entries, strict=True):
+            values[position] = entry
+        conditions = pa.array(values, type=pa.large_string())
+    return (
+        pc.fill_null(patient_ids.cast(pa.large_string()), "").to_pylist(),
+        _entries(patient_lines(patients), "Patient", patient_ids).to_pylist(),
+        _entries(observation_lines(table), "Observation", table["record_id"]).to_pylist(),
+        conditions.to_pylist(),
+    )
+
+
+def _size(entries: list[str]) -> int:
+    return sum(len(entry.encode("utf-8")) + 1 for entry in entries)
+
+
+def _write_part(path: Path, entries: list[str]) -> None:
+    # Only the entries: the envelope and links are added once the page count is known.
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write(",".join(entries))
+
+
+def _page_rows(
+    table: pa.Table, output_dir: Path, stem: str, max_entries: int, max_bytes: int
+) -> list[Path]:
+    pages: list[Path] = []
+    entries: list[str] = []
+    patients: set[str] = set()
+    size = 0
+
+    def flush() -> None:
+        nonlocal size
+        if entries:
+            path = output_dir / f".{stem}-{len(pages):05d}.part"
+            _write_part(path, entries)
+            pages.append(path)
+        entries.clear()
+        patients.clear()
+        size = 0
+
+    budget = max_bytes - len(_HEADER) - _ENVELOPE_BYTES
+    for start in range(0, table.num_rows, BATCH_ROWS):
+        rows = _row_entries(table.slice(start, BATCH_ROWS))
+        for patient_id, patient, observation, condition in zip(*rows, strict=True):
+            resources = [observation, condition] if condition else [observation]
+            row = resources if patient_id in patients else [patient, *resources]
+            row_bytes = _size(row)
+            if entries and (len(entries) + len(row) > max_entries or size + row_bytes > budget):
+                flush()
+                row = [patient, *resources]
+                row_bytes = _size(row)
+            patients.add(patient_id)
+            entries.extend(row)
+            size += row_bytes
+    flush()
+    return pages
+
+
+def _finish_page(part: Path, target: Path, dataset_id: str, links: dict[str, str]) -> None:
+    # One hashed pass per page, so the manifest never rereads it; the page replaces any
+    # published page of the same name atomically.
+    tail = {
+        "id": f"{dataset_id}-{target.stem.rsplit('-', 1)[-1]}",
+        "link": [{"relation": relation, "url": url} for relation, url in links.items()],
+    }
+    with HashingWriter(target) as writer, part.open("rb") as source:
+        writer.write(_HEADER.encode("utf-8"))
+        shutil.copyfileobj(source, writer)
+        writer.write(f"],{json.dumps(tail, separators=(',', ':'))[1:]}".encode())
+
+
+def export_fhir_bundle(
+    df: pd.DataFrame,
+    output_dir: Path,
+    dataset_id: str,
+    max_entries: int = MAX_BUNDLE_ENTRIES,
+    max_bytes: int = MAX_BUNDLE_BYTES,
+    workers: int = BULK_WORKERS,
+    task_rows: int = 4 * BATCH_ROWS,
+) -> list[Path]:
     output_dir.mkdir(parents=True, exist_ok=True)
-    entries: list[dict[str, object]] = []
-    seen_patients: set[str] = set()
-    for row in df.head(200).to_dict(orient="records"):
-        patient_id = str(row["patient_id"])
-        event_time = pd.Timestamp(str(row["event_date"])).isoformat()
-        value = float(row["observation_value_num"])
-        observation_code = str(row["observation_code"])
-        observation_unit = str(row["observation_unit"])
-        if patient_id not in seen_patients:
-            seen_patients.add(patient_id)
-            entries.append(
-                {
-                    "resource": {
-                        "resourceType": "Patient",
-                        "id": patient_id,
-                        "identifier": [{"system": "urn:dataset", "value": patient_id}],
-                    }
-                }
-            )
-        entries.append(
-            {
-                "resource": {
-                    "resourceType": "Observation",
-                    "status": "final",
-                    "subject": {"reference": f"Patient/{patient_id}"},
-                    "code": {"text": observation_code},
-                    "effectiveDateTime": event_time,
-                    "valueQuantity": {
-                        "value": value,
-                        "unit": observation_unit,
-                    },
-                }
-            }
-        )
-    bundle = {"resourceType": "Bundle", "type": "collection", "id": dataset_id, "entry": entries}
-    output_path = output_dir / "fhir_bundle.json"
-    output_path.write_text(json.dumps(bundle, indent=2), encoding="utf-8")
-    return output_path
+    table = pa.Table.from_pandas(df[[*SOURCE_COLUMNS, "sex"]], preserve_index=False)
+    run = uuid.uuid4().hex[:8]
+    tasks = [
+        (table.slice(start, task_rows), output_dir, f"{run}-{index:04d}", max_entries, max_bytes)
+        for index, start in enumerate(range(0, max(table.num_rows, 1), task_rows))
+    ]
+    try:
+        if workers <= 1 or len(tasks) <= 1:
+            parts = [_page_rows(*task) for task in tasks]
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(tasks)), mp_context=context
+            ) as pool:
+                parts = list(pool.map(_page_rows, *zip(*tasks, strict=True)))
+        ordered = [part for task_parts in parts for part in task_parts]
+        if not ordered:
+            ordered = [output_dir / f".{run}-empty.part"]
+            _write_part(ordered[0], [])
+        names = [f"{BUNDLE_PREFIX}-{page:05d}.json" for page in range(1, len(ordered) + 1)]
+        for index, part in enumerate(ordered):
+            links = {"self": names[index], "first": names[0], "last": names[-1]}
+            if index > 0:
+                links["previous"] = names[index - 1]
+            if index + 1 < len(names):
+                links["next"] = names[index + 1]
+            _finish_page(part, output_dir / names[index], dataset_id, links)
+    finally:
+        for part in output_dir.glob(f".{run}-*.part"):
+            part.unlink(missing_ok=True)
+    # Pages of an earlier, longer export go only after every new page is in place.
+    for stale in output_dir.glob(f"{BUNDLE_PREFIX}*.json"):
+        if stale.name not in names:
+            stale.unlink()
+    return [output_dir / name for name in names]
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import gzip
+import json
+import multiprocessing
+import shutil
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pyarrow as pa  # type: ignore[import-untyped]
+import pyarrow.compute as pc  # type: ignore[import-untyped]
+import pyarrow.parquet as pq  # type: ignore[import-untyped]
+
+from exporters.omop import BATCH_ROWS
+from hdb.manifest import HashingWriter, write_text_hashed
+
+# FHIR Bulk Data ($export) style output: one resource per line, split into parts of at most
+# MAX_FILE_BYTES uncompressed, described by an export manifest.
+MAX_FILE_BYTES = 128 * 1024 * 1024
+BULK_WORKERS = 4
+MANIFEST_NAME = "manifest.json"
+SOURCE_COLUMNS = [
+    "record_id",
+    "patient_id",
+    "condition_code",
+    "condition_code_system",
+    "observation_code",
+    "observation_code_system",
+    "observation_value_num",
+    "observation_unit",
+    "event_date",
+]
+CODE_SYSTEM_URIS = {
+    "ICD-10": "http://hl7.org/fhir/sid/icd-10",
+    "ICD-10-CM": "http://hl7.org/fhir/sid/icd-10-cm",
+    "LOINC": "http://loinc.org",
+    "SNOMED-CT": "http://snomed.info/sct",
+}
+FHIR_GENDERS = {"male", "female", "other", "unknown"}
+
+
+def code_system_uri(system: str) -> str:
+    return CODE_SYSTEM_URIS.get(system, f"urn:hdb:code-system:{system or 'unknown'}")
+
+
+def _text(values: pa.Array | pa.ChunkedArray) -> pa.Array:
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    return pc.fill_null(values.cast(pa.large_string()), "")
+
+
+def json_values(values: pa.Array, encode: Any = json.dumps) -> pa.Array:
+    # For low-cardinality columns (codes, systems, units, sex): encoding each distinct value
+    # once keeps serialization out of a per-row Python loop. Ids go through quoted_ids.
+    encoded = _text(values).dictionary_encode()
+    distinct = [encode(value) for value in encoded.dictionary.to_pylist()]
+    return pa.array(distinct, type=pa.large_string()).take(encoded.indices)
+
+
+def quoted_ids(values: pa.Array, prefix: str = "") -> pa.Array:
+    # Canonical ids are hex digests and need no escaping, so they are quoted with one string
+    # kernel instead of a json.dumps per row; anything that would need escaping goes the slow way.
+    text = _text(values)
+    if pc.any(pc.match_substring_regex(text, r'[^\x20-\x7e]|["\\]')).as_py():
+        return json_values(text, lambda value: json.dumps(f"{prefix}{value}"))
+    return join_text(f'"{prefix}', text, '"')
+
+
+def join_text(*parts: pa.Array | str) -> pa.Array:
+    arrays = [
+        pa.scalar(part, pa.large_string()) if isinstance(part, str) else part for part in parts
+    ]
+    return pc.binary_join_element_wise(*arrays, pa.scalar("", pa.large_string()))
+
+
+def _optional(present: pa.Array, fragment: pa.Array) -> pa.Array:
+    return pc.if_else(present, fragment, pa.scalar("", pa.large_string()))
+
+
+def _dates(values: pa.Array | pa.ChunkedArray) -> tuple[pa.Array, pa.Array]:
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    present = pc.is_valid(values)
+    text = pc.fill_null(pc.strftime(values, format="%Y-%m-%dT%H:%M:%S"), "")
+    return present, join_text('"', text.cast(pa.large_string()), '"')
+
+
+def _coding(systems: pa.Array, codes: pa.Array) -> pa.Array:
+    return join_text(
+        '"code":{"coding":[{"system":',
+        json_values(systems, lambda system: json.dumps(code_system_uri(system))),
+        ',"code":',
+        json_values(codes),
+        '}],"text":',
+        json_values(codes),
+        "}",
+    )
+
+
+def observation_lines(batch: pa.Table) -> pa.Array:
+    values = batch["observation_value_num"].combine_chunks().cast(pa.float64())
+    has_value = pc.fill_null(pc.is_finite(values), False)
+    numbers = pc.fill_null(values.cast(pa.large_string()), "")
+    has_date, dates = _dates(batch["event_date"])
+    return join_text(
+        '{"resourceType":"Observation","id":',
+        quoted_ids(batch["record_id"]),
+        ',"status":"final","subject":{"reference":',
+        quoted_ids(batch["patient_id"], "Patient/"),
+        "},",
+        _coding(batch["observation_code_system"], batch["observation_code"]),
+        _optional(has_date, join_text(',"effectiveDateTime":', dates)),
+        _optional(
+            has_value,
+            join_text(
+                ',"valueQuantity":{"value":',
+                numbers,
+                ',"unit":',
+                json_values(batch["observation_unit"]),
+                "}",
+            ),
+        ),
+        "}\n",
+    )
+
+
+def condition_lines(batch: pa.Table) -> pa.Array:
+    batch = batch.filter(pc.not_equal(_text(batch["condition_code"]), ""))
+    if batch.num_rows == 0:
+        return pa.array([], type=pa.large_string())
+    has_date, dates = _dates(batch["event_date"])
+    return join_text(
+        '{"resourceType":"Condition","id":',
+        quoted_ids(batch["record_id"]),
+        ',"subject":{"reference":',
+        quoted_ids(batch["patient_id"], "Patient/"),
+        "},",
+        _coding(batch["condition_code_system"], batch["condition_code"]),
+        _optional(has_date, join_text(',"onsetDateTime":', dates)),
+        "}\n",
+    )
+
+
+def patient_lines(patients: pa.Table) -> pa.Array:
+    return join_text(
+        '{"resourceType":"Patient","id":',
+        quoted_ids(patients["patient_id"]),
+        ',"identifier":[{"system":"urn:dataset","value":',
+        quoted_ids(patients["patient_id"]),
+        '}],"gender":',
+        json_values(
+            patients["sex"],
+            lambda sex: json.dumps(sex if sex in FHIR_GENDERS else "unknown"),
+        ),
+        "}\n",
+    )
+
+
+class _NdjsonParts:
+    # Appends whole lines to numbered part files, rolling over before a part would exceed
+    # max_bytes. Lines are copied straight out of the Arrow string buffer.
+    def __init__(
+        self, output_dir: Path, resource_type: str, stem: str, max_bytes: int, compress: bool
+    ) -> None:
+        self._output_dir = output_dir
+        self._resource_type = resource_type
+        self._stem = stem
+        self._max_bytes = max_bytes
+        self._compress = compress
+        self._outputs: list[dict[str, Any]] = []
+        self._writer: HashingWriter | None = None
+        self._stream: Any = None
+        self._size = 0
+        self._count = 0
+
+    def _open(self) -> None:
+        suffix = ".ndjson.gz" if self._compress else ".ndjson"
+        name = f"{self._resource_type}.{self._stem}-{len(self._outputs):03d}{suffix}"
+        self._writer = HashingWriter(self._output_dir / name)
+        self._stream = (
+            gzip.GzipFile(filename="", mode="wb", fileobj=self._writer, mtime=0, compresslevel=6)
+            if self._compress
+            else self._writer
+        )
+        self._outputs.append({"type": self._resource_type, "url": name, "count": 0})
+        self._size = 0
+        self._count = 0
+
+    def _finish(self) -> None:
+        if self._writer is None:
+            return
+        if self._compress:
+            self._stream.close()
+        self._writer.close()
+        self._outputs[-1]["count"] = self._count
+        self._outputs[-1]["sha256"] = self._writer.sha256
+        self._writer = None
+
+    def write(self, lines: pa.Array) -> None:
+        if len(lines) == 0:
+            return
+        offsets = np.frombuffer(lines.buffers()[1], dtype=np.int64)[
+            lines.offset : lines.offset + len(lines) + 1
+        ]
+        data = memoryview(lines.buffers()[2])
+        start = 0
+        while start < len(lines):
+            if self._writer is None:
+                self._open()
+            room = self._max_bytes - self._size + offsets[start]
+            end = int(np.searchsorted(offsets, room, side="right")) - 1
+            if end <= start:
+                if self._count:
+                    self._finish()
+                    continue
+                end = start + 1  # A single line larger than the cap gets a part of its own.
+            self._stream.write(data[offsets[start] : offsets[end]])
+            self._size += int(offsets[end] - offsets[start])
+            self._count += end - start
+            start = end
+
+    def close(self) -> list[dict[str, Any]]:
+        self._finish()
+        return self._outputs
+
+
+def _export_row_groups(
+    gold_path: Path,
+    row_groups: list[int],
+    output_dir: Path,
+    stem: str,
+    max_bytes: int,
+    compress: bool,
+) -> list[dict[str, Any]]:
+    parquet = pq.ParquetFile(gold_path)
+    observations = _NdjsonParts(output_dir, "Observation", stem, max_bytes, compress)
+    conditions = _NdjsonParts(output_dir, "Condition", stem, max_bytes, compress)
+    for batch in parquet.iter_batches(
+        batch_size=BATCH_ROWS, row_groups=row_groups, columns=SOURCE_COLUMNS
+    ):
+        table = pa.Table.from_batches([batch])
+        observations.write(observation_lines(table))
+        conditions.write(condition_lines(table))
+    return observations.close() + conditions.close()
+
+
+def _distinct_patients(parquet: pq.ParquetFile) -> Iterator[pa.Table]:
+    # First-seen sex wins, so each patient id appears exactly once across the export.
+    seen = pa.array([], type=pa.large_string())
+    for batch in parquet.iter_batches(batch_size=BATCH_ROWS, columns=["patient_id", "sex"]):
+        table = pa.Table.from_batches([batch])
+        patients = _text(table["patient_id"])
+        codes = patients.dictionary_encode().indices.to_numpy(zero_copy_only=False)
+        first = np.sort(np.unique(codes, return_index=True)[1])
+        keep = pa.array(first, type=pa.int64())
+        keep = keep.filter(pc.invert(pc.is_in(patients.take(keep), value_set=seen)))
+        if len(keep):
+            yield table.take(keep)
+            seen = pa.concat_arrays([seen, patients.take(keep)])
+
+
+def _row_group_tasks(row_groups: int, workers: int) -> list[list[int]]:
+    # Contiguous runs of row groups, a few per worker so uneven groups still balance.
+    tasks = max(1, min(row_groups, workers * 2))
+    return [chunk.tolist() for chunk in np.array_split(np.arange(row_groups), tasks) if len(chunk)]
+
+
+def export_fhir_bulk(
+    gold_path: Path,
+    output_dir: Path,
+    dataset_id: str,
+    workers: int = BULK_WORKERS,
+    compress: bool = False,
+    max_file_bytes: int = MAX_FILE_BYTES,
+) -> Path:
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+    parquet = pq.ParquetFile(gold_path)
+    tasks = _row_group_tasks(parquet.num_row_groups, workers)
+    outputs: list[dict[str, Any]] = []
+    args = [
+        (gold_path, row_groups, output_dir, f"{index:03d}", max_file_bytes, compress)
+        for index, row_groups in enumerate(tasks)
+    ]
+    patients = _NdjsonParts(output_dir, "Patient", "000", max_file_bytes, compress)
+    if workers <= 1 or len(tasks) <= 1:
+        for task in args:
+            outputs.extend(_export_row_groups(*task))
+        for table in _distinct_patients(parquet):
+            patients.write(patient_lines(table))
+    else:
+        # Spawned workers: the API and worker pools run threads, which fork does not copy safely.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as pool:
+            futures = [pool.submit(_export_row_groups, *task) for task in args]
+            for table in _distinct_patients(parquet):
+                patients.write(patient_lines(table))
+            for future in futures:
+                outputs.extend(future.result())
+    outputs.extend(patients.close())
+    manifest = {
+        "transactionTime": datetime.now(UTC).isoformat(),
+        "request": f"datasets/{dataset_id}/$export",
+        "requiresAccessToken": False,
+        "output": sorted(outputs, key=lambda item: (item["type"], item["url"])),
+        "error": [],
+    }
+    manifest_path = output_dir / MANIFEST_NAME
+    write_text_hashed(manifest_path, json.dumps(manifest, indent=2))
+    return manifest_path
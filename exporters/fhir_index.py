@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa  # type: ignore[import-untyped]
+import pyarrow.compute as pc  # type: ignore[import-untyped]
+import pyarrow.parquet as pq  # type: ignore[import-untyped]
+
+from exporters.fhir_bulk import SOURCE_COLUMNS, condition_lines, observation_lines, patient_lines
+from hdb.manifest import HashingWriter, write_text_hashed
+
+# Sidecar copies of the gold rows, clustered by patient and by observation code, so every read
+# is a contiguous (start, end) row range: patient hash -> range (memory-mapped, sorted) and
+# code -> range. Small row groups keep a range read close to the rows it returns.
+INDEX_FORMAT = 2
+INDEX_ROW_GROUP_ROWS = 4096
+CLUSTER_FILES = {"patient": "by_patient.parquet", "code": "by_code.parquet"}
+INDEX_FILES = {"patient_keys": "patient_keys.npy", "patient_ranges": "patient_ranges.npy"}
+CODES_FILE = "codes.json"
+META_FILE = "index.json"
+READ_COLUMNS = [*SOURCE_COLUMNS, "sex"]
+DATE_PREFIXES = ("eq", "ne", "gt", "ge", "lt", "le")
+
+
+def patient_keys(patient_ids: pa.Array | pa.ChunkedArray) -> np.ndarray:
+    values = pc.fill_null(patient_ids.cast(pa.large_string()), "")
+    keys: np.ndarray = pd.util.hash_array(values.to_numpy(zero_copy_only=False), categorize=False)
+    return keys
+
+
+def _clustered(table: pa.Table, column: str) -> tuple[pa.Table, pa.Array, np.ndarray]:
+    # Stable sort, so rows keep their gold order within a cluster. Returns the sorted table,
+    # each cluster's value and its (start, end) row range.
+    values = pc.fill_null(table[column].cast(pa.large_string()), "")
+    order = pc.sort_indices(values)
+    table = table.take(order)
+    ordered = values.take(order).combine_chunks()
+    codes = ordered.dictionary_encode().indices.to_numpy(zero_copy_only=False)
+    starts = np.concatenate([[0], np.flatnonzero(codes[1:] != codes[:-1]) + 1]).astype(np.int64)
+    ends = np.append(starts[1:], len(codes)).astype(np.int64)
+    if len(codes) == 0:
+        starts, ends = starts[:0], ends[:0]
+    return table, ordered.take(pa.array(starts)), np.stack([starts, ends], axis=1)
+
+
+def _write_cluster(path: Path, table: pa.Table, row_group_rows: int) -> None:
+    with HashingWriter(path) as writer:
+        pq.write_table(table, writer, row_group_size=row_group_rows)
+
+
+def build_fhir_index(
+    gold_path: Path, index_dir: Path, row_group_rows: int = INDEX_ROW_GROUP_ROWS
+) -> list[Path]:
+    index_dir.mkdir(parents=True, exist_ok=True)
+    table = pq.read_table(gold_path, columns=READ_COLUMNS)
+    paths: list[Path] = []
+
+    by_patient, patients, patient_ranges = _clustered(table, "patient_id")
+    paths.append(index_dir / CLUSTER_FILES["patient"])
+    _write_cluster(paths[-1], by_patient, row_group_rows)
+    keys = patient_keys(patients)
+    order = np.argsort(keys, kind="stable")
+    arrays = {
+        "patient_keys": keys[order].astype(np.uint64),
+        "patient_ranges": patient_ranges[order],
+    }
+    for name, array in arrays.items():
+        paths.append(index_dir / INDEX_FILES[name])
+        with HashingWriter(paths[-1]) as writer:
+            np.save(writer, array)
+
+    by_code, codes, code_ranges = _clustered(table, "observation_code")
+    paths.append(index_dir / CLUSTER_FILES["code"])
+    _write_cluster(paths[-1], by_code, row_group_rows)
+    ranges = {
+        code: [int(start), int(end)]
+        for code, (start, end) in zip(codes.to_pylist(), code_ranges, strict=True)
+        if code
+    }
+    paths.append(index_dir / CODES_FILE)
+    write_text_hashed(paths[-1], json.dumps(ranges, sort_keys=True))
+    meta = {"format": INDEX_FORMAT, "gold": gold_path.name, "rows": table.num_rows}
+    # Written last: an index without its meta file is treated as missing.
+    paths.append(index_dir / META_FILE)
+    write_text_hashed(paths[-1], json.dumps(meta, indent=2))
+    return paths
+
+
+def _row_group_offsets(path: Path) -> np.ndarray:
+    metadata = pq.ParquetFile(path).metadata
+    sizes = [metadata.row_group(index).num_rows for index in range(metadata.num_row_groups)]
+    return np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+
+
+@dataclass(frozen=True)
+class FhirIndex:
+    index_dir: Path
+    patient_keys: np.ndarray
+    patient_ranges: np.ndarray
+    code_ranges: dict[str, list[int]]
+    row_group_offsets: dict[str, np.ndarray]
+
+    def patient_range(self, patient_id: str) -> list[tuple[int, int]]:
+        # Usually one range; distinct patients whose ids share a hash each get their own.
+        key = patient_keys(pa.array([patient_id]))[0]
+        start = int(np.searchsorted(self.patient_keys, key, side="left"))
+        end = int(np.searchsorted(self.patient_keys, key, side="right"))
+        return [(int(low), int(high)) for low, high in self.patient_ranges[start:end]]
+
+    def code_range(self, code: str) -> tuple[int, int]:
+        start, end = self.code_ranges.get(code, [0, 0])
+        return start, end
+
+    def read_range(
+        self, cluster: str, start: int, end: int, columns: list[str] | None = None
+    ) -> Iterator[pa.Table]:
+        # Yields the range one row group at a time, so callers can stop once they have enough.
+        if start >= end:
+            return
+        parquet = pq.ParquetFile(self.index_dir / CLUSTER_FILES[cluster])
+        offsets = self.row_group_offsets[cluster]
+        first = int(np.searchsorted(offsets, start, side="right")) - 1
+        last = int(np.searchsorted(offsets, end, side="left"))
+        for group in range(first, last):
+            low = max(start - int(offsets[group]), 0)
+            high = min(end, int(offsets[group + 1])) - int(offsets[group])
+            table = parquet.read_row_group(group, columns=columns or READ_COLUMNS)
+            yield table.slice(low, high - low)
+
+
+def load_fhir_index(index_dir: Path) -> FhirIndex:
+    meta_path = index_dir / META_FILE
+    if not meta_path.exists():
+        raise FileNotFoundError(f"No FHIR index at {index_dir}; run export-fhir")
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if meta.get("format") != INDEX_FORMAT:
+        raise ValueError(f"Unsupported FHIR index format {meta.get('format')}; run export-fhir")
+    arrays = {
+        name: np.load(index_dir / filename, mmap_mode="r") for name, filename in INDEX_FILES.items()
+    }
+    return FhirIndex(
+        index_dir=index_dir,
+        code_ranges=json.loads((index_dir / CODES_FILE).read_text(encoding="utf-8")),
+        row_group_offsets={
+            cluster: _row_group_offsets(index_dir / filename)
+            for cluster, filename in CLUSTER_FILES.items()
+        },
+        **arrays,
+    )
+
+
+def _resources(lines: pa.Array) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in lines.to_pylist()]
+
+
+def _date_range(value: str) -> tuple[str, date, date]:
+    # FHIR date search: an optional prefix, then YYYY, YYYY-MM or YYYY-MM-DD as a range.
+    prefix = value[:2] if value[:2] in DATE_PREFIXES else "eq"
+    text = value[2:] if value[:2] in DATE_PREFIXES else value
+    parts = [int(part) for part in text.split("-")]
+    if not 1 <= len(parts) <= 3:
+        raise ValueError(f"Invalid date: {value}")
+    start = date(parts[0], parts[1] if len(parts) > 1 else 1, parts[2] if len(parts) > 2 else 1)
+    if len(parts) == 3:
+        end = start + timedelta(days=1)
+    elif len(parts) == 2:
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    else:
+        end = date(start.year + 1, 1, 1)
+    return prefix, start, end
+
+
+def _date_mask(dates: pa.ChunkedArray, value: str) -> pa.Array:
+    prefix, start, end = _date_range(value)
+    low = pa.scalar(datetime.combine(start, datetime.min.time()), dates.type)
+    high = pa.scalar(datetime.combine(end, datetime.min.time()), dates.type)
+    masks = {
+        "eq": pc.and_(pc.greater_equal(dates, low), pc.less(dates, high)),
+        "ne": pc.or_(pc.less(dates, low), pc.greater_equal(dates, high)),
+        "gt": pc.greater_equal(dates, high),
+        "ge": pc.greater_equal(dates, low),
+        "lt": pc.less(dates, low),
+        "le": pc.less(dates, high),
+    }
+    return pc.fill_null(masks[prefix], False)
+
+
+def _patient_tables(
+    index: FhirIndex, patient_id: str, columns: list[str] | None = None
+) -> Iterator[pa.Table]:
+    for start, end in index.patient_range(patient_id):
+        for table in index.read_range("patient", start, end, columns):
+            # Hash collisions are possible in principle; the id itself decides.
+            yield table.filter(pc.equal(table["patient_id"], patient_id))
+
+
+def patient_resource(index: FhirIndex, patient_id: str) -> dict[str, Any] | None:
+    for table in _patient_tables(index, patient_id):
+        if table.num_rows:
+            return _resources(patient_lines(table.slice(0, 1)))[0]
+    return None
+
+
+def _filtered(
+    table: pa.Table, patient_id: str | None, code: str | None, dates: list[str]
+) -> pa.Table:
+    if patient_id is not None:
+        table = table.filter(pc.equal(table["patient_id"], patient_id))
+    if code is not None:
+        table = table.filter(pc.equal(table["observation_code"], code))
+    for value in dates:
+        table = table.filter(_date_mask(table["event_date"], value))
+    return table
+
+
+def search_observations(
+    index: FhirIndex,
+    subject: str | None = None,
+    code: str | None = None,
+    dates: list[str] | None = None,
+    count: int | None = None,
+) -> tuple[list[dict[str, Any]], int]:
+    # Returns up to `count` matches and their total. Only those rows are read in full and
+    # serialized; a code search without dates takes its total from the index, anything else
+    # counts the rest of its ranges from the filter columns alone.
+    if subject is None and code is None:
+        raise ValueError("subject or code is required")
+    dates = dates or []
+    for value in dates:
+        _date_range(value)
+    patient_id = subject.removeprefix("Patient/") if subject is not None else None
+    if patient_id is not None:
+        cluster, ranges = "patient", index.patient_range(patient_id)
+    else:
+        assert code is not None
+        cluster, ranges = "code", [index.code_range(code)]
+    # Within the code cluster every row in range already carries the code.
+    row_code = code if cluster == "patient" else None
+    known_total = None if cluster == "patient" or dates else sum(e - s for s, e in ranges)
+
+    matched: list[pa.Table] = []
+    found = total = 0
+    remaining = list(ranges)
+    while remaining and (count is None or found < count):
+        start, end = remaining.pop(0)
+        for table in index.read_range(cluster, start, end):
+            start += table.num_rows
+            table = _filtered(table, patient_id, row_code, dates)
+            total += table.num_rows
+            matched.append(table if count is None else table.slice(0, count - found))
+            found += matched[-1].num_rows
+            if count is not None and found >= count:
+                remaining.insert(0, (start, end))
+                break
+    if known_total is None:
+        columns = ["patient_id", "observation_code", "event_date"]
+        for start, end in remaining:
+            for table in index.read_range(cluster, start, end, columns):
+                total += _filtered(table, patient_id, row_code, dates).num_rows
+    resources = [
+        resource
+        for table in matched
+        if table.num_rows
+        for resource in _resources(observation_lines(table))
+    ]
+    return resources, total if known_total is None else known_total
+
+
+def patient_everything(index: FhirIndex, patient_id: str) -> list[dict[str, Any]]:
+    tables = [table for table in _patient_tables(index, patient_id) if table.num_rows]
+    if not tables:
+        return []
+    table = pa.concat_tables(tables)
+    return [
+        *_resources(patient_lines(table.slice(0, 1))),
+        *_resources(observation_lines(table)),
+        *_resources(condition_lines(table)),
+    ]
@@ -1,41 +1,205 @@
 from __future__ import annotations
 
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa  # type: ignore[import-untyped]
+import pyarrow.compute as pc  # type: ignore[import-untyped]
+import pyarrow.parquet as pq  # type: ignore[import-untyped]
 
+from exporters.vocabulary import (
+    GENDER_CODES,
+    SYSTEM_VOCABULARIES,
+    UNIT_CODES,
+    VocabularyIndex,
+    aliased,
+)
+from hdb.manifest import HashingWriter
 
-def _to_person_id(patient_id: str) -> int:
-    return int(patient_id[:12], 16)
+# Rows per streamed batch; bounds exporter memory regardless of the gold snapshot size.
+BATCH_ROWS = 64 * 1024
+OMOP_TABLES = ("person", "observation", "condition_occurrence")
+SOURCE_COLUMNS = [
+    "record_id",
+    "patient_id",
+    "sex",
+    "observation_code",
+    "observation_code_system",
+    "observation_value_num",
+    "observation_unit",
+    "condition_code",
+    "condition_code_system",
+    "event_date",
+]
+PERSON_ID_HEX_DIGITS = 12
+# 15 hex digits (60 bits) of the canonical record_id keep observation ids positive int64s.
+RECORD_ID_HEX_DIGITS = 15
 
+_HEX_VALUES = np.full(256, 255, dtype=np.uint8)
+for _digits, _base in ((b"0123456789", 0), (b"abcdef", 10), (b"ABCDEF", 10)):
+    _HEX_VALUES[np.frombuffer(_digits, dtype=np.uint8)] = np.arange(len(_digits)) + _base
 
-def export_omop_subset(df: pd.DataFrame, output_dir: Path) -> dict[str, str]:
-    output_dir.mkdir(parents=True, exist_ok=True)
-    person = (
-        df[["patient_id", "sex"]]
-        .drop_duplicates()
-        .assign(person_id=lambda x: x["patient_id"].map(_to_person_id), gender_concept_id=0)[
-            ["person_id", "gender_concept_id"]
-        ]
+
+def hex_ids(values: pa.Array | pa.ChunkedArray, digits: int, name: str) -> np.ndarray:
+    # Same value as int(value[:digits], 16), parsed for the whole column at once.
+    if values.null_count:
+        raise ValueError(f"{name} must not be null")
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    count = len(values)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    heads = pc.utf8_lpad(pc.utf8_slice_codeunits(values.cast(pa.string()), 0, digits), digits, "0")
+    if not pc.all(pc.equal(pc.binary_length(heads), digits)).as_py():
+        raise ValueError(f"{name} must start with hexadecimal digits")
+    start = int(np.frombuffer(heads.buffers()[1], dtype=np.int32)[heads.offset])
+    raw = np.frombuffer(heads.buffers()[2], dtype=np.uint8)
+    nibbles = _HEX_VALUES[raw[start : start + count * digits]]
+    if (nibbles == 255).any():
+        raise ValueError(f"{name} must start with hexadecimal digits")
+    shifts = np.arange(digits - 1, -1, -1, dtype=np.int64) * 4
+    ids: np.ndarray = (nibbles.reshape(count, digits).astype(np.int64) << shifts).sum(axis=1)
+    return ids
+
+
+def person_ids(patient_ids: pa.Array | pa.ChunkedArray) -> np.ndarray:
+    return hex_ids(patient_ids, PERSON_ID_HEX_DIGITS, "patient_id")
+
+
+def _concepts(
+    vocabulary: VocabularyIndex | None, vocabulary_ids: pa.Array | str, codes: pa.Array
+) -> tuple[pa.Array, pa.Array]:
+    # (source concept, standard concept) ids; OMOP uses 0 for "no matching concept".
+    if vocabulary is None:
+        zeros = pa.array(np.zeros(len(codes), dtype=np.int64))
+        return zeros, zeros
+    source, standard = vocabulary.lookup(vocabulary_ids, codes)
+    return pa.array(source, type=pa.int64()), pa.array(standard, type=pa.int64())
+
+
+def _omop_tables(
+    batch: pa.Table, ids: np.ndarray, vocabulary: VocabularyIndex | None
+) -> dict[str, pa.Table]:
+    person_id = pa.array(ids, type=pa.int64())
+    record_id = pa.array(
+        hex_ids(batch["record_id"], RECORD_ID_HEX_DIGITS, "record_id"), type=pa.int64()
+    )
+    person = pa.table({"person_id": person_id, "sex": batch["sex"]})
+    observation_source, observation_concept = _concepts(
+        vocabulary,
+        aliased(batch["observation_code_system"], SYSTEM_VOCABULARIES),
+        batch["observation_code"],
     )
-    observation = df.assign(
-        person_id=lambda x: x["patient_id"].map(_to_person_id),
-        observation_source_value=lambda x: x["observation_code"],
-        value_as_number=lambda x: x["observation_value_num"],
-    )[["person_id", "observation_source_value", "value_as_number", "event_date"]]
-    condition_occurrence = df[df["condition_code"] != ""].assign(
-        person_id=lambda x: x["patient_id"].map(_to_person_id),
-        condition_source_value=lambda x: x["condition_code"],
-    )[["person_id", "condition_source_value", "event_date"]]
-
-    person_path = output_dir / "person.parquet"
-    observation_path = output_dir / "observation.parquet"
-    condition_path = output_dir / "condition_occurrence.parquet"
-    person.to_parquet(person_path, index=False)
-    observation.to_parquet(observation_path, index=False)
-    condition_occurrence.to_parquet(condition_path, index=False)
+    _, unit_concept = _concepts(vocabulary, "UCUM", aliased(batch["observation_unit"], UNIT_CODES))
+    observation = pa.table(
+        {
+            "observation_id": record_id,
+            "person_id": person_id,
+            "observation_concept_id": observation_concept,
+            "observation_source_value": batch["observation_code"],
+            "observation_source_concept_id": observation_source,
+            "value_as_number": batch["observation_value_num"],
+            "unit_concept_id": unit_concept,
+            "unit_source_value": batch["observation_unit"],
+            "event_date": batch["event_date"],
+        }
+    )
+    condition_source, condition_concept = _concepts(
+        vocabulary,
+        aliased(batch["condition_code_system"], SYSTEM_VOCABULARIES),
+        batch["condition_code"],
+    )
+    has_condition = pc.fill_null(pc.not_equal(batch["condition_code"], ""), False)
+    condition_occurrence = pa.table(
+        {
+            "condition_occurrence_id": record_id,
+            "person_id": person_id,
+            "condition_concept_id": condition_concept,
+            "condition_source_value": batch["condition_code"],
+            "condition_source_concept_id": condition_source,
+            "event_date": batch["event_date"],
+        }
+    ).filter(has_condition)
     return {
-        "person": str(person_path),
-        "observation": str(observation_path),
-        "condition_occurrence": str(condition_path),
+        "person": person,
+        "observation": observation,
+        "condition_occurrence": condition_occurrence,
     }
+
+
+def _new_persons(
+    person: pa.Table, seen: set[tuple[int, object]], vocabulary: VocabularyIndex | None
+) -> pa.Table:
+    # One row per distinct (patient, sex) in first-seen order, deduplicated across batches.
+    distinct = person.group_by(["person_id", "sex"], use_threads=False).aggregate([])
+    keys = zip(distinct["person_id"].to_pylist(), distinct["sex"].to_pylist(), strict=True)
+    keep: list[int] = []
+    for index, key in enumerate(keys):
+        if key not in seen:
+            seen.add(key)
+            keep.append(index)
+    new = distinct.take(pa.array(keep, type=pa.int64()))
+    _, gender = _concepts(vocabulary, "Gender", aliased(new["sex"], GENDER_CODES))
+    return pa.table(
+        {
+            "person_id": new["person_id"],
+            "gender_concept_id": gender,
+            "gender_source_value": new["sex"],
+        }
+    )
+
+
+def _export_batches(
+    batches: Iterable[pa.Table],
+    schema: pa.Schema,
+    output_dir: Path,
+    vocabulary: VocabularyIndex | None,
+) -> dict[str, str]:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    empty = schema.empty_table()
+    empty_tables = _omop_tables(empty, np.zeros(0, dtype=np.int64), vocabulary)
+    empty_tables["person"] = _new_persons(empty_tables["person"], set(), vocabulary)
+    paths = {name: output_dir / f"{name}.parquet" for name in OMOP_TABLES}
+    seen: set[tuple[int, object]] = set()
+    with ExitStack() as stack:
+        writers: dict[str, pq.ParquetWriter] = {}
+        for name in OMOP_TABLES:
+            sink = stack.enter_context(HashingWriter(paths[name]))
+            writers[name] = pq.ParquetWriter(sink, empty_tables[name].schema)
+            stack.callback(writers[name].close)
+        for batch in batches:
+            tables = _omop_tables(batch, person_ids(batch["patient_id"]), vocabulary)
+            tables["person"] = _new_persons(tables["person"], seen, vocabulary)
+            for name, table in tables.items():
+                if table.num_rows:
+                    writers[name].write_table(table.cast(empty_tables[name].schema))
+    return {name: str(path) for name, path in paths.items()}
+
+
+def export_omop_subset(
+    df: pd.DataFrame, output_dir: Path, vocabulary: VocabularyIndex | None = None
+) -> dict[str, str]:
+    table = pa.Table.from_pandas(df[SOURCE_COLUMNS], preserve_index=False)
+    batches = (pa.Table.from_batches([batch]) for batch in table.to_batches(BATCH_ROWS))
+    return _export_batches(batches, table.schema, output_dir, vocabulary)
+
+
+def _parquet_batches(parquet: pq.ParquetFile, batch_rows: int) -> Iterator[pa.Table]:
+    for batch in parquet.iter_batches(batch_size=batch_rows, columns=SOURCE_COLUMNS):
+        yield pa.Table.from_batches([batch])
+
+
+def export_omop_from_parquet(
+    gold_path: Path,
+    output_dir: Path,
+    batch_rows: int = BATCH_ROWS,
+    vocabulary: VocabularyIndex | None = None,
+) -> dict[str, str]:
+    # Streams the gold snapshot; memory is bounded by batch_rows plus the distinct persons seen.
+    parquet = pq.ParquetFile(gold_path)
+    schema = pa.schema([parquet.schema_arrow.field(name) for name in SOURCE_COLUMNS])
+    batches = _parquet_batches(parquet, batch_rows)
+    return _export_batches(batches, schema, output_dir, vocabulary)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Iterator
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa  # type: ignore[import-untyped]
+import pyarrow.compute as pc  # type: ignore[import-untyped]
+import pyarrow.parquet as pq  # type: ignore[import-untyped]
+
+from exporters.omop import BATCH_ROWS
+
+# OMOP CDM v5.4 column names for the exported subset; dates are stored as ISO-8601 text.
+CDM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS person (
+    person_id INTEGER PRIMARY KEY,
+    gender_concept_id INTEGER NOT NULL,
+    gender_source_value TEXT
+);
+CREATE TABLE IF NOT EXISTS observation (
+    observation_id INTEGER PRIMARY KEY,
+    person_id INTEGER NOT NULL,
+    observation_concept_id INTEGER NOT NULL,
+    observation_date TEXT,
+    value_as_number REAL,
+    unit_concept_id INTEGER,
+    observation_source_value TEXT,
+    observation_source_concept_id INTEGER,
+    unit_source_value TEXT
+);
+CREATE TABLE IF NOT EXISTS condition_occurrence (
+    condition_occurrence_id INTEGER PRIMARY KEY,
+    person_id INTEGER NOT NULL,
+    condition_concept_id INTEGER NOT NULL,
+    condition_start_date TEXT,
+    condition_source_value TEXT,
+    condition_source_concept_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS cdm_load_log (
+    dataset_id TEXT NOT NULL,
+    snapshot TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    loaded_at TEXT NOT NULL,
+    PRIMARY KEY (dataset_id, snapshot, table_name)
+);
+"""
+
+# Index names follow the OMOP CDM DDL. They are created after the first bulk load, which is
+# cheaper than maintaining them row by row on an empty table.
+CDM_INDEXES = {
+    "idx_gender": "person (gender_concept_id)",
+    "idx_observation_person_id_1": "observation (person_id)",
+    "idx_observation_concept_id_1": "observation (observation_concept_id)",
+    "idx_observation_date_1": "observation (observation_date)",
+    "idx_condition_person_id_1": "condition_occurrence (person_id)",
+    "idx_condition_concept_id_1": "condition_occurrence (condition_concept_id)",
+    "idx_condition_start_date_1": "condition_occurrence (condition_start_date)",
+}
+
+# Parquet export column -> CDM column, per table.
+_RENAMES = {
+    "person": {},
+    "observation": {"event_date": "observation_date"},
+    "condition_occurrence": {"event_date": "condition_start_date"},
+}
+
+
+@dataclass(frozen=True)
+class CdmLoad:
+    table: str
+    rows: int
+    skipped: bool
+
+
+def connect_cdm(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30.0)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(CDM_SCHEMA)
+    return connection
+
+
+def _table_columns(connection: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+
+
+def _rows(path: Path, table: str, columns: list[str], batch_rows: int) -> Iterator[tuple[Any, ...]]:
+    # Converts one column at a time per batch; rows are only materialized as tuples for sqlite.
+    parquet = pq.ParquetFile(path)
+    renames = _RENAMES[table]
+    for batch in parquet.iter_batches(batch_size=batch_rows):
+        arrays: dict[str, pa.Array] = {}
+        for name, array in zip(batch.schema.names, batch.columns, strict=True):
+            if pa.types.is_timestamp(array.type) or pa.types.is_date(array.type):
+                array = pc.strftime(array, format="%Y-%m-%d")
+            arrays[renames.get(name, name)] = array
+        values = [
+            arrays[column].to_pylist() if column in arrays else [None] * batch.num_rows
+            for column in columns
+        ]
+        yield from zip(*values, strict=True)
+
+
+def load_omop_tables(
+    db_path: Path,
+    tables: dict[str, str],
+    dataset_id: str,
+    snapshot: str,
+    batch_rows: int = BATCH_ROWS,
+) -> list[CdmLoad]:
+    # Upserts one snapshot's OMOP parquet files. Primary keys are derived from canonical ids,
+    # so re-exported rows replace themselves and each build only appends what is new.
+    # A snapshot already in cdm_load_log is skipped.
+    loads: list[CdmLoad] = []
+    now = datetime.now(UTC).isoformat()
+    with closing(connect_cdm(db_path)) as connection, connection:
+        connection.execute("BEGIN IMMEDIATE")
+        for table, path in tables.items():
+            if table not in _RENAMES:
+                raise ValueError(f"Unknown OMOP table: {table}")
+            loaded = connection.execute(
+                "SELECT row_count FROM cdm_load_log "
+                "WHERE dataset_id = ? AND snapshot = ? AND table_name = ?",
+                (dataset_id, snapshot, table),
+            ).fetchone()
+            if loaded is not None:
+                loads.append(CdmLoad(table=table, rows=int(loaded[0]), skipped=True))
+                continue
+            columns = _table_columns(connection, table)
+            cursor = connection.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                _rows(Path(path), table, columns, batch_rows),
+            )
+            connection.execute(
+                "INSERT INTO cdm_load_log (dataset_id, snapshot, table_name, row_count, loaded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (dataset_id, snapshot, table, cursor.rowcount, now),
+            )
+            loads.append(CdmLoad(table=table, rows=cursor.rowcount, skipped=False))
+        for name, target in CDM_INDEXES.items():
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+        connection.execute("ANALYZE")
+    return loads
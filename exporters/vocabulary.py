@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import json
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa  # type: ignore[import-untyped]
+import pyarrow.compute as pc  # type: ignore[import-untyped]
+import pyarrow.csv as pv  # type: ignore[import-untyped]
+
+# Compiled index layout: three equal-length arrays sorted by key, opened memory-mapped so an
+# export touches only the pages its codes land on, never the whole vocabulary.
+INDEX_FORMAT = 1
+INDEX_FILES = {
+    "keys": "keys.npy",
+    "source_concept_ids": "source_concept_ids.npy",
+    "concept_ids": "concept_ids.npy",
+}
+META_FILE = "vocabulary.json"
+CSV_BLOCK_BYTES = 16 * 1024 * 1024
+# renameat2(2) flag that swaps two paths atomically (Linux 3.15+, most local filesystems).
+RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+LOAD_ATTEMPTS = 3
+KEY_SEPARATOR = "\x1f"
+
+# Canonical code systems and units are spelled for humans; OMOP keys on vocabulary_id and
+# UCUM codes. Unknown values are looked up as-is.
+SYSTEM_VOCABULARIES = {
+    "ICD-10": "ICD10",
+    "ICD-10-CM": "ICD10CM",
+    "ICD-9-CM": "ICD9CM",
+    "SNOMED-CT": "SNOMED",
+    "LOINC": "LOINC",
+}
+UNIT_CODES = {"years": "a", "percent": "%", "count": "{count}"}
+GENDER_CODES = {"male": "M", "female": "F"}
+
+# Athena exports are tab-separated and unquoted; concept names contain stray quotes.
+_PARSE_OPTIONS = pv.ParseOptions(delimiter="\t", quote_char=False)
+
+
+def _joined(vocabulary_ids: pa.Array | str, codes: pa.Array) -> pa.Array:
+    parts = [
+        pa.scalar(part, pa.large_string())
+        if isinstance(part, str)
+        else pc.fill_null(part.cast(pa.large_string()), "")
+        for part in (vocabulary_ids, codes)
+    ]
+    return pc.binary_join_element_wise(*parts, pa.scalar(KEY_SEPARATOR, pa.large_string()))
+
+
+def _hashed(joined: pa.Array) -> np.ndarray:
+    # 64-bit SipHash of "vocabulary_id<US>concept_code"; collisions are negligible at
+    # vocabulary sizes (millions of concepts).
+    keys: np.ndarray = pd.util.hash_array(joined.to_numpy(zero_copy_only=False), categorize=False)
+    return keys
+
+
+def concept_keys(vocabulary_ids: pa.Array | str, codes: pa.Array) -> np.ndarray:
+    return _hashed(_joined(vocabulary_ids, codes))
+
+
+def _read_csv(path: Path, columns: dict[str, pa.DataType]) -> pv.CSVStreamingReader:
+    return pv.open_csv(
+        path,
+        read_options=pv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+        parse_options=_PARSE_OPTIONS,
+        convert_options=pv.ConvertOptions(
+            include_columns=list(columns), column_types=columns, strings_can_be_null=False
+        ),
+    )
+
+
+def _maps_to(relationship_path: Path) -> tuple[np.ndarray, np.ndarray]:
+    # Valid "Maps to" edges, one target per source concept (the lowest id on one-to-many maps).
+    sources: list[np.ndarray] = []
+    targets: list[np.ndarray] = []
+    columns = {
+        "concept_id_1": pa.int64(),
+        "concept_id_2": pa.int64(),
+        "relationship_id": pa.string(),
+        "invalid_reason": pa.string(),
+    }
+    for batch in _read_csv(relationship_path, columns):
+        keep = pc.and_(
+            pc.equal(batch["relationship_id"], "Maps to"), pc.equal(batch["invalid_reason"], "")
+        )
+        edges = batch.filter(keep)
+        sources.append(edges["concept_id_1"].to_numpy())
+        targets.append(edges["concept_id_2"].to_numpy())
+    source = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64)
+    target = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64)
+    order = np.lexsort((target, source))
+    source, target = source[order], target[order]
+    first = np.r_[True, source[1:] != source[:-1]] if len(source) else np.zeros(0, dtype=bool)
+    return source[first], target[first]
+
+
+def _find(sorted_keys: np.ndarray, wanted: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    if len(sorted_keys) == 0:
+        return np.zeros(len(wanted), dtype=np.int64), np.zeros(len(wanted), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_keys, wanted), len(sorted_keys) - 1)
+    return positions, sorted_keys[positions] == wanted
+
+
+def _lookup(sorted_keys: np.ndarray, values: np.ndarray, wanted: np.ndarray) -> np.ndarray:
+    positions, found = _find(sorted_keys, wanted)
+    if len(values) == 0:
+        return np.zeros(len(wanted), dtype=np.int64)
+    matched: np.ndarray = np.where(found, values[positions], 0).astype(np.int64)
+    return matched
+
+
+def compile_vocabulary(source_dir: Path, index_dir: Path) -> dict[str, Any]:
+    # Streams CONCEPT.csv and CONCEPT_RELATIONSHIP.csv (Athena download layout) once.
+    keys: list[np.ndarray] = []
+    concept_ids: list[np.ndarray] = []
+    standard: list[np.ndarray] = []
+    valid: list[np.ndarray] = []
+    columns = {
+        "concept_id": pa.int64(),
+        "vocabulary_id": pa.string(),
+        "concept_code": pa.string(),
+        "standard_concept": pa.string(),
+        "invalid_reason": pa.string(),
+    }
+    for batch in _read_csv(source_dir / "CONCEPT.csv", columns):
+        keys.append(concept_keys(batch["vocabulary_id"], batch["concept_code"]))
+        concept_ids.append(batch["concept_id"].to_numpy())
+        standard.append(pc.equal(batch["standard_concept"], "S").to_numpy(zero_copy_only=False))
+        valid.append(pc.equal(batch["invalid_reason"], "").to_numpy(zero_copy_only=False))
+    all_keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.uint64)
+    source_ids = np.concatenate(concept_ids) if concept_ids else np.zeros(0, dtype=np.int64)
+    is_standard = np.concatenate(standard) if standard else np.zeros(0, dtype=bool)
+    is_valid = np.concatenate(valid) if valid else np.zeros(0, dtype=bool)
+
+    # A code reused within a vocabulary resolves to its valid concept, then the lowest id.
+    order = np.lexsort((source_ids, ~is_valid, all_keys))
+    all_keys, source_ids, is_standard = all_keys[order], source_ids[order], is_standard[order]
+    first = np.r_[True, all_keys[1:] != all_keys[:-1]] if len(all_keys) else order.astype(bool)
+    all_keys, source_ids, is_standard = all_keys[first], source_ids[first], is_standard[first]
+
+    map_sources, map_targets = _maps_to(source_dir / "CONCEPT_RELATIONSHIP.csv")
+    mapped = _lookup(map_sources, map_targets, source_ids)
+    standard_ids = np.where(is_standard, source_ids, mapped).astype(np.int64)
+
+    # Built in a sibling dir and swapped in whole, so a build loading the live index never
+    # pairs new keys with old concept ids.
+    index_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = index_dir.with_name(f".{index_dir.name}.{uuid.uuid4().hex[:8]}.tmp")
+    staging.mkdir()
+    try:
+        arrays = {
+            "keys": all_keys.astype(np.uint64),
+            "source_concept_ids": source_ids.astype(np.int64),
+            "concept_ids": standard_ids,
+        }
+        for name, array in arrays.items():
+            with (staging / INDEX_FILES[name]).open("wb") as handle:
+                np.save(handle, array)
+        meta = {
+            "format": INDEX_FORMAT,
+            "source_dir": str(source_dir),
+            "compiled_at": datetime.now(UTC).isoformat(),
+            "concepts": int(len(all_keys)),
+            "mapped": int(np.count_nonzero(standard_ids)),
+        }
+        (staging / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        _swap_into_place(staging, index_dir)
+    finally:
+        # After a swap this holds the previous index; open memory maps keep their pages.
+        shutil.rmtree(staging, ignore_errors=True)
+    return meta
+
+
+def _swap_into_place(staging: Path, index_dir: Path) -> None:
+    if not index_dir.exists():
+        os.rename(staging, index_dir)
+        return
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    renameat2 = getattr(libc, "renameat2", None)
+    if renameat2 is not None:
+        paths = (os.fsencode(staging), os.fsencode(index_dir))
+        if renameat2(_AT_FDCWD, paths[0], _AT_FDCWD, paths[1], RENAME_EXCHANGE) == 0:
+            return
+    # No atomic exchange here: the index is missing for the moment between the two renames.
+    retired = index_dir.with_name(f".{index_dir.name}.{uuid.uuid4().hex[:8]}.old")
+    os.rename(index_dir, retired)
+    os.rename(staging, index_dir)
+    os.rename(retired, staging)
+
+
+@dataclass(frozen=True)
+class VocabularyIndex:
+    keys: np.ndarray
+    source_concept_ids: np.ndarray
+    concept_ids: np.ndarray
+    meta: dict[str, Any]
+
+    def lookup(
+        self, vocabulary_ids: pa.Array | str, codes: pa.Array | pa.ChunkedArray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Returns (source_concept_id, standard concept_id) per row, 0 where unmapped. Keys are
+        # hashed per distinct value, then joined against the index with one searchsorted.
+        if isinstance(codes, pa.ChunkedArray):
+            codes = codes.combine_chunks()
+        if isinstance(vocabulary_ids, pa.ChunkedArray):
+            vocabulary_ids = vocabulary_ids.combine_chunks()
+        if len(codes) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        # Distinct (vocabulary_id, code) pairs per batch are few; hash only those.
+        encoded = _joined(vocabulary_ids, codes).dictionary_encode()
+        wanted = _hashed(encoded.dictionary)
+        indices = encoded.indices.to_numpy(zero_copy_only=False)
+        source = _lookup(self.keys, self.source_concept_ids, wanted)
+        standard = _lookup(self.keys, self.concept_ids, wanted)
+        return source[indices], standard[indices]
+
+
+def load_vocabulary(index_dir: Path) -> VocabularyIndex:
+    meta_path = index_dir / META_FILE
+    for _ in range(LOAD_ATTEMPTS):
+        if not meta_path.exists():
+            raise FileNotFoundError(
+                f"No compiled OMOP vocabulary at {index_dir}; run compile-vocab"
+            )
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported vocabulary index format {meta.get('format')}; recompile")
+        arrays = {
+            name: np.load(index_dir / filename, mmap_mode="r")
+            for name, filename in INDEX_FILES.items()
+        }
+        # A recompile swapped in between the reads above: load again from the new index.
+        if all(len(array) == meta["concepts"] for array in arrays.values()):
+            return VocabularyIndex(meta=meta, **arrays)
+    raise ValueError(f"OMOP vocabulary at {index_dir} kept changing while loading")
+
+
+def aliased(values: pa.Array | pa.ChunkedArray, aliases: dict[str, str]) -> pa.Array:
+    # Rewrites a low-cardinality string column through an alias table via its dictionary.
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    encoded = pc.fill_null(values.cast(pa.large_string()), "").dictionary_encode()
+    dictionary = [aliases.get(value, value) for value in encoded.dictionary.to_pylist()]
+    return pa.array(dictionary, type=pa.large_string()).take(encoded.indices)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import signal
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+from types import FrameType
+
+from hdb.cron import CronSchedule, next_run, parse_cron
+from hdb.registry import DatasetConfig, RegistryConfig, load_registry
+from hdb.settings import get_settings
+from hdb.watch import FileWatcher
+from pipelines.engine import (
+    enqueue_continuous_build,
+    run_continuous_build_if_due,
+    run_triggered_build,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+DAEMON_MAX_WORKERS = 2
+# Upper bound on one sleep, so registry edits are picked up while nothing is due.
+RELOAD_SECONDS = 30.0
+# How often the watch thread wakes to notice stop(); no files are touched on these wake-ups.
+WATCH_WAKE_SECONDS = 1.0
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC)
+
+
+class ContinuousDaemon:
+    def __init__(
+        self,
+        dataset_id: str | None = None,
+        max_workers: int = DAEMON_MAX_WORKERS,
+        build: Callable[[str], dict[str, str]] = run_continuous_build_if_due,
+        clock: Callable[[], datetime] = _utcnow,
+        watcher: FileWatcher | None = None,
+        trigger_build: Callable[[str], dict[str, str]] = run_triggered_build,
+    ) -> None:
+        self._dataset_id = dataset_id
+        self._build = build
+        self._clock = clock
+        self._watcher = watcher
+        self._trigger_build = trigger_build
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hdb-daemon")
+        self._lock = threading.Lock()
+        self._busy: set[str] = set()
+        self._rerun: set[str] = set()
+        self._registry: RegistryConfig | None = None
+        self._schedules: dict[str, CronSchedule] = {}
+        self._queue: list[tuple[datetime, str]] = []
+        self._watched: dict[Path, list[str]] = {}
+        self._unwatched: set[Path] = set()
+        self._crons: dict[str, str] = {}
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def next_due(self) -> list[tuple[datetime, str]]:
+        return sorted(self._queue)
+
+    def _watch_path(self, dataset: DatasetConfig) -> Path | None:
+        source = dataset.sources[0]
+        if self._watcher is None or source.connector != "local_file":
+            return None
+        return Path(os.path.abspath(str(source.params["path"])))
+
+    def _reload(self, now: datetime) -> None:
+        registry = load_registry(get_settings().registry_path)
+        changed = registry is not self._registry
+        if changed:
+            self._registry = registry
+            selected = [
+                dataset
+                for dataset in registry.datasets
+                if dataset.continuous.enabled and self._dataset_id in (None, dataset.id)
+            ]
+            self._crons = {dataset.id: dataset.refresh_cron for dataset in selected}
+            watched: dict[Path, list[str]] = {}
+            for dataset in selected:
+                path = self._watch_path(dataset)
+                if path is not None:
+                    watched.setdefault(path, []).append(dataset.id)
+            if watched != self._watched and self._watcher is not None:
+                known = {item for items in self._watched.values() for item in items}
+                self._unwatched = self._watcher.set_paths(watched.keys())
+                self._watched = watched
+                LOGGER.info("daemon watching datasets=%s", sorted(watched.values()))
+                # Catch up on edits made while the daemon was down; unchanged files skip cheaply.
+                for path, items in watched.items():
+                    for dataset_id in items:
+                        if dataset_id not in known and path not in self._unwatched:
+                            self.trigger(dataset_id)
+        elif self._unwatched and self._watcher is not None:
+            # Paths that could not be watched (directory missing, watch limit hit) are retried
+            # every tick; their datasets stay on their cron schedule until a watch takes.
+            unwatched = self._watcher.set_paths(self._watched.keys())
+            for path in self._unwatched - unwatched:
+                LOGGER.info("daemon now watching %s", path)
+                for dataset_id in self._watched[path]:
+                    self.trigger(dataset_id)
+            changed = unwatched != self._unwatched
+            self._unwatched = unwatched
+        if not changed:
+            return
+        live = {
+            dataset_id
+            for path, items in self._watched.items()
+            if path not in self._unwatched
+            for dataset_id in items
+        }
+        schedules = {
+            dataset_id: parse_cron(cron)
+            for dataset_id, cron in self._crons.items()
+            if dataset_id not in live
+        }
+        if schedules == self._schedules:
+            return
+        self._schedules = schedules
+        self._queue = [(next_run(schedule, now), item) for item, schedule in schedules.items()]
+        heapq.heapify(self._queue)
+        LOGGER.info("daemon scheduling datasets=%s", sorted(schedules))
+
+    def run_pending(self) -> float:
+        now = self._clock()
+        try:
+            self._reload(now)
+        except Exception:
+            LOGGER.exception("daemon could not reload the registry; keeping current schedule")
+        while self._queue and self._queue[0][0] <= now:
+            _, dataset_id = heapq.heappop(self._queue)
+            heapq.heappush(self._queue, (next_run(self._schedules[dataset_id], now), dataset_id))
+            self._submit(dataset_id)
+        if not self._queue:
+            return RELOAD_SECONDS
+        return min(RELOAD_SECONDS, max((self._queue[0][0] - now).total_seconds(), 0.0))
+
+    def _submit(self, dataset_id: str) -> None:
+        with self._lock:
+            if dataset_id in self._busy:
+                LOGGER.warning("skipping dataset_id=%s: previous build still running", dataset_id)
+                return
+            self._busy.add(dataset_id)
+        self._pool.submit(self._run_build, dataset_id, self._build)
+
+    def trigger(self, dataset_id: str) -> None:
+        # Changes seen while a build runs coalesce into a single rebuild once it finishes.
+        with self._lock:
+            if dataset_id in self._busy:
+                self._rerun.add(dataset_id)
+                return
+            self._busy.add(dataset_id)
+        self._pool.submit(self._run_build, dataset_id, self._trigger_build)
+
+    def _run_build(self, dataset_id: str, build: Callable[[str], dict[str, str]]) -> None:
+        while True:
+            try:
+                LOGGER.info("daemon build finished %s", build(dataset_id))
+            except Exception:
+                LOGGER.exception("daemon build failed for dataset_id=%s", dataset_id)
+            with self._lock:
+                if dataset_id not in self._rerun:
+                    self._busy.discard(dataset_id)
+                    return
+                self._rerun.discard(dataset_id)
+            build = self._trigger_build
+
+    def process_watch_events(self, timeout: float) -> None:
+        if self._watcher is None:
+            return
+        for path in self._watcher.wait(timeout):
+            for dataset_id in self._watched.get(path, []):
+                LOGGER.info("source changed for dataset_id=%s: %s", dataset_id, path)
+                self.trigger(dataset_id)
+
+    def _watch_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.process_watch_events(WATCH_WAKE_SECONDS)
+            except Exception:
+                LOGGER.exception("daemon file watcher failed")
+                self._stop.wait(WATCH_WAKE_SECONDS)
+
+    def run_forever(self) -> None:
+        watch_thread = None
+        if self._watcher is not None:
+            watch_thread = threading.Thread(
+                target=self._watch_forever, name="hdb-watch", daemon=True
+            )
+            watch_thread.start()
+        try:
+            while not self._stop.is_set():
+                self._stop.wait(self.run_pending())
+        finally:
+            self._stop.set()
+            if watch_thread is not None:
+                watch_thread.join()
+            self.close()
+
+    def close(self, cancel_pending: bool = True) -> None:
+        # In-flight builds always finish and publish; queued ones are dropped unless asked.
+        self._pool.shutdown(wait=True, cancel_futures=cancel_pending)
+        if self._watcher is not None:
+            self._watcher.close()
+
+
+def run_daemon(
+    dataset_id: str | None = None,
+    max_workers: int = DAEMON_MAX_WORKERS,
+    watch: bool = False,
+    enqueue: bool = False,
+) -> None:
+    # With enqueue, cron ticks only queue jobs and `hdb worker` processes on any node build them.
+    daemon = ContinuousDaemon(
+        dataset_id=dataset_id,
+        max_workers=max_workers,
+        build=enqueue_continuous_build if enqueue else run_continuous_build_if_due,
+        watcher=FileWatcher() if watch else None,
+    )
+
+    def _handle_signal(signum: int, frame: FrameType | None) -> None:
+        LOGGER.info("daemon received signal=%s, stopping", signum)
+        daemon.stop()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+    daemon.run_forever()
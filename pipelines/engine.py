@@ -1,15 +1,26 @@
 from __future__ import annotations
 
+import errno
 import json
 import logging
+import os
+import shutil
+import uuid
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any
+from urllib.parse import urlparse
 
 import pandas as pd
 from connectors import CONNECTOR_REGISTRY
+from connectors.base import BaseConnector
+from connectors.policy import RateLimitPolicy, RetryPolicy, configure_host_limits
 from exporters.fhir import export_fhir_bundle
-from exporters.omop import export_omop_subset
+from exporters.fhir_bulk import BULK_WORKERS, MAX_FILE_BYTES, export_fhir_bulk
+from exporters.fhir_index import build_fhir_index
+from exporters.omop import BATCH_ROWS, export_omop_from_parquet, export_omop_subset
+from exporters.omop_db import load_omop_tables
+from exporters.vocabulary import META_FILE, VocabularyIndex, load_vocabulary
 from transforms.canonical import (
     CANONICAL_SCHEMA_VERSION,
     transform_life_expectancy,
@@ -18,21 +29,51 @@ from transforms.canonical import (
 )
 from validators.checks import validate_canonical
 
+from hdb.catalog import (
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    BreakerState,
+    acquire_breaker,
+    latest_manifest_entry,
+    latest_manifest_path,
+    load_latest_manifest,
+    poll_states,
+    record_breaker_result,
+    record_probe,
+    update_poll_state,
+)
 from hdb.codebook import generate_codebook
+from hdb.drift import build_sketches, compare_sketches, load_sketches, write_sketches
+from hdb.jobs import JOB_KIND_CONTINUOUS, enqueue_build
+from hdb.locking import dataset_lock
 from hdb.manifest import (
     build_digests,
+    build_merkle_manifest,
+    forget_digests,
     license_record_text,
+    merkle_root,
     now_timestamp,
     serialize_digests,
+    write_bytes_hashed,
     write_manifest,
+    write_text_hashed,
 )
+from hdb.objects import store_artifacts
 from hdb.pii import detect_pii
-from hdb.registry import DatasetConfig, load_registry
+from hdb.registry import DatasetConfig, SourceConfig, load_registry
 from hdb.settings import get_settings
-from pipelines.modeling import train_baseline_model, train_tb_forecast_artifacts
+from pipelines.modeling import (
+    backtest_tb_forecasts,
+    train_baseline_model,
+    train_tb_forecast_artifacts,
+)
 
 LOGGER = logging.getLogger(__name__)
 
+POLL_SLACK_RATIO = 0.1
+# Gold row groups match the exporters' batch size so they can stream one group at a time.
+GOLD_ROW_GROUP_SIZE = BATCH_ROWS
+
 
 def _get_dataset(dataset_id: str) -> tuple[DatasetConfig, list[str]]:
     settings = get_settings()
@@ -43,27 +84,201 @@ def _get_dataset(dataset_id: str) -> tuple[DatasetConfig, list[str]]:
     return dataset_map[dataset_id], registry.html_allowlist
 
 
-def _latest_manifest(dataset_id: str, manifest_dir: Path) -> Path:
-    dataset_root = manifest_dir / dataset_id
-    if not dataset_root.exists():
-        raise FileNotFoundError(f"No manifests for dataset: {dataset_id}")
-    run_dirs = sorted([p for p in dataset_root.iterdir() if p.is_dir()], reverse=True)
-    for run_dir in run_dirs:
-        manifest_path = run_dir / "manifest.json"
-        if manifest_path.exists():
-            return manifest_path
-    raise FileNotFoundError(f"No manifest.json for dataset: {dataset_id}")
+def _previous_sketches(dataset_id: str) -> tuple[str | None, dict[str, Any] | None]:
+    try:
+        manifest_path = latest_manifest_path(dataset_id)
+    except FileNotFoundError:
+        return None, None
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    sketches_path = manifest.get("sketches")
+    if not sketches_path:
+        return str(manifest.get("timestamp")), None
+    return str(manifest.get("timestamp")), load_sketches(Path(sketches_path))
+
+
+def _free_timestamp(dataset_id: str) -> str:
+    settings = get_settings()
+    timestamp = now_timestamp()
+    while any(path.exists() for path in settings.run_dirs(dataset_id, timestamp).values()):
+        bumped = _parse_manifest_timestamp(timestamp) + timedelta(seconds=1)
+        timestamp = bumped.strftime("%Y%m%dT%H%M%SZ")
+    return timestamp
+
+
+def _relocate_paths(value: Any, moves: dict[str, str]) -> Any:
+    if isinstance(value, dict):
+        return {key: _relocate_paths(item, moves) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_relocate_paths(item, moves) for item in value]
+    if isinstance(value, str):
+        for source, target in moves.items():
+            if value == source or value.startswith(source + os.sep):
+                return target + value[len(source) :]
+    return value
+
+
+def _move_tree(staged: Path, target: Path) -> None:
+    try:
+        os.rename(staged, target)
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+        # Staging lives under the data dir; a target root on another filesystem (e.g. a separate
+        # HDB_MANIFEST_DIR volume) gets a copy next to it that is then renamed into place.
+        partial = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            shutil.copytree(staged, partial)
+            os.replace(partial, target)
+        finally:
+            shutil.rmtree(partial, ignore_errors=True)
+        shutil.rmtree(staged)
+
+
+def _publish_staged_build(dataset_id: str, staging_root: Path, payload: dict[str, Any]) -> Path:
+    timestamp = _free_timestamp(dataset_id)
+    moves: dict[str, str] = {}
+    for name, target in get_settings().run_dirs(dataset_id, timestamp).items():
+        staged = staging_root / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if staged.exists():
+            _move_tree(staged, target)
+        else:
+            target.mkdir()
+        moves[str(staged)] = str(target)
+
+    published = _relocate_paths(payload, moves)
+    published["timestamp"] = timestamp
+    published["merkle"]["root"] = merkle_root(published["merkle"]["artifacts"])
+    manifest_path = Path(moves[str(staging_root / "manifest")]) / "manifest.json"
+    write_manifest(manifest_path, published)
+    return manifest_path
+
+
+def _omop_vocabulary() -> VocabularyIndex | None:
+    # An explicitly configured index must load; the default location is used only once compiled.
+    settings = get_settings()
+    if settings.omop_vocabulary_dir is None and not (settings.vocabulary_dir / META_FILE).exists():
+        return None
+    return load_vocabulary(settings.vocabulary_dir)
+
+
+def _configure_rate_limits() -> None:
+    # Per-host buckets follow the registry as it is now, so edits that loosen or drop a source's
+    # rate limit apply on the next request without a restart.
+    registry = load_registry(get_settings().registry_path)
+    configure_host_limits(
+        (urlparse(str(source.params["url"])).netloc.lower(), policy)
+        for dataset in registry.datasets
+        for source in dataset.sources
+        if "url" in source.params
+        and (policy := RateLimitPolicy.from_params(source.params)) is not None
+    )
+
+
+def _connector_for(source: SourceConfig) -> BaseConnector:
+    settings = get_settings()
+    _configure_rate_limits()
+    connector_cls = CONNECTOR_REGISTRY[source.connector]
+    return connector_cls(
+        cache_dir=settings.cache_dir / source.connector,
+        user_agent=settings.user_agent,
+        timeout_seconds=int(source.params.get("timeout_seconds", settings.request_timeout)),
+        retry_policy=RetryPolicy.from_params(source.params),
+        rate_limit=RateLimitPolicy.from_params(source.params),
+    )
+
+
+def probe_source(dataset: DatasetConfig) -> str | None:
+    source = dataset.sources[0]
+    return _connector_for(source).probe(source.params)
+
+
+def check_source_health(dataset: DatasetConfig) -> None:
+    source = dataset.sources[0]
+    _connector_for(source).check_health(source.params)
+
+
+def _latest_manifest_or_none(dataset_id: str) -> dict[str, Any] | None:
+    try:
+        return load_latest_manifest(dataset_id)
+    except FileNotFoundError:
+        return None
+
+
+def _source_fingerprint(manifest: dict[str, Any] | None) -> str | None:
+    provenance = (manifest or {}).get("provenance") or [{}]
+    fingerprint = provenance[0].get("source_fingerprint")
+    return None if fingerprint is None else str(fingerprint)
+
+
+def _bronze_digest(manifest: dict[str, Any] | None) -> str | None:
+    bronze = (manifest or {}).get("bronze_outputs") or []
+    if not bronze:
+        return None
+    for item in (manifest or {}).get("hashes", []):
+        if item.get("path") == bronze[0]:
+            return str(item["sha256"])
+    return None
+
+
+def _record_poll(dataset: DatasetConfig, changed: bool) -> None:
+    policy = dataset.continuous
+    update_poll_state(
+        get_settings().catalog_path,
+        dataset.id,
+        changed=changed,
+        min_interval_minutes=policy.min_interval_minutes,
+        max_interval_minutes=policy.max_interval_minutes or policy.min_interval_minutes,
+        backoff_factor=policy.backoff_factor,
+    )
+
+
+def run_dataset_build_if_changed(dataset_id: str, full_refresh: bool = False) -> Path | None:
+    if full_refresh:
+        return run_dataset_build(dataset_id, full_refresh=True)
+    settings = get_settings()
+    dataset, _ = _get_dataset(dataset_id)
+    previous = _latest_manifest_or_none(dataset_id)
+    fingerprint = probe_source(dataset)
+    if fingerprint is not None and fingerprint == _source_fingerprint(previous):
+        record_probe(settings.catalog_path, dataset_id, fingerprint, "unchanged")
+        _record_poll(dataset, changed=False)
+        LOGGER.info("source unchanged for dataset_id=%s, skipping build", dataset_id)
+        return None
+    record_probe(settings.catalog_path, dataset_id, fingerprint, "changed")
+    manifest_path = run_dataset_build(dataset_id, full_refresh=False)
+    # Sources without validators always build; identical raw bytes still count as unchanged.
+    digest = _bronze_digest(json.loads(manifest_path.read_text(encoding="utf-8")))
+    _record_poll(dataset, changed=digest is None or digest != _bronze_digest(previous))
+    return manifest_path
 
 
 def run_dataset_build(dataset_id: str, full_refresh: bool = False) -> Path:
     settings = get_settings()
     dataset, html_allowlist = _get_dataset(dataset_id)
-    timestamp = now_timestamp()
+    staging_root = settings.staging_dir / dataset_id / f"{now_timestamp()}-{uuid.uuid4().hex[:8]}"
+    try:
+        payload = _build_staged(dataset, html_allowlist, staging_root, full_refresh)
+        with dataset_lock(settings.lock_dir, dataset_id):
+            manifest_path = _publish_staged_build(dataset_id, staging_root, payload)
+    finally:
+        shutil.rmtree(staging_root, ignore_errors=True)
+        forget_digests(staging_root)
+    LOGGER.info("build complete for dataset_id=%s rows=%s", dataset_id, payload["row_count"])
+    return manifest_path
+
+
+def _build_staged(
+    dataset: DatasetConfig, html_allowlist: list[str], staging_root: Path, full_refresh: bool
+) -> dict[str, Any]:
+    settings = get_settings()
+    dataset_id = dataset.id
+    previous_timestamp, previous_sketches = _previous_sketches(dataset_id)
 
-    bronze_dir = settings.data_dir / "bronze" / dataset_id / timestamp
-    silver_dir = settings.data_dir / "silver" / dataset_id / timestamp
-    gold_dir = settings.data_dir / "gold" / dataset_id / timestamp
-    manifest_dir = settings.manifest_dir / dataset_id / timestamp
+    bronze_dir = staging_root / "bronze"
+    silver_dir = staging_root / "silver"
+    gold_dir = staging_root / "gold"
+    manifest_dir = staging_root / "manifest"
 
     bronze_dir.mkdir(parents=True, exist_ok=True)
     silver_dir.mkdir(parents=True, exist_ok=True)
@@ -71,12 +286,7 @@ def run_dataset_build(dataset_id: str, full_refresh: bool = False) -> Path:
     manifest_dir.mkdir(parents=True, exist_ok=True)
 
     source = dataset.sources[0]
-    connector_cls = CONNECTOR_REGISTRY[source.connector]
-    connector = connector_cls(  # type: ignore[abstract]
-        cache_dir=settings.cache_dir / source.connector,
-        user_agent=settings.user_agent,
-        timeout_seconds=int(source.params.get("timeout_seconds", settings.request_timeout)),
-    )
+    connector = _connector_for(source)
     if full_refresh:
         for item in (settings.cache_dir / source.connector).glob("*"):
             item.unlink(missing_ok=True)
@@ -108,32 +318,53 @@ def run_dataset_build(dataset_id: str, full_refresh: bool = False) -> Path:
 
     silver_path = silver_dir / "normalized.parquet"
     gold_path = gold_dir / "canonical.parquet"
-    canonical_df.to_parquet(silver_path, index=False)
+    canonical_bytes = canonical_df.to_parquet(index=False, row_group_size=GOLD_ROW_GROUP_SIZE)
+    write_bytes_hashed(silver_path, canonical_bytes)
 
     validation = validate_canonical(canonical_df)
-    canonical_df.to_parquet(gold_path, index=False)
+    write_bytes_hashed(gold_path, canonical_bytes)
 
     codebook_json, codebook_md = generate_codebook(
         canonical_df, dataset_id=dataset_id, output_dir=manifest_dir
     )
 
+    sketches = build_sketches(canonical_df)
+    sketches_path = write_sketches(sketches, manifest_dir)
+    drift = compare_sketches(previous_sketches, sketches)
+    drift["compared_to"] = previous_timestamp if previous_sketches is not None else None
+    if drift["status"] == "drift":
+        LOGGER.warning(
+            "drift detected for dataset_id=%s findings=%s", dataset_id, len(drift["findings"])
+        )
+
     omop_dir = gold_dir / "omop"
-    omop_outputs = export_omop_subset(canonical_df, omop_dir)
+    vocabulary = _omop_vocabulary()
+    omop_outputs = export_omop_subset(canonical_df, omop_dir, vocabulary=vocabulary)
     fhir_dir = gold_dir / "fhir"
-    fhir_output = export_fhir_bundle(canonical_df, fhir_dir, dataset_id=dataset_id)
+    fhir_outputs = export_fhir_bundle(canonical_df, fhir_dir, dataset_id=dataset_id)
+    fhir_index_dir = fhir_dir / "index"
+    fhir_index_outputs = build_fhir_index(gold_path, fhir_index_dir)
     model_dir = gold_dir / "models"
     model_outputs = train_baseline_model(canonical_df, model_dir)
     if dataset_id.startswith("tb_"):
         model_outputs.update(train_tb_forecast_artifacts(canonical_df, model_dir))
+        model_outputs.update(
+            backtest_tb_forecasts(
+                canonical_df,
+                model_dir,
+                workers=settings.forecast_workers,
+                budget_seconds=settings.forecast_budget_seconds,
+            )
+        )
 
     license_path = manifest_dir / "LICENSE.md"
-    license_path.write_text(
+    write_text_hashed(
+        license_path,
         license_record_text(
             name=dataset.license.name,
             url=dataset.license.url,
             attribution=dataset.license.attribution,
         ),
-        encoding="utf-8",
     )
 
     all_outputs = [
@@ -142,35 +373,53 @@ def run_dataset_build(dataset_id: str, full_refresh: bool = False) -> Path:
         codebook_json,
         codebook_md,
         license_path,
-        Path(fhir_output),
+        sketches_path,
+        *fhir_outputs,
+        *fhir_index_outputs,
         Path(model_outputs["model"]),
         Path(model_outputs["metrics"]),
     ]
     all_outputs.extend(Path(path) for path in omop_outputs.values())
+    all_outputs.append(fetched.local_path)
+    digests = build_digests(all_outputs)
+    stored = store_artifacts(all_outputs, settings.object_dir)
     manifest_payload: dict[str, Any] = {
         "dataset_id": dataset_id,
-        "timestamp": timestamp,
+        "timestamp": None,
         "schema_version": CANONICAL_SCHEMA_VERSION,
         "row_count": int(len(canonical_df)),
-        "hashes": serialize_digests(build_digests(all_outputs)),
+        "hashes": serialize_digests(digests),
+        "merkle": build_merkle_manifest(all_outputs),
+        "object_store": {
+            "dir": str(settings.object_dir),
+            "linked": sum(1 for item in stored if item.linked),
+            "deduplicated": sum(1 for item in stored if item.deduplicated),
+        },
         "provenance": [
             {
                 "source_url": fetched.source_url,
                 "fetch_time": fetched.fetched_at,
                 "not_modified": fetched.not_modified,
+                "source_fingerprint": fetched.fingerprint,
             }
         ],
         "license": dataset.license.model_dump(),
         "validation": validation,
         "pii_findings": [{"field": f.field, "reason": f.reason} for f in pii_findings],
+        "bronze_outputs": [str(fetched.local_path)],
         "gold_outputs": [str(gold_path)],
         "codebook": {"json": str(codebook_json), "markdown": str(codebook_md)},
-        "exporters": {"omop": omop_outputs, "fhir": str(fhir_output)},
+        "sketches": str(sketches_path),
+        "drift": drift,
+        "exporters": {
+            "omop": omop_outputs,
+            "fhir": [str(path) for path in fhir_outputs],
+            "fhir_index": str(fhir_index_dir),
+        },
+        "omop_vocabulary": None if vocabulary is None else vocabulary.meta,
         "models": model_outputs,
     }
-    write_manifest(manifest_dir / "manifest.json", manifest_payload)
-    LOGGER.info("build complete for dataset_id=%s rows=%s", dataset_id, len(canonical_df))
-    return manifest_dir / "manifest.json"
+    return manifest_payload
 
 
 def run_all_datasets() -> list[Path]:
@@ -179,28 +428,128 @@ def run_all_datasets() -> list[Path]:
     return [run_dataset_build(dataset.id, full_refresh=False) for dataset in registry.datasets]
 
 
+def enqueue_all_datasets() -> list[dict[str, Any]]:
+    settings = get_settings()
+    registry = load_registry(settings.registry_path)
+    queued: list[dict[str, Any]] = []
+    for dataset in registry.datasets:
+        job, created = enqueue_build(settings.queue_path, dataset.id)
+        queued.append({"dataset_id": dataset.id, "job_id": job.id, "deduplicated": not created})
+    return queued
+
+
 def _parse_manifest_timestamp(value: str) -> datetime:
     return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=UTC)
 
 
 def _dataset_due_for_continuous(dataset: DatasetConfig, now: datetime) -> bool:
-    settings = get_settings()
-    dataset_root = settings.manifest_dir / dataset.id
-    if not dataset_root.exists():
+    states = poll_states(get_settings().catalog_path, dataset.id)
+    if states:
+        # A little slack keeps cron ticks from missing a poll that came due seconds later.
+        slack = timedelta(minutes=states[0].interval_minutes * POLL_SLACK_RATIO)
+        return now + slack >= states[0].next_poll_at
+    entry = latest_manifest_entry(dataset.id)
+    if entry is None:
         return True
-    run_dirs = sorted([item for item in dataset_root.iterdir() if item.is_dir()], reverse=True)
-    for run_dir in run_dirs:
-        manifest_path = run_dir / "manifest.json"
-        if not manifest_path.exists():
-            continue
-        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
-        last_ts = _parse_manifest_timestamp(str(manifest["timestamp"]))
-        min_delta = timedelta(minutes=dataset.continuous.min_interval_minutes)
-        return now - last_ts >= min_delta
-    return True
+    last_ts = _parse_manifest_timestamp(entry.timestamp)
+    min_delta = timedelta(minutes=dataset.continuous.min_interval_minutes)
+    return now - last_ts >= min_delta
+
+
+def run_continuous_build(dataset_id: str) -> dict[str, str]:
+    settings = get_settings()
+    manifest_path = run_dataset_build_if_changed(dataset_id)
+    if manifest_path is None:
+        return {"dataset_id": dataset_id, "status": "unchanged"}
+    publish_status = "skipped"
+    if settings.auto_publish_tb and dataset_id.startswith("tb_"):
+        from hdb.publish import publish_to_huggingface, publish_to_kaggle
+
+        hf_ok = "no"
+        kaggle_ok = "no"
+        try:
+            publish_to_huggingface(dataset_id)
+            hf_ok = "yes"
+        except Exception:
+            hf_ok = "failed"
+        try:
+            publish_to_kaggle(dataset_id)
+            kaggle_ok = "yes"
+        except Exception:
+            kaggle_ok = "failed"
+        publish_status = f"hf:{hf_ok},kaggle:{kaggle_ok}"
+    return {
+        "dataset_id": dataset_id,
+        "status": "built",
+        "manifest": str(manifest_path),
+        "publish": publish_status,
+    }
+
+
+def _record_breaker(dataset_id: str, error: str | None) -> BreakerState:
+    settings = get_settings()
+    return record_breaker_result(
+        settings.catalog_path,
+        dataset_id,
+        error=error,
+        failure_threshold=settings.continuous_failure_threshold,
+        base_cooldown_minutes=settings.breaker_cooldown_minutes,
+        max_cooldown_minutes=settings.breaker_max_cooldown_minutes,
+    )
+
+
+def _run_continuous_guarded(dataset: DatasetConfig) -> dict[str, str]:
+    gate = acquire_breaker(get_settings().catalog_path, dataset.id)
+    if gate == BREAKER_OPEN:
+        LOGGER.info("circuit breaker open for dataset_id=%s, skipping", dataset.id)
+        return {"dataset_id": dataset.id, "status": "breaker_open"}
+    try:
+        if gate == BREAKER_HALF_OPEN:
+            check_source_health(dataset)
+        result = run_continuous_build(dataset.id)
+    except Exception as exc:
+        state = _record_breaker(dataset.id, error=str(exc) or type(exc).__name__)
+        if state.state == BREAKER_OPEN:
+            LOGGER.warning(
+                "circuit breaker opened for dataset_id=%s until %s",
+                dataset.id,
+                state.open_until,
+            )
+        raise
+    _record_breaker(dataset.id, error=None)
+    return result
+
+
+def run_continuous_build_if_due(dataset_id: str) -> dict[str, str]:
+    dataset, _ = _get_dataset(dataset_id)
+    if not _dataset_due_for_continuous(dataset, datetime.now(UTC)):
+        return {"dataset_id": dataset_id, "status": "not_due"}
+    return _run_continuous_guarded(dataset)
+
 
+def run_build_job(dataset_id: str, full_refresh: bool = False) -> dict[str, str]:
+    manifest_path = run_dataset_build_if_changed(dataset_id, full_refresh=full_refresh)
+    if manifest_path is None:
+        return {"dataset_id": dataset_id, "status": "unchanged"}
+    return {"dataset_id": dataset_id, "status": "built", "manifest": str(manifest_path)}
 
-def run_continuous_ingestion(dataset_id: str | None = None) -> dict[str, Any]:
+
+def run_triggered_build(dataset_id: str) -> dict[str, str]:
+    # A watcher saw the source change, so the poll schedule is bypassed; the breaker still applies.
+    dataset, _ = _get_dataset(dataset_id)
+    return _run_continuous_guarded(dataset)
+
+
+def enqueue_continuous_build(dataset_id: str) -> dict[str, str]:
+    # Workers re-check the schedule and breaker when they pick the job up.
+    job, created = enqueue_build(get_settings().queue_path, dataset_id, kind=JOB_KIND_CONTINUOUS)
+    status = "queued" if created else "already_queued"
+    return {"dataset_id": dataset_id, "status": status, "job_id": str(job.id)}
+
+
+def run_continuous_ingestion(
+    dataset_id: str | None = None, enqueue: bool = False
+) -> dict[str, Any]:
     settings = get_settings()
     registry = load_registry(settings.registry_path)
     now = datetime.now(UTC)
@@ -214,33 +563,11 @@ def run_continuous_ingestion(dataset_id: str | None = None) -> dict[str, Any]:
     results: list[dict[str, str]] = []
     failures = 0
     for dataset in selected:
+        if enqueue:
+            results.append(enqueue_continuous_build(dataset.id))
+            continue
         try:
-            manifest_path = run_dataset_build(dataset.id, full_refresh=False)
-            publish_status = "skipped"
-            if settings.auto_publish_tb and dataset.id.startswith("tb_"):
-                from hdb.publish import publish_to_huggingface, publish_to_kaggle
-
-                hf_ok = "no"
-                kaggle_ok = "no"
-                try:
-                    publish_to_huggingface(dataset.id)
-                    hf_ok = "yes"
-                except Exception:
-                    hf_ok = "failed"
-                try:
-                    publish_to_kaggle(dataset.id)
-                    kaggle_ok = "yes"
-                except Exception:
-                    kaggle_ok = "failed"
-                publish_status = f"hf:{hf_ok},kaggle:{kaggle_ok}"
-            results.append(
-                {
-                    "dataset_id": dataset.id,
-                    "status": "built",
-                    "manifest": str(manifest_path),
-                    "publish": publish_status,
-                }
-            )
+            results.append(_run_continuous_guarded(dataset))
             failures = 0
         except Exception as exc:
             failures += 1
@@ -257,30 +584,55 @@ def run_continuous_ingestion(dataset_id: str | None = None) -> dict[str, Any]:
 
 
 def validate_dataset_outputs(dataset_id: str) -> dict[str, Any]:
-    settings = get_settings()
-    manifest_path = _latest_manifest(dataset_id, settings.manifest_dir)
-    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    manifest = load_latest_manifest(dataset_id)
     gold_path = Path(manifest["gold_outputs"][0])
     df = pd.read_parquet(gold_path)
     return validate_canonical(df)
 
 
 def export_omop_for_dataset(dataset_id: str) -> dict[str, str]:
-    settings = get_settings()
-    manifest_path = _latest_manifest(dataset_id, settings.manifest_dir)
-    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    manifest = load_latest_manifest(dataset_id)
     gold_path = Path(manifest["gold_outputs"][0])
-    df = pd.read_parquet(gold_path)
-    output_dir = gold_path.parent / "omop"
-    outputs = export_omop_subset(df, output_dir)
-    return outputs
+    return export_omop_from_parquet(
+        gold_path, gold_path.parent / "omop", vocabulary=_omop_vocabulary()
+    )
 
 
-def export_fhir_for_dataset(dataset_id: str) -> Path:
-    settings = get_settings()
-    manifest_path = _latest_manifest(dataset_id, settings.manifest_dir)
-    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+def load_omop_database(dataset_id: str, db_path: Path | None = None) -> dict[str, Any]:
+    manifest = load_latest_manifest(dataset_id)
+    target = db_path or get_settings().omop_db_path
+    loads = load_omop_tables(
+        target, manifest["exporters"]["omop"], dataset_id, str(manifest["timestamp"])
+    )
+    return {
+        "db_path": str(target),
+        "snapshot": manifest["timestamp"],
+        "tables": {load.table: {"rows": load.rows, "skipped": load.skipped} for load in loads},
+    }
+
+
+def export_fhir_for_dataset(dataset_id: str) -> list[Path]:
+    manifest = load_latest_manifest(dataset_id)
     gold_path = Path(manifest["gold_outputs"][0])
     df = pd.read_parquet(gold_path)
     output_dir = gold_path.parent / "fhir"
+    build_fhir_index(gold_path, output_dir / "index")
     return export_fhir_bundle(df, output_dir, dataset_id=dataset_id)
+
+
+def export_fhir_bulk_for_dataset(
+    dataset_id: str,
+    workers: int = BULK_WORKERS,
+    compress: bool = False,
+    max_file_bytes: int = MAX_FILE_BYTES,
+) -> Path:
+    manifest = load_latest_manifest(dataset_id)
+    gold_path = Path(manifest["gold_outputs"][0])
+    return export_fhir_bulk(
+        gold_path,
+        gold_path.parent / "fhir" / "bulk",
+        dataset_id,
+        workers=workers,
+        compress=compress,
+        max_file_bytes=max_file_bytes,
+    )
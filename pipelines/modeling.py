@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import itertools
 import json
+import logging
+import multiprocessing
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 import joblib  # type: ignore[import-untyped]
+import numpy as np
 import pandas as pd
 from sklearn.linear_model import LinearRegression  # type: ignore[import-untyped]
 from sklearn.metrics import mean_absolute_error, r2_score  # type: ignore[import-untyped]
 
+from hdb.manifest import HashingWriter, write_text_hashed
+
+LOGGER = logging.getLogger(__name__)
+
 
 def train_baseline_model(canonical_df: pd.DataFrame, output_dir: Path) -> dict[str, str]:
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -29,57 +42,289 @@ def train_baseline_model(canonical_df: pd.DataFrame, output_dir: Path) -> dict[s
 
     model_path = output_dir / "baseline_regressor.joblib"
     metrics_path = output_dir / "baseline_metrics.json"
-    joblib.dump(model, model_path)
-    metrics_path.write_text(json.dumps(metrics, indent=2), encoding="utf-8")
+    with HashingWriter(model_path) as sink:
+        joblib.dump(model, sink)
+    write_text_hashed(metrics_path, json.dumps(metrics, indent=2))
 
     return {"model": str(model_path), "metrics": str(metrics_path)}
 
 
+@dataclass(frozen=True)
+class GroupedFit:
+    # One ordinary least squares line per group, fitted for all groups at once.
+    keys: pd.DataFrame
+    samples: np.ndarray
+    slope: np.ndarray
+    intercept: np.ndarray
+    mae: np.ndarray
+    r2: np.ndarray
+    max_x: np.ndarray
+
+    def predict(self, steps: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Group positions, x values and predictions for max_x + 1 .. max_x + steps, per group.
+        groups = np.repeat(np.arange(len(self.keys)), steps)
+        x = self.max_x[groups] + np.tile(np.arange(1, steps + 1, dtype=float), len(self.keys))
+        return groups, x, self.intercept[groups] + self.slope[groups] * x
+
+
+def fit_grouped_ols(
+    df: pd.DataFrame, group_keys: Sequence[str], x_column: str, y_column: str
+) -> GroupedFit:
+    # Closed-form per-group slope/intercept on centered x, with the same MAE and R² (including
+    # sklearn's constant-target convention) as LinearRegression + sklearn.metrics. Groups with
+    # fewer than two distinct x values have no line and are dropped, as are rows missing x or y.
+    keys = list(group_keys)
+    data = df[[*keys, x_column, y_column]].dropna(subset=[*keys, x_column, y_column])
+    codes = data.groupby(keys, sort=True, observed=True).ngroup().to_numpy()
+    x = data[x_column].to_numpy(dtype=float)
+    y = data[y_column].to_numpy(dtype=float)
+    count = int(codes.max()) + 1 if len(codes) else 0
+    distinct = pd.DataFrame({"group": codes, "x": x}).drop_duplicates()
+    keep = np.bincount(distinct["group"].to_numpy(), minlength=count) >= 2
+
+    rows = keep[codes]
+    codes = np.cumsum(keep)[codes[rows]] - 1
+    x, y = x[rows], y[rows]
+    count = int(keep.sum())
+    samples = np.bincount(codes, minlength=count)
+    mean_x = np.bincount(codes, weights=x, minlength=count) / samples
+    mean_y = np.bincount(codes, weights=y, minlength=count) / samples
+    dx = x - mean_x[codes]
+    dy = y - mean_y[codes]
+    slope = np.bincount(codes, weights=dx * dy, minlength=count) / np.bincount(
+        codes, weights=dx * dx, minlength=count
+    )
+    intercept = mean_y - slope * mean_x
+    residual = y - (intercept[codes] + slope[codes] * x)
+    ss_res = np.bincount(codes, weights=residual * residual, minlength=count)
+    ss_tot = np.bincount(codes, weights=dy * dy, minlength=count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(ss_tot > 0, 1.0 - ss_res / ss_tot, np.where(ss_res == 0, 1.0, 0.0))
+    max_x = np.full(count, -np.inf)
+    np.maximum.at(max_x, codes, x)
+    first = np.unique(codes, return_index=True)[1]
+    return GroupedFit(
+        keys=data[keys][rows].take(first).astype(str).reset_index(drop=True),
+        samples=samples,
+        slope=slope,
+        intercept=intercept,
+        mae=np.bincount(codes, weights=np.abs(residual), minlength=count) / samples,
+        r2=r2,
+        max_x=max_x,
+    )
+
+
 def train_tb_forecast_artifacts(
-    canonical_df: pd.DataFrame, output_dir: Path, horizon_years: int = 3
+    canonical_df: pd.DataFrame,
+    output_dir: Path,
+    horizon_years: int = 3,
+    group_keys: Sequence[str] = ("observation_code",),
 ) -> dict[str, str]:
     output_dir.mkdir(parents=True, exist_ok=True)
     tb_df = canonical_df.copy()
     tb_df["year"] = pd.to_datetime(tb_df["event_date"]).dt.year
+    fit = fit_grouped_ols(tb_df, group_keys, "year", "observation_value_num")
 
-    forecast_rows: list[dict[str, object]] = []
-    metric_rows: list[dict[str, object]] = []
-    for code, group in tb_df.groupby("observation_code"):
-        group = group.sort_values("year")
-        if group["year"].nunique() < 2:
-            continue
-        x = group[["year"]].astype(float)
-        y = group["observation_value_num"].astype(float)
-        model = LinearRegression()
-        model.fit(x, y)
-        pred = model.predict(x)
-        metric_rows.append(
-            {
-                "observation_code": str(code),
-                "samples": int(len(group)),
-                "mae": float(mean_absolute_error(y, pred)),
-                "r2": float(r2_score(y, pred)),
-            }
-        )
-
-        max_year = int(group["year"].max())
-        for year in range(max_year + 1, max_year + horizon_years + 1):
-            predicted = float(model.predict(pd.DataFrame({"year": [float(year)]}))[0])
-            forecast_rows.append(
-                {
-                    "observation_code": str(code),
-                    "forecast_year": int(year),
-                    "predicted_value": max(0.0, predicted),
-                }
-            )
-
-    forecast_df = pd.DataFrame(forecast_rows)
-    metrics_df = pd.DataFrame(metric_rows)
+    metrics_df = fit.keys.assign(samples=fit.samples.astype(np.int64), mae=fit.mae, r2=fit.r2)
+    groups, years, predicted = fit.predict(horizon_years)
+    forecast_df = fit.keys.iloc[groups].reset_index(drop=True)
+    forecast_df["forecast_year"] = years.astype(np.int64)
+    forecast_df["predicted_value"] = np.maximum(predicted, 0.0)
 
     forecast_path = output_dir / "tb_forecast.parquet"
     metrics_path = output_dir / "tb_forecast_metrics.json"
-    forecast_df.to_parquet(forecast_path, index=False)
-    metrics_path.write_text(
-        json.dumps(metrics_df.to_dict(orient="records"), indent=2), encoding="utf-8"
-    )
+    with HashingWriter(forecast_path) as sink:
+        forecast_df.to_parquet(sink, index=False)
+    write_text_hashed(metrics_path, json.dumps(metrics_df.to_dict(orient="records"), indent=2))
     return {"forecast": str(forecast_path), "forecast_metrics": str(metrics_path)}
+
+
+# Rolling-origin backtests: each fold trains on the first `origin` yearly points of a series and
+# scores forecasts for the next BACKTEST_HORIZON points, over the last BACKTEST_ORIGINS origins.
+BACKTEST_HORIZON = 3
+BACKTEST_ORIGINS = 5
+MIN_TRAIN_POINTS = 3
+FORECAST_WORKERS = 4
+# Spawning workers costs a few seconds of imports, about what this many series take serially.
+PARALLEL_MIN_SERIES = 5000
+FORECAST_BUDGET_SECONDS = 600.0
+SES_ALPHAS = np.linspace(0.1, 0.9, 9)
+DAMPED_GRID = np.array(
+    list(itertools.product([0.2, 0.5, 0.8], [0.1, 0.3], [0.8, 0.9, 0.98])), dtype=float
+)
+
+Forecaster = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+def linear_forecast(years: np.ndarray, values: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    if len(np.unique(years)) < 2:
+        return np.full(len(targets), values.mean())
+    slope, intercept = np.polyfit(years, values, 1)
+    result: np.ndarray = intercept + slope * targets
+    return result
+
+
+def ses_forecast(years: np.ndarray, values: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    # Simple exponential smoothing; alpha picked from SES_ALPHAS by one-step-ahead squared error.
+    level = np.full(len(SES_ALPHAS), values[0])
+    sse = np.zeros(len(SES_ALPHAS))
+    for value in values[1:]:
+        sse += (value - level) ** 2
+        level = SES_ALPHAS * value + (1 - SES_ALPHAS) * level
+    return np.full(len(targets), level[np.argmin(sse)])
+
+
+def damped_trend_forecast(years: np.ndarray, values: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    # Holt's damped additive trend over the DAMPED_GRID (alpha, beta, phi) combinations at once;
+    # years are treated as consecutive steps and horizons counted in years past the last point.
+    if len(values) < 2:
+        return np.full(len(targets), values[-1])
+    alpha, beta, phi = DAMPED_GRID.T
+    level = np.full(len(DAMPED_GRID), values[0])
+    trend = np.full(len(DAMPED_GRID), values[1] - values[0])
+    sse = np.zeros(len(DAMPED_GRID))
+    for value in values[1:]:
+        predicted = level + phi * trend
+        sse += (value - predicted) ** 2
+        previous = level
+        level = alpha * value + (1 - alpha) * predicted
+        trend = beta * (level - previous) + (1 - beta) * phi * trend
+    best = int(np.argmin(sse))
+    steps = np.maximum(targets - years[-1], 1).astype(int)
+    damping = np.cumsum(phi[best] ** np.arange(1, int(steps.max()) + 1))
+    result: np.ndarray = level[best] + trend[best] * damping[steps - 1]
+    return result
+
+
+# Listed in tie-break order: the simplest model wins equal backtest errors.
+FORECASTERS: dict[str, Forecaster] = {
+    "linear": linear_forecast,
+    "damped_trend": damped_trend_forecast,
+    "ses": ses_forecast,
+}
+
+
+def rolling_origin_errors(years: np.ndarray, values: np.ndarray) -> dict[str, np.ndarray]:
+    errors: dict[str, list[np.ndarray]] = {name: [] for name in FORECASTERS}
+    first = max(MIN_TRAIN_POINTS, len(values) - BACKTEST_ORIGINS)
+    for origin in range(first, len(values)):
+        targets = years[origin : origin + BACKTEST_HORIZON]
+        actual = values[origin : origin + BACKTEST_HORIZON]
+        for name, forecaster in FORECASTERS.items():
+            predicted = forecaster(years[:origin], values[:origin], targets)
+            errors[name].append(np.abs(actual - predicted))
+    return {name: np.concatenate(parts) if parts else np.zeros(0) for name, parts in errors.items()}
+
+
+def _forecast_rows(
+    key: list[str], model: str, years: np.ndarray, values: np.ndarray, horizon_years: int
+) -> list[list[Any]]:
+    targets = years[-1] + np.arange(1, horizon_years + 1, dtype=float)
+    predicted = FORECASTERS[model](years, values, targets)
+    return [
+        [*key, model, int(year), max(0.0, float(value))]
+        for year, value in zip(targets, predicted, strict=True)
+    ]
+
+
+def _backtest_series(
+    series: list[tuple[list[str], np.ndarray, np.ndarray]], horizon_years: int, deadline: float
+) -> list[dict[str, Any]]:
+    # Series left once the deadline passes fall back to the linear trend without a backtest.
+    results: list[dict[str, Any]] = []
+    for key, years, values in series:
+        result: dict[str, Any] = {"key": key, "folds": 0, "mae": {}}
+        if time.time() > deadline:
+            result["status"] = "budget_exceeded"
+        elif len(values) <= MIN_TRAIN_POINTS:
+            result["status"] = "insufficient_history"
+        else:
+            errors = rolling_origin_errors(years, values)
+            result["status"] = "ok"
+            result["folds"] = min(BACKTEST_ORIGINS, len(values) - MIN_TRAIN_POINTS)
+            result["mae"] = {name: float(error.mean()) for name, error in errors.items()}
+        mae = result["mae"]
+        result["selected"] = min(mae, key=mae.__getitem__) if mae else "linear"
+        result["forecast"] = _forecast_rows(key, result["selected"], years, values, horizon_years)
+        results.append(result)
+    return results
+
+
+def _yearly_series(
+    df: pd.DataFrame, group_keys: Sequence[str]
+) -> list[tuple[list[str], np.ndarray, np.ndarray]]:
+    # One point per series and year: the mean value, which the OLS trend fits on average anyway.
+    keys = list(group_keys)
+    data = df[[*keys, "event_date", "observation_value_num"]].dropna()
+    data = data.assign(
+        year=pd.to_datetime(data["event_date"]).dt.year.astype(float),
+        observation_value_num=data["observation_value_num"].astype(float),
+    )
+    yearly = data.groupby([*keys, "year"], sort=True)["observation_value_num"].mean()
+    series: list[tuple[list[str], np.ndarray, np.ndarray]] = []
+    for key, group in yearly.groupby(level=keys, sort=True):
+        key_values = list(key) if isinstance(key, tuple) else [key]
+        years = group.index.get_level_values("year").to_numpy(dtype=float)
+        series.append(([str(value) for value in key_values], years, group.to_numpy(dtype=float)))
+    return series
+
+
+def backtest_tb_forecasts(
+    canonical_df: pd.DataFrame,
+    output_dir: Path,
+    horizon_years: int = 3,
+    group_keys: Sequence[str] = ("observation_code",),
+    workers: int = FORECAST_WORKERS,
+    budget_seconds: float = FORECAST_BUDGET_SECONDS,
+) -> dict[str, str]:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    started = time.time()
+    deadline = started + budget_seconds
+    series = _yearly_series(canonical_df, group_keys)
+    chunks = [
+        [series[index] for index in chunk]
+        for chunk in np.array_split(np.arange(len(series)), max(1, min(len(series), workers * 4)))
+        if len(chunk)
+    ]
+    if workers <= 1 or len(chunks) <= 1 or len(series) < PARALLEL_MIN_SERIES:
+        parts = [_backtest_series(chunk, horizon_years, deadline) for chunk in chunks]
+    else:
+        # Spawned workers: the API and worker pools run threads, which fork does not copy safely.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+            futures = [
+                pool.submit(_backtest_series, chunk, horizon_years, deadline) for chunk in chunks
+            ]
+            parts = [future.result() for future in futures]
+    results = [result for part in parts for result in part]
+
+    keys = list(group_keys)
+    forecast_df = pd.DataFrame(
+        [row for result in results for row in result.pop("forecast")],
+        columns=[*keys, "model", "forecast_year", "predicted_value"],
+    ).astype({"forecast_year": "int64", "predicted_value": "float64"})
+    statuses = [result["status"] for result in results]
+    # Timing goes to the log, not the artifact, so identical inputs store identical bytes.
+    LOGGER.info(
+        "backtested %d series in %.3fs: %s",
+        len(results),
+        time.time() - started,
+        {status: statuses.count(status) for status in sorted(set(statuses))},
+    )
+    metrics = {
+        "models": list(FORECASTERS),
+        "horizon": BACKTEST_HORIZON,
+        "origins": BACKTEST_ORIGINS,
+        "budget_seconds": budget_seconds,
+        "status_counts": {status: statuses.count(status) for status in sorted(set(statuses))},
+        "series": [
+            {**dict(zip(keys, result.pop("key"), strict=True)), **result} for result in results
+        ],
+    }
+
+    forecast_path = output_dir / "tb_selected_forecast.parquet"
+    metrics_path = output_dir / "tb_backtest_metrics.json"
+    with HashingWriter(forecast_path) as sink:
+        forecast_df.to_parquet(sink, index=False)
+    write_text_hashed(metrics_path, json.dumps(metrics, indent=2))
+    return {"selected_forecast": str(forecast_path), "backtest_metrics": str(metrics_path)}
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import socket
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from types import FrameType
+
+from hdb.jobs import JOB_KIND_CONTINUOUS, LEASE_SECONDS, Job, claim_next_job, finish_job, heartbeat
+from pipelines.engine import run_build_job, run_continuous_build_if_due
+
+LOGGER = logging.getLogger(__name__)
+
+# Fallback wake-up for jobs enqueued by other processes; in-process enqueues call wake().
+IDLE_POLL_SECONDS = 2.0
+
+
+def run_job(job: Job) -> dict[str, str]:
+    if job.kind == JOB_KIND_CONTINUOUS:
+        return run_continuous_build_if_due(job.dataset_id)
+    return run_build_job(job.dataset_id, job.full_refresh)
+
+
+class _Heartbeat:
+    def __init__(self, queue_path: Path, job: Job, worker_id: str, lease_seconds: float) -> None:
+        self._queue_path = queue_path
+        self._job = job
+        self._worker_id = worker_id
+        self._lease_seconds = lease_seconds
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._beat, name=f"hdb-heartbeat-{job.id}", daemon=True
+        )
+
+    def __enter__(self) -> _Heartbeat:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._done.set()
+        self._thread.join()
+
+    def _beat(self) -> None:
+        while not self._done.wait(self._lease_seconds / 3):
+            try:
+                if not heartbeat(
+                    self._queue_path, self._job.id, self._worker_id, self._lease_seconds
+                ):
+                    LOGGER.warning("lost lease on job=%s; it may run again elsewhere", self._job.id)
+                    return
+            except Exception:
+                LOGGER.exception("heartbeat failed for job=%s", self._job.id)
+
+
+class BuildWorkerPool:
+    def __init__(
+        self,
+        queue_path: Path,
+        workers: int = 1,
+        build: Callable[[Job], dict[str, str]] = run_job,
+        idle_seconds: float = IDLE_POLL_SECONDS,
+        lease_seconds: float = LEASE_SECONDS,
+    ) -> None:
+        self._queue_path = queue_path
+        self._workers = workers
+        self._build = build
+        self._idle_seconds = idle_seconds
+        self._lease_seconds = lease_seconds
+        self._node = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for index in range(self._workers):
+            thread = threading.Thread(target=self._loop, name=f"hdb-build-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        LOGGER.info("build workers started count=%s queue=%s", self._workers, self._queue_path)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def request_stop(self) -> None:
+        # Running builds finish; queued jobs stay queued for any worker.
+        self._stop.set()
+        self._wake.set()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self.request_stop()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+    def run_one(self) -> Job | None:
+        worker_id = f"{self._node}:{threading.current_thread().name}"
+        job = claim_next_job(self._queue_path, worker_id, self._lease_seconds)
+        if job is None:
+            return None
+        LOGGER.info("build job=%s dataset_id=%s started on %s", job.id, job.dataset_id, worker_id)
+        with _Heartbeat(self._queue_path, job, worker_id, self._lease_seconds):
+            try:
+                result = self._build(job)
+            except Exception as exc:
+                LOGGER.exception("build job=%s dataset_id=%s failed", job.id, job.dataset_id)
+                error = str(exc) or type(exc).__name__
+                return finish_job(self._queue_path, job.id, worker_id, None, error)
+        return finish_job(self._queue_path, job.id, worker_id, result, None)
+
+    def drain(self) -> int:
+        # Runs jobs on the calling thread until none can be claimed.
+        count = 0
+        while not self._stop.is_set() and self.run_one() is not None:
+            count += 1
+        return count
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.run_one()
+            except Exception:
+                LOGGER.exception("build worker could not reach the queue")
+                job = None
+            if job is None:
+                self._wake.wait(self._idle_seconds)
+                self._wake.clear()
+
+
+def run_worker(queue_path: Path, workers: int = 1) -> None:
+    pool = BuildWorkerPool(queue_path, workers)
+
+    def _handle_signal(signum: int, frame: FrameType | None) -> None:
+        LOGGER.info("worker received signal=%s, stopping after running builds", signum)
+        pool.request_stop()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+    pool.start()
+    pool.join()
@@ -0,0 +1,576 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, cast
+
+from hdb.settings import get_settings
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifests (
+    dataset_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    status TEXT NOT NULL,
+    row_count INTEGER,
+    manifest_path TEXT NOT NULL,
+    hashes TEXT NOT NULL,
+    paths TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (dataset_id, timestamp)
+);
+CREATE TABLE IF NOT EXISTS latest (
+    dataset_id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    manifest_path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS published (
+    dataset_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    target TEXT NOT NULL,
+    published_at TEXT NOT NULL,
+    PRIMARY KEY (dataset_id, timestamp, target)
+);
+CREATE TABLE IF NOT EXISTS probes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataset_id TEXT NOT NULL,
+    probed_at TEXT NOT NULL,
+    fingerprint TEXT,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS probes_dataset ON probes (dataset_id, id);
+CREATE TABLE IF NOT EXISTS poll_state (
+    dataset_id TEXT PRIMARY KEY,
+    interval_minutes REAL NOT NULL,
+    next_poll_at TEXT NOT NULL,
+    unchanged_streak INTEGER NOT NULL,
+    last_outcome TEXT NOT NULL,
+    last_changed_at TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS breaker_state (
+    dataset_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    consecutive_failures INTEGER NOT NULL,
+    cooldown_minutes REAL NOT NULL,
+    open_until TEXT,
+    last_error TEXT,
+    updated_at TEXT NOT NULL
+);
+"""
+
+PROBE_LOG_LIMIT = 200
+
+_PATH_KEYS = ("bronze_outputs", "gold_outputs", "codebook", "sketches", "exporters", "models")
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    dataset_id: str
+    timestamp: str
+    status: str
+    row_count: int | None
+    manifest_path: Path
+
+
+# Catalog files (by path and inode) whose schema this process has already set up, and datasets
+# known to have no manifests, keyed to their manifest dir's mtime so a new run dir is noticed.
+_SCHEMA_READY: set[tuple[Path, int]] = set()
+_MISSING_DATASETS: dict[tuple[Path, Path, str], int | None] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def clear_catalog_cache() -> None:
+    with _CACHE_LOCK:
+        _SCHEMA_READY.clear()
+        _MISSING_DATASETS.clear()
+
+
+def connect_catalog(catalog_path: Path) -> sqlite3.Connection:
+    catalog_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(catalog_path, timeout=30.0)
+    connection.execute("PRAGMA synchronous=FULL")
+    key = (catalog_path.resolve(), catalog_path.stat().st_ino)
+    with _CACHE_LOCK:
+        ready = key in _SCHEMA_READY
+    if not ready:
+        # Worker nodes share the catalog like the queue: WAL needs shared memory on one host,
+        # so it uses the rollback journal, which only needs file locks. WAL catalogs convert.
+        if connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            connection.execute("PRAGMA journal_mode=DELETE")
+        connection.executescript(CATALOG_SCHEMA)
+        with _CACHE_LOCK:
+            _SCHEMA_READY.add(key)
+    return connection
+
+
+def _insert_manifest(
+    connection: sqlite3.Connection, manifest_path: Path, payload: dict[str, Any]
+) -> None:
+    dataset_id = str(payload["dataset_id"])
+    timestamp = str(payload["timestamp"])
+    row_count = payload.get("row_count")
+    connection.execute(
+        "INSERT OR REPLACE INTO manifests "
+        "(dataset_id, timestamp, status, row_count, manifest_path, hashes, paths, recorded_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            dataset_id,
+            timestamp,
+            str(payload.get("status", "success")),
+            None if row_count is None else int(row_count),
+            str(manifest_path),
+            json.dumps(payload.get("hashes", [])),
+            json.dumps({key: payload[key] for key in _PATH_KEYS if key in payload}),
+            datetime.now(UTC).isoformat(),
+        ),
+    )
+    connection.execute(
+        "INSERT INTO latest (dataset_id, timestamp, manifest_path) VALUES (?, ?, ?) "
+        "ON CONFLICT(dataset_id) DO UPDATE SET "
+        "timestamp = excluded.timestamp, manifest_path = excluded.manifest_path "
+        "WHERE excluded.timestamp >= latest.timestamp",
+        (dataset_id, timestamp, str(manifest_path)),
+    )
+
+
+def record_manifest(catalog_path: Path, manifest_path: Path, payload: dict[str, Any]) -> None:
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        _insert_manifest(connection, manifest_path, payload)
+
+
+def _disk_manifests(manifest_dir: Path, dataset_id: str) -> list[Path]:
+    dataset_root = manifest_dir / dataset_id
+    if not dataset_root.exists():
+        return []
+    return [
+        run_dir / "manifest.json"
+        for run_dir in sorted(item for item in dataset_root.iterdir() if item.is_dir())
+        if (run_dir / "manifest.json").exists()
+    ]
+
+
+def _index_dataset(connection: sqlite3.Connection, manifest_dir: Path, dataset_id: str) -> int:
+    connection.execute("DELETE FROM manifests WHERE dataset_id = ?", (dataset_id,))
+    connection.execute("DELETE FROM latest WHERE dataset_id = ?", (dataset_id,))
+    indexed = 0
+    for manifest_path in _disk_manifests(manifest_dir, dataset_id):
+        payload = json.loads(manifest_path.read_text(encoding="utf-8"))
+        payload.setdefault("dataset_id", dataset_id)
+        payload.setdefault("timestamp", manifest_path.parent.name)
+        _insert_manifest(connection, manifest_path, payload)
+        indexed += 1
+    return indexed
+
+
+def rebuild_catalog(catalog_path: Path, manifest_dir: Path) -> int:
+    dataset_ids = (
+        sorted(item.name for item in manifest_dir.iterdir() if item.is_dir())
+        if manifest_dir.exists()
+        else []
+    )
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        connection.execute("DELETE FROM manifests")
+        connection.execute("DELETE FROM latest")
+        return sum(_index_dataset(connection, manifest_dir, item) for item in dataset_ids)
+
+
+def _latest_row(
+    connection: sqlite3.Connection, dataset_id: str
+) -> tuple[str, str, int | None, str] | None:
+    row = connection.execute(
+        "SELECT m.timestamp, m.status, m.row_count, m.manifest_path "
+        "FROM latest l JOIN manifests m "
+        "ON m.dataset_id = l.dataset_id AND m.timestamp = l.timestamp "
+        "WHERE l.dataset_id = ?",
+        (dataset_id,),
+    ).fetchone()
+    return cast(tuple[str, str, int | None, str] | None, row)
+
+
+def _dataset_dir_mtime(manifest_dir: Path, dataset_id: str) -> int | None:
+    try:
+        return (manifest_dir / dataset_id).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def latest_catalog_entry(
+    catalog_path: Path, manifest_dir: Path, dataset_id: str
+) -> CatalogEntry | None:
+    # Manifests copied in by hand are picked up from disk; datasets with none are remembered
+    # so read paths do not take the write lock or rescan on every call.
+    with closing(connect_catalog(catalog_path)) as connection:
+        row = _latest_row(connection, dataset_id)
+        if row is None or not Path(row[3]).exists():
+            key = (catalog_path.resolve(), manifest_dir.resolve(), dataset_id)
+            mtime = _dataset_dir_mtime(manifest_dir, dataset_id)
+            with _CACHE_LOCK:
+                if key in _MISSING_DATASETS and _MISSING_DATASETS[key] == mtime:
+                    return None
+            if row is None and not _disk_manifests(manifest_dir, dataset_id):
+                with _CACHE_LOCK:
+                    _MISSING_DATASETS[key] = mtime
+                return None
+            with connection:
+                _index_dataset(connection, manifest_dir, dataset_id)
+            row = _latest_row(connection, dataset_id)
+            if row is None:
+                with _CACHE_LOCK:
+                    _MISSING_DATASETS[key] = mtime
+    if row is None:
+        return None
+    timestamp, status, row_count, manifest_path = row
+    return CatalogEntry(
+        dataset_id=dataset_id,
+        timestamp=timestamp,
+        status=status,
+        row_count=row_count,
+        manifest_path=Path(manifest_path),
+    )
+
+
+def latest_catalog_entries(catalog_path: Path) -> dict[str, CatalogEntry]:
+    # One read-only query for every dataset's latest run: no schema setup, no reindexing, so
+    # hot read paths never contend for the catalog's write lock.
+    if not catalog_path.exists():
+        return {}
+    uri = f"{catalog_path.resolve().as_uri()}?mode=ro"
+    with closing(sqlite3.connect(uri, uri=True, timeout=30.0)) as connection:
+        try:
+            rows = connection.execute(
+                "SELECT m.dataset_id, m.timestamp, m.status, m.row_count, m.manifest_path "
+                "FROM latest l JOIN manifests m "
+                "ON m.dataset_id = l.dataset_id AND m.timestamp = l.timestamp"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return {}
+    return {
+        dataset_id: CatalogEntry(
+            dataset_id=dataset_id,
+            timestamp=timestamp,
+            status=status,
+            row_count=row_count,
+            manifest_path=Path(manifest_path),
+        )
+        for dataset_id, timestamp, status, row_count, manifest_path in rows
+    }
+
+
+def latest_manifest_entry(dataset_id: str) -> CatalogEntry | None:
+    settings = get_settings()
+    return latest_catalog_entry(settings.catalog_path, settings.manifest_dir, dataset_id)
+
+
+def latest_manifest_path(dataset_id: str) -> Path:
+    entry = latest_manifest_entry(dataset_id)
+    if entry is None:
+        raise FileNotFoundError(f"No manifest found for dataset_id={dataset_id}")
+    return entry.manifest_path
+
+
+def load_latest_manifest(dataset_id: str) -> dict[str, Any]:
+    path = latest_manifest_path(dataset_id)
+    return cast(dict[str, Any], json.loads(path.read_text(encoding="utf-8")))
+
+
+def mark_published(catalog_path: Path, dataset_id: str, timestamp: str, target: str) -> None:
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO published (dataset_id, timestamp, target, published_at) "
+            "VALUES (?, ?, ?, ?)",
+            (dataset_id, timestamp, target, datetime.now(UTC).isoformat()),
+        )
+
+
+def published_timestamps(catalog_path: Path, dataset_id: str) -> set[str]:
+    with closing(connect_catalog(catalog_path)) as connection:
+        rows = connection.execute(
+            "SELECT DISTINCT timestamp FROM published WHERE dataset_id = ?", (dataset_id,)
+        ).fetchall()
+    return {str(row[0]) for row in rows}
+
+
+def forget_manifests(catalog_path: Path, dataset_id: str, timestamps: list[str]) -> None:
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        connection.executemany(
+            "DELETE FROM manifests WHERE dataset_id = ? AND timestamp = ?",
+            [(dataset_id, timestamp) for timestamp in timestamps],
+        )
+        connection.execute(
+            "DELETE FROM latest WHERE dataset_id = ? AND timestamp NOT IN "
+            "(SELECT timestamp FROM manifests WHERE dataset_id = ?)",
+            (dataset_id, dataset_id),
+        )
+
+
+@dataclass(frozen=True)
+class ProbeRecord:
+    dataset_id: str
+    probed_at: str
+    fingerprint: str | None
+    outcome: str
+
+
+def record_probe(
+    catalog_path: Path, dataset_id: str, fingerprint: str | None, outcome: str
+) -> None:
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        connection.execute(
+            "INSERT INTO probes (dataset_id, probed_at, fingerprint, outcome) VALUES (?, ?, ?, ?)",
+            (dataset_id, datetime.now(UTC).isoformat(), fingerprint, outcome),
+        )
+        connection.execute(
+            "DELETE FROM probes WHERE dataset_id = ? AND id <= "
+            "(SELECT id FROM probes WHERE dataset_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (dataset_id, dataset_id, PROBE_LOG_LIMIT),
+        )
+
+
+def recent_probes(catalog_path: Path, dataset_id: str, limit: int = 20) -> list[ProbeRecord]:
+    with closing(connect_catalog(catalog_path)) as connection:
+        rows = connection.execute(
+            "SELECT probed_at, fingerprint, outcome FROM probes WHERE dataset_id = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (dataset_id, limit),
+        ).fetchall()
+    return [
+        ProbeRecord(dataset_id=dataset_id, probed_at=row[0], fingerprint=row[1], outcome=row[2])
+        for row in rows
+    ]
+
+
+@dataclass(frozen=True)
+class PollState:
+    dataset_id: str
+    interval_minutes: float
+    next_poll_at: datetime
+    unchanged_streak: int
+    last_outcome: str
+    last_changed_at: datetime | None
+    updated_at: datetime
+
+
+_POLL_COLUMNS = (
+    "dataset_id, interval_minutes, next_poll_at, unchanged_streak, "
+    "last_outcome, last_changed_at, updated_at"
+)
+
+
+def _poll_state_from_row(row: tuple[Any, ...]) -> PollState:
+    return PollState(
+        dataset_id=str(row[0]),
+        interval_minutes=float(row[1]),
+        next_poll_at=datetime.fromisoformat(row[2]),
+        unchanged_streak=int(row[3]),
+        last_outcome=str(row[4]),
+        last_changed_at=None if row[5] is None else datetime.fromisoformat(row[5]),
+        updated_at=datetime.fromisoformat(row[6]),
+    )
+
+
+def poll_states(catalog_path: Path, dataset_id: str | None = None) -> list[PollState]:
+    query = f"SELECT {_POLL_COLUMNS} FROM poll_state"
+    params: tuple[str, ...] = ()
+    if dataset_id is not None:
+        query += " WHERE dataset_id = ?"
+        params = (dataset_id,)
+    with closing(connect_catalog(catalog_path)) as connection:
+        rows = connection.execute(query + " ORDER BY dataset_id", params).fetchall()
+    return [_poll_state_from_row(row) for row in rows]
+
+
+def update_poll_state(
+    catalog_path: Path,
+    dataset_id: str,
+    changed: bool,
+    min_interval_minutes: float,
+    max_interval_minutes: float,
+    backoff_factor: float,
+    now: datetime | None = None,
+) -> PollState:
+    now = now or datetime.now(UTC)
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        row = connection.execute(
+            f"SELECT {_POLL_COLUMNS} FROM poll_state WHERE dataset_id = ?", (dataset_id,)
+        ).fetchone()
+        previous = None if row is None else _poll_state_from_row(row)
+        if changed or previous is None:
+            interval = min_interval_minutes
+            streak = 0
+        else:
+            interval = previous.interval_minutes * backoff_factor
+            streak = previous.unchanged_streak + 1
+        interval = min(max(interval, min_interval_minutes), max_interval_minutes)
+        if changed:
+            last_changed_at: datetime | None = now
+        else:
+            last_changed_at = None if previous is None else previous.last_changed_at
+        state = PollState(
+            dataset_id=dataset_id,
+            interval_minutes=interval,
+            next_poll_at=now + timedelta(minutes=interval),
+            unchanged_streak=streak,
+            last_outcome="changed" if changed else "unchanged",
+            last_changed_at=last_changed_at,
+            updated_at=now,
+        )
+        connection.execute(
+            f"INSERT OR REPLACE INTO poll_state ({_POLL_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                state.dataset_id,
+                state.interval_minutes,
+                state.next_poll_at.isoformat(),
+                state.unchanged_streak,
+                state.last_outcome,
+                None if last_changed_at is None else last_changed_at.isoformat(),
+                state.updated_at.isoformat(),
+            ),
+        )
+    return state
+
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class BreakerState:
+    dataset_id: str
+    state: str
+    consecutive_failures: int
+    cooldown_minutes: float
+    open_until: datetime | None
+    last_error: str | None
+    updated_at: datetime
+
+
+_BREAKER_COLUMNS = (
+    "dataset_id, state, consecutive_failures, cooldown_minutes, open_until, last_error, updated_at"
+)
+
+
+def _breaker_state_from_row(row: tuple[Any, ...]) -> BreakerState:
+    return BreakerState(
+        dataset_id=str(row[0]),
+        state=str(row[1]),
+        consecutive_failures=int(row[2]),
+        cooldown_minutes=float(row[3]),
+        open_until=None if row[4] is None else datetime.fromisoformat(row[4]),
+        last_error=row[5],
+        updated_at=datetime.fromisoformat(row[6]),
+    )
+
+
+def _write_breaker_state(connection: sqlite3.Connection, state: BreakerState) -> None:
+    connection.execute(
+        f"INSERT OR REPLACE INTO breaker_state ({_BREAKER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            state.dataset_id,
+            state.state,
+            state.consecutive_failures,
+            state.cooldown_minutes,
+            None if state.open_until is None else state.open_until.isoformat(),
+            state.last_error,
+            state.updated_at.isoformat(),
+        ),
+    )
+
+
+def breaker_states(catalog_path: Path, dataset_id: str | None = None) -> list[BreakerState]:
+    query = f"SELECT {_BREAKER_COLUMNS} FROM breaker_state"
+    params: tuple[str, ...] = ()
+    if dataset_id is not None:
+        query += " WHERE dataset_id = ?"
+        params = (dataset_id,)
+    with closing(connect_catalog(catalog_path)) as connection:
+        rows = connection.execute(query + " ORDER BY dataset_id", params).fetchall()
+    return [_breaker_state_from_row(row) for row in rows]
+
+
+def acquire_breaker(catalog_path: Path, dataset_id: str, now: datetime | None = None) -> str:
+    # An expired open breaker turns half-open for exactly one caller; everyone else sees it open.
+    now = now or datetime.now(UTC)
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute(
+            f"SELECT {_BREAKER_COLUMNS} FROM breaker_state WHERE dataset_id = ?", (dataset_id,)
+        ).fetchone()
+        if row is None:
+            return BREAKER_CLOSED
+        state = _breaker_state_from_row(row)
+        if state.state == BREAKER_CLOSED:
+            return BREAKER_CLOSED
+        if state.state == BREAKER_HALF_OPEN:
+            # A trial is in flight; one that outlived a cool-down is assumed lost and reclaimed.
+            expires = state.updated_at + timedelta(minutes=state.cooldown_minutes)
+            if now < expires:
+                return BREAKER_OPEN
+        elif state.open_until is not None and now < state.open_until:
+            return BREAKER_OPEN
+        _write_breaker_state(
+            connection,
+            BreakerState(
+                dataset_id=dataset_id,
+                state=BREAKER_HALF_OPEN,
+                consecutive_failures=state.consecutive_failures,
+                cooldown_minutes=state.cooldown_minutes,
+                open_until=state.open_until,
+                last_error=state.last_error,
+                updated_at=now,
+            ),
+        )
+    return BREAKER_HALF_OPEN
+
+
+def record_breaker_result(
+    catalog_path: Path,
+    dataset_id: str,
+    error: str | None,
+    failure_threshold: int,
+    base_cooldown_minutes: float,
+    max_cooldown_minutes: float,
+    now: datetime | None = None,
+) -> BreakerState:
+    now = now or datetime.now(UTC)
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute(
+            f"SELECT {_BREAKER_COLUMNS} FROM breaker_state WHERE dataset_id = ?", (dataset_id,)
+        ).fetchone()
+        previous = None if row is None else _breaker_state_from_row(row)
+        failures = 0 if error is None else 1 + (previous.consecutive_failures if previous else 0)
+        cooldown = 0.0
+        if error is None:
+            status = BREAKER_CLOSED
+        elif previous is not None and previous.state == BREAKER_HALF_OPEN:
+            status = BREAKER_OPEN
+            cooldown = previous.cooldown_minutes * 2
+        elif failures >= failure_threshold:
+            status = BREAKER_OPEN
+            cooldown = base_cooldown_minutes
+        else:
+            status = BREAKER_CLOSED
+        if status == BREAKER_OPEN:
+            cooldown = min(max(cooldown, base_cooldown_minutes), max_cooldown_minutes)
+        state = BreakerState(
+            dataset_id=dataset_id,
+            state=status,
+            consecutive_failures=failures,
+            cooldown_minutes=cooldown,
+            open_until=now + timedelta(minutes=cooldown) if status == BREAKER_OPEN else None,
+            last_error=error,
+            updated_at=now,
+        )
+        _write_breaker_state(connection, state)
+    return state
+
+
+def reset_breaker(catalog_path: Path, dataset_id: str) -> None:
+    with closing(connect_catalog(catalog_path)) as connection, connection:
+        connection.execute("DELETE FROM breaker_state WHERE dataset_id = ?", (dataset_id,))
@@ -2,22 +2,14 @@ from __future__ import annotations
 
 import argparse
 import json
+from collections.abc import Callable
 from typing import Any
 
-import uvicorn
-from pipelines.engine import (
-    export_fhir_for_dataset,
-    export_omop_for_dataset,
-    run_all_datasets,
-    run_continuous_ingestion,
-    run_dataset_build,
-    validate_dataset_outputs,
-)
-
 from hdb.logging_config import configure_logging
-from hdb.publish import publish_all_targets, publish_to_huggingface, publish_to_kaggle
-from hdb.registry import load_registry
-from hdb.settings import get_settings
+from hdb.settings import Settings, get_settings
+
+# Handlers import their dependencies on first use: pandas, sklearn, uvicorn and the hub
+# clients cost seconds to import, and commands such as `hdb list` need none of them.
 
 
 def _build_parser() -> argparse.ArgumentParser:
@@ -29,10 +21,22 @@ def _build_parser() -> argparse.ArgumentParser:
     run = sub.add_parser("run")
     run.add_argument("dataset_id")
     run.add_argument("--full-refresh", action="store_true")
+    run.add_argument("--if-changed", action="store_true")
 
-    sub.add_parser("run-all")
+    run_all = sub.add_parser("run-all")
+    run_all.add_argument("--enqueue", action="store_true")
     run_cont = sub.add_parser("run-continuous")
     run_cont.add_argument("--dataset-id", default=None)
+    run_cont.add_argument("--enqueue", action="store_true")
+
+    daemon = sub.add_parser("daemon")
+    daemon.add_argument("--dataset-id", default=None)
+    daemon.add_argument("--workers", type=int, default=2)
+    daemon.add_argument("--watch", action="store_true")
+    daemon.add_argument("--enqueue", action="store_true")
+
+    worker = sub.add_parser("worker")
+    worker.add_argument("--workers", type=int, default=1)
 
     validate = sub.add_parser("validate")
     validate.add_argument("dataset_id")
@@ -40,9 +44,23 @@ def _build_parser() -> argparse.ArgumentParser:
     omop = sub.add_parser("export-omop")
     omop.add_argument("dataset_id")
 
+    omop_db = sub.add_parser("export-omop-db")
+    omop_db.add_argument("dataset_id")
+    omop_db.add_argument("--db", default=None)
+
+    compile_vocab = sub.add_parser("compile-vocab")
+    compile_vocab.add_argument("source_dir")
+    compile_vocab.add_argument("--out", default=None)
+
     fhir = sub.add_parser("export-fhir")
     fhir.add_argument("dataset_id")
 
+    fhir_bulk = sub.add_parser("export-fhir-bulk")
+    fhir_bulk.add_argument("dataset_id")
+    fhir_bulk.add_argument("--workers", type=int, default=4)
+    fhir_bulk.add_argument("--gzip", action="store_true")
+    fhir_bulk.add_argument("--max-file-mb", type=int, default=128)
+
     publish_hf = sub.add_parser("publish-hf")
     publish_hf.add_argument("dataset_id")
 
@@ -52,53 +70,261 @@ def _build_parser() -> argparse.ArgumentParser:
     publish_all = sub.add_parser("publish-all")
     publish_all.add_argument("dataset_id")
 
+    verify = sub.add_parser("verify")
+    verify.add_argument("dataset_id", nargs="?", default=None)
+    verify.add_argument("timestamp", nargs="?", default=None)
+    verify.add_argument("--full", action="store_true")
+    verify.add_argument("--workers", type=int, default=4)
+
+    sub.add_parser("rebuild-catalog")
+
+    poll_status = sub.add_parser("poll-status")
+    poll_status.add_argument("dataset_id", nargs="?", default=None)
+
+    breaker_status = sub.add_parser("breaker-status")
+    breaker_status.add_argument("dataset_id", nargs="?", default=None)
+    breaker_status.add_argument("--reset", action="store_true")
+
+    gc = sub.add_parser("gc")
+    gc.add_argument("dataset_id", nargs="?", default=None)
+    gc.add_argument("--dry-run", action="store_true")
+
     sub.add_parser("serve-api")
     return parser
 
 
+def _print(payload: Any) -> None:
+    print(json.dumps(payload, indent=2, default=str))
+
+
+def _list(args: argparse.Namespace, settings: Settings) -> int:
+    from hdb.registry import load_registry
+
+    registry = load_registry(settings.registry_path)
+    _print([d.model_dump() for d in registry.datasets])
+    return 0
+
+
+def _run(args: argparse.Namespace, settings: Settings) -> int:
+    from pipelines.engine import run_dataset_build, run_dataset_build_if_changed
+
+    if args.if_changed:
+        manifest_path = run_dataset_build_if_changed(args.dataset_id, args.full_refresh)
+        _print({"dataset_id": args.dataset_id, "built": manifest_path is not None})
+        return 0
+    run_dataset_build(args.dataset_id, full_refresh=args.full_refresh)
+    return 0
+
+
+def _run_all(args: argparse.Namespace, settings: Settings) -> int:
+    if args.enqueue:
+        from pipelines.engine import enqueue_all_datasets
+
+        _print(enqueue_all_datasets())
+        return 0
+
+    from pipelines.engine import run_all_datasets
+
+    run_all_datasets()
+    return 0
+
+
+def _run_continuous(args: argparse.Namespace, settings: Settings) -> int:
+    from pipelines.engine import run_continuous_ingestion
+
+    _print(run_continuous_ingestion(dataset_id=args.dataset_id, enqueue=args.enqueue))
+    return 0
+
+
+def _daemon(args: argparse.Namespace, settings: Settings) -> int:
+    from pipelines.daemon import run_daemon
+
+    run_daemon(
+        dataset_id=args.dataset_id,
+        max_workers=args.workers,
+        watch=args.watch,
+        enqueue=args.enqueue,
+    )
+    return 0
+
+
+def _worker(args: argparse.Namespace, settings: Settings) -> int:
+    from pipelines.worker import run_worker
+
+    run_worker(settings.queue_path, workers=args.workers)
+    return 0
+
+
+def _validate(args: argparse.Namespace, settings: Settings) -> int:
+    from pipelines.engine import validate_dataset_outputs
+
+    _print(validate_dataset_outputs(args.dataset_id))
+    return 0
+
+
+def _export_omop(args: argparse.Namespace, settings: Settings) -> int:
+    from pipelines.engine import export_omop_for_dataset
+
+    export_omop_for_dataset(args.dataset_id)
+    return 0
+
+
+def _export_omop_db(args: argparse.Namespace, settings: Settings) -> int:
+    from pathlib import Path
+
+    from pipelines.engine import load_omop_database
+
+    db_path = None if args.db is None else Path(args.db)
+    _print(load_omop_database(args.dataset_id, db_path))
+    return 0
+
+
+def _compile_vocab(args: argparse.Namespace, settings: Settings) -> int:
+    from pathlib import Path
+
+    from exporters.vocabulary import compile_vocabulary
+
+    index_dir = Path(args.out) if args.out is not None else settings.vocabulary_dir
+    _print({"index_dir": str(index_dir), **compile_vocabulary(Path(args.source_dir), index_dir)})
+    return 0
+
+
+def _export_fhir(args: argparse.Namespace, settings: Settings) -> int:
+    from pipelines.engine import export_fhir_for_dataset
+
+    export_fhir_for_dataset(args.dataset_id)
+    return 0
+
+
+def _export_fhir_bulk(args: argparse.Namespace, settings: Settings) -> int:
+    from pipelines.engine import export_fhir_bulk_for_dataset
+
+    manifest_path = export_fhir_bulk_for_dataset(
+        args.dataset_id,
+        workers=args.workers,
+        compress=args.gzip,
+        max_file_bytes=args.max_file_mb * 1024 * 1024,
+    )
+    _print({"manifest": str(manifest_path)})
+    return 0
+
+
+def _publish_hf(args: argparse.Namespace, settings: Settings) -> int:
+    from hdb.publish import publish_to_huggingface
+
+    _print(publish_to_huggingface(args.dataset_id))
+    return 0
+
+
+def _publish_kaggle(args: argparse.Namespace, settings: Settings) -> int:
+    from hdb.publish import publish_to_kaggle
+
+    _print(publish_to_kaggle(args.dataset_id))
+    return 0
+
+
+def _publish_all(args: argparse.Namespace, settings: Settings) -> int:
+    from hdb.publish import publish_all_targets
+
+    _print(publish_all_targets(args.dataset_id))
+    return 0
+
+
+def _verify(args: argparse.Namespace, settings: Settings) -> int:
+    from hdb.verify import snapshot_manifests, summarize_reports, verify_snapshots
+
+    manifests = snapshot_manifests(settings.manifest_dir, args.dataset_id, args.timestamp)
+    reports = verify_snapshots(manifests, full=args.full, max_workers=args.workers)
+    summary = summarize_reports(reports)
+    _print(summary)
+    return 0 if summary["corrupt"] == 0 else 1
+
+
+def _rebuild_catalog(args: argparse.Namespace, settings: Settings) -> int:
+    from hdb.catalog import rebuild_catalog
+
+    indexed = rebuild_catalog(settings.catalog_path, settings.manifest_dir)
+    _print({"catalog": str(settings.catalog_path), "manifests": indexed})
+    return 0
+
+
+def _poll_status(args: argparse.Namespace, settings: Settings) -> int:
+    from dataclasses import asdict
+
+    from hdb.catalog import poll_states
+
+    _print([asdict(state) for state in poll_states(settings.catalog_path, args.dataset_id)])
+    return 0
+
+
+def _breaker_status(args: argparse.Namespace, settings: Settings) -> int:
+    from dataclasses import asdict
+
+    from hdb.catalog import breaker_states, reset_breaker
+
+    if args.reset:
+        if args.dataset_id is None:
+            raise ValueError("--reset requires a dataset_id")
+        reset_breaker(settings.catalog_path, args.dataset_id)
+    _print([asdict(state) for state in breaker_states(settings.catalog_path, args.dataset_id)])
+    return 0
+
+
+def _gc(args: argparse.Namespace, settings: Settings) -> int:
+    from dataclasses import asdict
+
+    from hdb.gc import collect_garbage
+    from hdb.registry import load_registry
+
+    datasets = load_registry(settings.registry_path).dataset_map()
+    if args.dataset_id is not None and args.dataset_id not in datasets:
+        raise KeyError(f"Unknown dataset_id: {args.dataset_id}")
+    policies = {
+        dataset_id: dataset.retention
+        for dataset_id, dataset in datasets.items()
+        if args.dataset_id in (None, dataset_id)
+    }
+    _print(asdict(collect_garbage(settings, policies, dry_run=args.dry_run)))
+    return 0
+
+
+def _serve_api(args: argparse.Namespace, settings: Settings) -> int:
+    import uvicorn
+
+    uvicorn.run("apps.api.main:app", host="0.0.0.0", port=8000, reload=False)
+    return 0
+
+
+COMMANDS: dict[str, Callable[[argparse.Namespace, Settings], int]] = {
+    "list": _list,
+    "run": _run,
+    "run-all": _run_all,
+    "run-continuous": _run_continuous,
+    "daemon": _daemon,
+    "worker": _worker,
+    "validate": _validate,
+    "export-omop": _export_omop,
+    "export-omop-db": _export_omop_db,
+    "compile-vocab": _compile_vocab,
+    "export-fhir": _export_fhir,
+    "export-fhir-bulk": _export_fhir_bulk,
+    "publish-hf": _publish_hf,
+    "publish-kaggle": _publish_kaggle,
+    "publish-all": _publish_all,
+    "verify": _verify,
+    "rebuild-catalog": _rebuild_catalog,
+    "poll-status": _poll_status,
+    "breaker-status": _breaker_status,
+    "gc": _gc,
+    "serve-api": _serve_api,
+}
+
+
 def main(argv: list[str] | None = None) -> int:
     configure_logging()
     parser = _build_parser()
     args = parser.parse_args(argv)
-    settings = get_settings()
-
-    if args.command == "list":
-        registry = load_registry(settings.registry_path)
-        print(json.dumps([d.model_dump() for d in registry.datasets], indent=2))
-        return 0
-    if args.command == "run":
-        run_dataset_build(args.dataset_id, full_refresh=args.full_refresh)
-        return 0
-    if args.command == "run-all":
-        run_all_datasets()
-        return 0
-    if args.command == "run-continuous":
-        continuous_result = run_continuous_ingestion(dataset_id=args.dataset_id)
-        print(json.dumps(continuous_result, indent=2))
-        return 0
-    if args.command == "validate":
-        result: dict[str, Any] = validate_dataset_outputs(args.dataset_id)
-        print(json.dumps(result, indent=2))
-        return 0
-    if args.command == "export-omop":
-        export_omop_for_dataset(args.dataset_id)
-        return 0
-    if args.command == "export-fhir":
-        export_fhir_for_dataset(args.dataset_id)
-        return 0
-    if args.command == "publish-hf":
-        hf_result = publish_to_huggingface(args.dataset_id)
-        print(json.dumps(hf_result, indent=2))
-        return 0
-    if args.command == "publish-kaggle":
-        kaggle_result = publish_to_kaggle(args.dataset_id)
-        print(json.dumps(kaggle_result, indent=2))
-        return 0
-    if args.command == "publish-all":
-        all_result = publish_all_targets(args.dataset_id)
-        print(json.dumps(all_result, indent=2))
-        return 0
-    if args.command == "serve-api":
-        uvicorn.run("apps.api.main:app", host="0.0.0.0", port=8000, reload=False)
-        return 0
-    return 1
+    handler = COMMANDS.get(args.command)
+    if handler is None:
+        return 1
+    return handler(args, get_settings())
@@ -5,6 +5,8 @@ from pathlib import Path
 
 import pandas as pd
 
+from hdb.manifest import write_text_hashed
+
 
 def generate_codebook(df: pd.DataFrame, dataset_id: str, output_dir: Path) -> tuple[Path, Path]:
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -18,7 +20,7 @@ def generate_codebook(df: pd.DataFrame, dataset_id: str, output_dir: Path) -> tu
         for column in df.columns
     ]
     json_path = output_dir / f"{dataset_id}_data_dictionary.json"
-    json_path.write_text(json.dumps(dictionary, indent=2), encoding="utf-8")
+    write_text_hashed(json_path, json.dumps(dictionary, indent=2))
 
     md_lines = [
         f"# Codebook: {dataset_id}",
@@ -29,5 +31,5 @@ def generate_codebook(df: pd.DataFrame, dataset_id: str, output_dir: Path) -> tu
     for row in dictionary:
         md_lines.append(f"| {row['column']} | {row['dtype']} | {row['non_null']} | {row['null']} |")
     md_path = output_dir / f"{dataset_id}_codebook.md"
-    md_path.write_text("\n".join(md_lines) + "\n", encoding="utf-8")
+    write_text_hashed(md_path, "\n".join(md_lines) + "\n")
     return json_path, md_path
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+# (low, high) for minute, hour, day of month, month, day of week (0 and 7 are Sunday).
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_SEARCH_LIMIT = timedelta(days=5 * 366)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]
+    any_day: bool
+    any_weekday: bool
+
+
+def _parse_field(text: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if step < 1:
+            raise ValueError(f"invalid cron step: {part!r}")
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            first, last = base.split("-", 1)
+            start, end = int(first), int(last)
+        else:
+            start = int(base)
+            end = high if step_text else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"cron field out of range: {part!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+def parse_cron(expression: str) -> CronSchedule:
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"expected 5 cron fields, got {expression!r}")
+    minutes, hours, days, months, weekdays = (
+        _parse_field(text, low, high)
+        for text, (low, high) in zip(fields, _FIELD_RANGES, strict=True)
+    )
+    return CronSchedule(
+        minutes=minutes,
+        hours=hours,
+        days=days,
+        months=months,
+        weekdays=frozenset(day % 7 for day in weekdays),
+        any_day=fields[2].startswith("*"),
+        any_weekday=fields[4].startswith("*"),
+    )
+
+
+def _day_matches(schedule: CronSchedule, value: datetime) -> bool:
+    day_match = value.day in schedule.days
+    weekday_match = (value.weekday() + 1) % 7 in schedule.weekdays
+    if schedule.any_day or schedule.any_weekday:
+        return day_match and weekday_match
+    # Like cron, a restricted day-of-month and day-of-week match when either does.
+    return day_match or weekday_match
+
+
+def next_run(schedule: CronSchedule, after: datetime) -> datetime:
+    candidate = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = candidate + _SEARCH_LIMIT
+    while candidate <= limit:
+        if candidate.month not in schedule.months:
+            year, month = divmod(candidate.year * 12 + candidate.month, 12)
+            candidate = candidate.replace(year=year, month=month + 1, day=1, hour=0, minute=0)
+        elif not _day_matches(schedule, candidate):
+            candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+        elif candidate.hour not in schedule.hours:
+            candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+        elif candidate.minute not in schedule.minutes:
+            candidate += timedelta(minutes=1)
+        else:
+            return candidate
+    raise ValueError("cron schedule never fires")
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, cast
+
+import pandas as pd
+
+from hdb.manifest import write_text_hashed
+
+SKETCH_VERSION = "sketch_v1"
+SKETCH_QUANTILES = (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+VALUE_COLUMN = "observation_value_num"
+CODE_COLUMN = "observation_code"
+
+ROW_COUNT_JUMP_RATIO = 0.2
+NULL_RATE_SHIFT = 0.1
+MEAN_SHIFT_STDS = 0.5
+# Floor for the spread a mean shift is measured in, as a fraction of the previous mean, so
+# constant series do not turn any change into billions of standard deviations.
+MIN_SPREAD_RATIO = 0.01
+QUANTILE_SHIFT_RATIO = 0.25
+
+
+def _numeric_summary(series: pd.Series) -> dict[str, Any]:
+    values = series.dropna().astype(float)
+    if values.empty:
+        return {"mean": None, "std": None, "quantiles": []}
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=0)),
+        "quantiles": [float(item) for item in values.quantile(list(SKETCH_QUANTILES))],
+    }
+
+
+def build_sketches(df: pd.DataFrame) -> dict[str, Any]:
+    columns: dict[str, dict[str, Any]] = {}
+    for column in df.columns:
+        series = df[column]
+        summary: dict[str, Any] = {
+            "dtype": str(series.dtype),
+            "null": int(series.isna().sum()),
+        }
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            summary.update(_numeric_summary(series))
+        columns[str(column)] = summary
+
+    codes: dict[str, dict[str, Any]] = {}
+    if CODE_COLUMN in df.columns and VALUE_COLUMN in df.columns:
+        grouped = df.groupby(CODE_COLUMN, sort=True)[VALUE_COLUMN]
+        counts = grouped.size()
+        means = grouped.mean()
+        stds = grouped.std(ddof=0)
+        quantiles = grouped.quantile(pd.Index(SKETCH_QUANTILES)).unstack()
+        for code in counts.index:
+            codes[str(code)] = {
+                "count": int(counts[code]),
+                "mean": float(means[code]),
+                "std": float(stds[code]),
+                "quantiles": [float(item) for item in quantiles.loc[code]],
+            }
+
+    return {
+        "version": SKETCH_VERSION,
+        "quantiles": list(SKETCH_QUANTILES),
+        "row_count": int(len(df)),
+        "columns": columns,
+        "observation_codes": codes,
+    }
+
+
+def write_sketches(sketches: dict[str, Any], output_dir: Path) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / "sketches.json"
+    write_text_hashed(path, json.dumps(sketches, indent=2))
+    return path
+
+
+def load_sketches(path: Path) -> dict[str, Any] | None:
+    if not path.exists():
+        return None
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    if payload.get("version") != SKETCH_VERSION:
+        return None
+    return cast(dict[str, Any], payload)
+
+
+def _change_ratio(previous: float, current: float) -> float:
+    return abs(current - previous) / max(abs(previous), 1.0)
+
+
+def _distribution_findings(
+    scope: str, key: str, previous: dict[str, Any], current: dict[str, Any]
+) -> list[dict[str, Any]]:
+    findings: list[dict[str, Any]] = []
+    if previous.get("mean") is None or current.get("mean") is None:
+        return findings
+
+    previous_mean = float(previous["mean"])
+    spread = max(float(previous["std"]), abs(previous_mean) * MIN_SPREAD_RATIO, 1e-9)
+    mean_shift = abs(float(current["mean"]) - previous_mean) / spread
+    # A single previous value has no spread to measure a shift against.
+    if previous.get("count", 2) >= 2 and mean_shift > MEAN_SHIFT_STDS:
+        findings.append(
+            {
+                "scope": scope,
+                "key": key,
+                "metric": "mean_shift_stds",
+                "previous": previous["mean"],
+                "current": current["mean"],
+                "score": round(mean_shift, 6),
+            }
+        )
+
+    prev_q = [float(item) for item in previous["quantiles"]]
+    curr_q = [float(item) for item in current["quantiles"]]
+    if len(prev_q) == len(curr_q) and prev_q:
+        value_range = max(prev_q[-1] - prev_q[0], abs(prev_q[len(prev_q) // 2]), 1e-9)
+        quantile_shift = sum(abs(a - b) for a, b in zip(prev_q, curr_q, strict=True)) / (
+            len(prev_q) * value_range
+        )
+        if quantile_shift > QUANTILE_SHIFT_RATIO:
+            findings.append(
+                {
+                    "scope": scope,
+                    "key": key,
+                    "metric": "quantile_shift",
+                    "previous": prev_q,
+                    "current": curr_q,
+                    "score": round(quantile_shift, 6),
+                }
+            )
+    return findings
+
+
+def compare_sketches(previous: dict[str, Any] | None, current: dict[str, Any]) -> dict[str, Any]:
+    if previous is None:
+        return {"status": "baseline", "row_count": None, "findings": []}
+
+    findings: list[dict[str, Any]] = []
+    prev_rows = int(previous["row_count"])
+    curr_rows = int(current["row_count"])
+    row_ratio = _change_ratio(prev_rows, curr_rows)
+    row_count = {
+        "previous": prev_rows,
+        "current": curr_rows,
+        "change_ratio": round(row_ratio, 6),
+        "flagged": row_ratio > ROW_COUNT_JUMP_RATIO,
+    }
+    if row_count["flagged"]:
+        findings.append(
+            {
+                "scope": "dataset",
+                "key": "row_count",
+                "metric": "row_count_jump",
+                "previous": prev_rows,
+                "current": curr_rows,
+                "score": round(row_ratio, 6),
+            }
+        )
+
+    for column, curr_summary in current["columns"].items():
+        prev_summary = previous["columns"].get(column)
+        if prev_summary is None:
+            findings.append({"scope": "column", "key": column, "metric": "added"})
+            continue
+        prev_null = int(prev_summary["null"]) / max(prev_rows, 1)
+        curr_null = int(curr_summary["null"]) / max(curr_rows, 1)
+        if abs(curr_null - prev_null) > NULL_RATE_SHIFT:
+            findings.append(
+                {
+                    "scope": "column",
+                    "key": column,
+                    "metric": "null_rate_shift",
+                    "previous": round(prev_null, 6),
+                    "current": round(curr_null, 6),
+                    "score": round(abs(curr_null - prev_null), 6),
+                }
+            )
+        findings.extend(_distribution_findings("column", column, prev_summary, curr_summary))
+    for column in previous["columns"]:
+        if column not in current["columns"]:
+            findings.append({"scope": "column", "key": column, "metric": "removed"})
+
+    prev_codes = previous["observation_codes"]
+    curr_codes = current["observation_codes"]
+    for code, curr_summary in curr_codes.items():
+        prev_summary = prev_codes.get(code)
+        if prev_summary is None:
+            findings.append({"scope": "observation_code", "key": code, "metric": "added"})
+            continue
+        count_ratio = _change_ratio(int(prev_summary["count"]), int(curr_summary["count"]))
+        if count_ratio > ROW_COUNT_JUMP_RATIO:
+            findings.append(
+                {
+                    "scope": "observation_code",
+                    "key": code,
+                    "metric": "row_count_jump",
+                    "previous": prev_summary["count"],
+                    "current": curr_summary["count"],
+                    "score": round(count_ratio, 6),
+                }
+            )
+        findings.extend(
+            _distribution_findings("observation_code", code, prev_summary, curr_summary)
+        )
+    for code in prev_codes:
+        if code not in curr_codes:
+            findings.append({"scope": "observation_code", "key": code, "metric": "removed"})
+
+    return {
+        "status": "drift" if findings else "ok",
+        "row_count": row_count,
+        "findings": findings,
+    }
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from collections import Counter
+from collections.abc import Callable, Hashable, Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from hdb.catalog import forget_manifests, published_timestamps
+from hdb.locking import dataset_lock
+from hdb.registry import RetentionPolicy
+from hdb.settings import RUN_LAYERS, Settings
+
+STAGING_MAX_AGE_SECONDS = 24 * 60 * 60
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+
+_InodeKey = tuple[int, int]
+
+
+@dataclass(frozen=True)
+class DatasetGc:
+    dataset_id: str
+    kept: list[str]
+    pruned: list[str]
+
+
+@dataclass(frozen=True)
+class GcReport:
+    dry_run: bool
+    datasets: list[DatasetGc]
+    staging_removed: list[str] = field(default_factory=list)
+    objects_removed: int = 0
+    bytes_reclaimed: int = 0
+
+
+def _parse_timestamp(timestamp: str) -> datetime | None:
+    try:
+        return datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def _newest_per_bucket(
+    ordered: list[str], count: int, bucket: Callable[[datetime], Hashable]
+) -> set[str]:
+    keep: set[str] = set()
+    seen: set[Hashable] = set()
+    for timestamp in ordered:
+        if len(seen) >= count:
+            break
+        parsed = _parse_timestamp(timestamp)
+        if parsed is None:
+            continue
+        key = bucket(parsed)
+        if key not in seen:
+            seen.add(key)
+            keep.add(timestamp)
+    return keep
+
+
+def select_runs_to_keep(
+    timestamps: Iterable[str], policy: RetentionPolicy, published: set[str] | None = None
+) -> set[str]:
+    ordered = sorted(set(timestamps), reverse=True)
+    if policy.keep_last is None:
+        return set(ordered)
+    # The newest run backs the catalog's "latest" entry, so it always survives.
+    keep = set(ordered[: max(policy.keep_last, 1)])
+    keep |= _newest_per_bucket(ordered, policy.keep_daily, lambda value: value.date())
+    keep |= _newest_per_bucket(
+        ordered, policy.keep_weekly, lambda value: tuple(value.isocalendar())[:2]
+    )
+    keep |= {timestamp for timestamp in ordered if _parse_timestamp(timestamp) is None}
+    if policy.keep_published and published:
+        keep |= published & set(ordered)
+    return keep
+
+
+def _dataset_runs(settings: Settings, dataset_id: str) -> dict[str, bool]:
+    roots = [settings.data_dir / layer / dataset_id for layer in RUN_LAYERS]
+    roots.append(settings.manifest_dir / dataset_id)
+    runs: dict[str, bool] = {}
+    for root in roots:
+        if not root.exists():
+            continue
+        for item in root.iterdir():
+            if item.is_dir() and not item.name.startswith("."):
+                runs.setdefault(item.name, False)
+    for timestamp in runs:
+        manifest = settings.manifest_dir / dataset_id / timestamp / "manifest.json"
+        runs[timestamp] = manifest.exists()
+    return runs
+
+
+def _tree_files(root: Path) -> list[os.stat_result]:
+    stats: list[os.stat_result] = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            try:
+                stats.append(os.lstat(os.path.join(directory, name)))
+            except FileNotFoundError:
+                continue
+    return stats
+
+
+def _store_inodes(store_dir: Path) -> dict[_InodeKey, os.stat_result]:
+    inodes: dict[_InodeKey, os.stat_result] = {}
+    if not store_dir.exists():
+        return inodes
+    for path in store_dir.glob("*/*"):
+        stat = path.lstat()
+        inodes[(stat.st_dev, stat.st_ino)] = stat
+    return inodes
+
+
+def _reclaimed(
+    removed: list[os.stat_result], store: dict[_InodeKey, os.stat_result]
+) -> tuple[int, int]:
+    # Link counts come from the first stat of each inode, taken before anything was deleted.
+    counts: Counter[_InodeKey] = Counter()
+    stats = dict(store)
+    for stat in removed:
+        key = (stat.st_dev, stat.st_ino)
+        counts[key] += 1
+        stats.setdefault(key, stat)
+    reclaimed = 0
+    orphaned = 0
+    for key, stat in stats.items():
+        remaining = stat.st_nlink - counts[key]
+        if key in store and remaining == 1:
+            orphaned += 1
+            remaining = 0
+        if remaining <= 0:
+            reclaimed += stat.st_size
+    return reclaimed, orphaned
+
+
+def _remove_trees(paths: list[Path]) -> None:
+    for path in paths:
+        if path.exists():
+            shutil.rmtree(path)
+
+
+def _sweep_objects(store_dir: Path) -> int:
+    removed = 0
+    for path in store_dir.glob("*/*"):
+        try:
+            # A single remaining link means no run references the object. A build that links
+            # it concurrently keeps its own copy, so losing the race only costs deduplication.
+            if path.lstat().st_nlink == 1:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def _stale_staging(settings: Settings, dataset_ids: list[str], now: float) -> list[Path]:
+    stale: list[Path] = []
+    for dataset_id in dataset_ids:
+        root = settings.staging_dir / dataset_id
+        if not root.exists():
+            continue
+        stale.extend(
+            item
+            for item in sorted(root.iterdir())
+            if item.is_dir() and now - item.stat().st_mtime > STAGING_MAX_AGE_SECONDS
+        )
+    return stale
+
+
+def collect_garbage(
+    settings: Settings,
+    policies: dict[str, RetentionPolicy],
+    dry_run: bool = False,
+    now: float | None = None,
+) -> GcReport:
+    store = _store_inodes(settings.object_dir)
+    removed: list[os.stat_result] = []
+    datasets: list[DatasetGc] = []
+    for dataset_id, policy in sorted(policies.items()):
+        with dataset_lock(settings.lock_dir, dataset_id):
+            runs = _dataset_runs(settings, dataset_id)
+            published = published_timestamps(settings.catalog_path, dataset_id)
+            keep = select_runs_to_keep(
+                [timestamp for timestamp, complete in runs.items() if complete], policy, published
+            )
+            pruned = sorted(timestamp for timestamp in runs if timestamp not in keep)
+            for timestamp in pruned:
+                for path in settings.run_dirs(dataset_id, timestamp).values():
+                    removed.extend(_tree_files(path))
+            if not dry_run and pruned:
+                for timestamp in pruned:
+                    _remove_trees(list(settings.run_dirs(dataset_id, timestamp).values()))
+                forget_manifests(settings.catalog_path, dataset_id, pruned)
+            datasets.append(DatasetGc(dataset_id=dataset_id, kept=sorted(keep), pruned=pruned))
+
+    staging = _stale_staging(settings, sorted(policies), time.time() if now is None else now)
+    for path in staging:
+        removed.extend(_tree_files(path))
+    reclaimed, objects_removed = _reclaimed(removed, store)
+    if not dry_run:
+        _remove_trees(staging)
+        objects_removed = _sweep_objects(settings.object_dir)
+    return GcReport(
+        dry_run=dry_run,
+        datasets=datasets,
+        staging_removed=[str(path) for path in staging],
+        objects_removed=objects_removed,
+        bytes_reclaimed=reclaimed,
+    )
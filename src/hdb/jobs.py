@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+JOB_KIND_BUILD = "build"
+JOB_KIND_CONTINUOUS = "continuous"
+
+# Workers heartbeat well inside the lease; a job whose lease lapses is assumed orphaned by a
+# crashed worker and goes back to the queue, up to MAX_ATTEMPTS claims in total.
+LEASE_SECONDS = 60.0
+MAX_ATTEMPTS = 3
+# Lease times come from each node's wall clock (SQLite has no server clock to share). A lease
+# is only taken over once it has been expired this long by the claiming node's clock, so nodes
+# whose clocks agree within this margin never steal a live lease.
+CLOCK_SKEW_SECONDS = 15.0
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataset_id TEXT NOT NULL,
+    full_refresh INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+DROP INDEX IF EXISTS jobs_one_queued_per_dataset;
+"""
+
+# Columns added after the first queue release; existing queue files are migrated in place.
+_ADDED_COLUMNS = {
+    "kind": "TEXT NOT NULL DEFAULT 'build'",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "worker_id": "TEXT",
+    "lease_expires_at": "TEXT",
+}
+_QUEUED_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS jobs_one_queued_per_dataset_kind "
+    "ON jobs (dataset_id, kind) WHERE status = 'queued'"
+)
+
+_JOB_COLUMNS = (
+    "id, dataset_id, full_refresh, status, created_at, started_at, finished_at, result, error, "
+    "kind, attempts, worker_id, lease_expires_at"
+)
+
+
+@dataclass(frozen=True)
+class Job:
+    id: int
+    dataset_id: str
+    full_refresh: bool
+    status: str
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+    result: dict[str, Any] | None
+    error: str | None
+    kind: str
+    attempts: int
+    worker_id: str | None
+    lease_expires_at: datetime | None
+
+
+def _parse_time(value: str | None) -> datetime | None:
+    return None if value is None else datetime.fromisoformat(value)
+
+
+def _job_from_row(row: tuple[Any, ...]) -> Job:
+    return Job(
+        id=int(row[0]),
+        dataset_id=str(row[1]),
+        full_refresh=bool(row[2]),
+        status=str(row[3]),
+        created_at=datetime.fromisoformat(row[4]),
+        started_at=_parse_time(row[5]),
+        finished_at=_parse_time(row[6]),
+        result=None if row[7] is None else json.loads(row[7]),
+        error=row[8],
+        kind=str(row[9]),
+        attempts=int(row[10]),
+        worker_id=row[11],
+        lease_expires_at=_parse_time(row[12]),
+    )
+
+
+# Queue files (by path and inode) whose journal mode and schema this process has set up.
+_QUEUE_READY: set[tuple[Path, int]] = set()
+_QUEUE_LOCK = threading.Lock()
+
+
+def clear_queue_cache() -> None:
+    with _QUEUE_LOCK:
+        _QUEUE_READY.clear()
+
+
+def connect_queue(queue_path: Path) -> sqlite3.Connection:
+    queue_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(queue_path, timeout=30.0)
+    connection.execute("PRAGMA synchronous=FULL")
+    key = (queue_path.resolve(), queue_path.stat().st_ino)
+    with _QUEUE_LOCK:
+        ready = key in _QUEUE_READY
+    if ready:
+        return connection
+    # The queue is shared across nodes: WAL needs shared memory on one host, so it uses the
+    # rollback journal, which only needs working file locks. Older WAL queue files convert.
+    if connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        connection.execute("PRAGMA journal_mode=DELETE")
+    connection.executescript(QUEUE_SCHEMA)
+    existing = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+    for name, definition in _ADDED_COLUMNS.items():
+        if name not in existing:
+            connection.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+    connection.execute(_QUEUED_INDEX)
+    connection.commit()
+    with _QUEUE_LOCK:
+        _QUEUE_READY.add(key)
+    return connection
+
+
+def _select_job(connection: sqlite3.Connection, job_id: int) -> Job | None:
+    row = connection.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return None if row is None else _job_from_row(row)
+
+
+def enqueue_build(
+    queue_path: Path, dataset_id: str, full_refresh: bool = False, kind: str = JOB_KIND_BUILD
+) -> tuple[Job, bool]:
+    # Returns (job, created). A job of the same kind already waiting for the dataset absorbs
+    # the request; a full refresh request upgrades it rather than queueing a second build.
+    now = datetime.now(UTC).isoformat()
+    with closing(connect_queue(queue_path)) as connection, connection:
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute(
+            "SELECT id FROM jobs WHERE dataset_id = ? AND kind = ? AND status = ?",
+            (dataset_id, kind, JOB_QUEUED),
+        ).fetchone()
+        if row is not None:
+            if full_refresh:
+                connection.execute("UPDATE jobs SET full_refresh = 1 WHERE id = ?", (row[0],))
+            job = _select_job(connection, int(row[0]))
+            created = False
+        else:
+            cursor = connection.execute(
+                "INSERT INTO jobs (dataset_id, full_refresh, status, created_at, kind) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (dataset_id, int(full_refresh), JOB_QUEUED, now, kind),
+            )
+            job = _select_job(connection, int(cursor.lastrowid or 0))
+            created = True
+    assert job is not None
+    return job, created
+
+
+def get_job(queue_path: Path, job_id: int) -> Job | None:
+    with closing(connect_queue(queue_path)) as connection:
+        return _select_job(connection, job_id)
+
+
+def list_jobs(
+    queue_path: Path, status: str | None = None, dataset_id: str | None = None, limit: int = 100
+) -> list[Job]:
+    clauses: list[str] = []
+    params: list[Any] = []
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status)
+    if dataset_id is not None:
+        clauses.append("dataset_id = ?")
+        params.append(dataset_id)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    with closing(connect_queue(queue_path)) as connection:
+        rows = connection.execute(
+            f"SELECT {_JOB_COLUMNS} FROM jobs{where} ORDER BY id DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+    return [_job_from_row(row) for row in rows]
+
+
+def cancel_job(queue_path: Path, job_id: int) -> Job | None:
+    # Only queued jobs can be cancelled; a running build is never interrupted mid-publish.
+    now = datetime.now(UTC).isoformat()
+    with closing(connect_queue(queue_path)) as connection, connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (JOB_CANCELLED, now, job_id, JOB_QUEUED),
+        )
+        return _select_job(connection, job_id)
+
+
+def _expire_leases(connection: sqlite3.Connection, now: datetime, skew_seconds: float) -> None:
+    rows = connection.execute(
+        f"SELECT {_JOB_COLUMNS} FROM jobs WHERE status = ?", (JOB_RUNNING,)
+    ).fetchall()
+    cutoff = now - timedelta(seconds=skew_seconds)
+    for job in map(_job_from_row, rows):
+        if job.lease_expires_at is None or job.lease_expires_at > cutoff:
+            continue
+        duplicate = connection.execute(
+            "SELECT id FROM jobs WHERE dataset_id = ? AND kind = ? AND status = ?",
+            (job.dataset_id, job.kind, JOB_QUEUED),
+        ).fetchone()
+        if duplicate is None and job.attempts < MAX_ATTEMPTS:
+            connection.execute(
+                "UPDATE jobs SET status = ?, worker_id = NULL, lease_expires_at = NULL, "
+                "error = ? WHERE id = ?",
+                (JOB_QUEUED, f"lease expired on worker {job.worker_id}", job.id),
+            )
+            continue
+        reason = (
+            f"lease expired after {job.attempts} attempts"
+            if duplicate is None
+            else f"lease expired; superseded by job {duplicate[0]}"
+        )
+        connection.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, worker_id = NULL, "
+            "lease_expires_at = NULL, error = ? WHERE id = ?",
+            (JOB_FAILED, now.isoformat(), reason, job.id),
+        )
+
+
+def claim_next_job(
+    queue_path: Path,
+    worker_id: str,
+    lease_seconds: float = LEASE_SECONDS,
+    skew_seconds: float = CLOCK_SKEW_SECONDS,
+) -> Job | None:
+    # Oldest queued job whose dataset is not already building on some worker.
+    with closing(connect_queue(queue_path)) as connection, connection:
+        connection.execute("BEGIN IMMEDIATE")
+        # Read the clock once the write lock is held, so expiry and the new lease agree.
+        now = datetime.now(UTC)
+        _expire_leases(connection, now, skew_seconds)
+        row = connection.execute(
+            "SELECT id FROM jobs WHERE status = ? AND dataset_id NOT IN "
+            "(SELECT dataset_id FROM jobs WHERE status = ?) ORDER BY id LIMIT 1",
+            (JOB_QUEUED, JOB_RUNNING),
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute(
+            "UPDATE jobs SET status = ?, started_at = ?, worker_id = ?, lease_expires_at = ?, "
+            "attempts = attempts + 1 WHERE id = ?",
+            (
+                JOB_RUNNING,
+                now.isoformat(),
+                worker_id,
+                (now + timedelta(seconds=lease_seconds)).isoformat(),
+                row[0],
+            ),
+        )
+        return _select_job(connection, int(row[0]))
+
+
+def heartbeat(
+    queue_path: Path, job_id: int, worker_id: str, lease_seconds: float = LEASE_SECONDS
+) -> bool:
+    # False means the lease was lost (expired and requeued); the worker should stop reporting.
+    expires = datetime.now(UTC) + timedelta(seconds=lease_seconds)
+    with closing(connect_queue(queue_path)) as connection, connection:
+        cursor = connection.execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = ? AND worker_id = ?",
+            (expires.isoformat(), job_id, JOB_RUNNING, worker_id),
+        )
+        return cursor.rowcount == 1
+
+
+def finish_job(
+    queue_path: Path,
+    job_id: int,
+    worker_id: str,
+    result: dict[str, Any] | None,
+    error: str | None,
+) -> Job | None:
+    # Only the lease holder can finish a job; a worker that lost its lease leaves it alone.
+    now = datetime.now(UTC).isoformat()
+    with closing(connect_queue(queue_path)) as connection, connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, "
+            "lease_expires_at = NULL WHERE id = ? AND status = ? AND worker_id = ?",
+            (
+                JOB_SUCCEEDED if error is None else JOB_FAILED,
+                now,
+                None if result is None else json.dumps(result),
+                error,
+                job_id,
+                JOB_RUNNING,
+                worker_id,
+            ),
+        )
+        return _select_job(connection, job_id)
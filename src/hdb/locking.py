@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+LOCK_POLL_SECONDS = 0.05
+
+
+class LockTimeoutError(TimeoutError):
+    pass
+
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _try_lock(handle: BinaryIO) -> bool:
+        handle.seek(0)
+        try:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(handle: BinaryIO) -> None:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _try_lock(handle: BinaryIO) -> bool:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(handle: BinaryIO) -> None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path: Path, timeout_seconds: float | None = None) -> Iterator[None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+    with path.open("a+b") as handle:
+        while not _try_lock(handle):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeoutError(f"timed out waiting for lock: {path}")
+            time.sleep(LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            _unlock(handle)
+
+
+def dataset_lock(
+    lock_dir: Path, dataset_id: str, timeout_seconds: float | None = None
+) -> AbstractContextManager[None]:
+    return file_lock(lock_dir / f"{dataset_id}.lock", timeout_seconds=timeout_seconds)
@@ -1,34 +1,276 @@
 from __future__ import annotations
 
 import hashlib
+import io
 import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict, dataclass
 from datetime import UTC, datetime
 from pathlib import Path
+from types import TracebackType
 from typing import Any
 
+from hdb.catalog import record_manifest
+from hdb.settings import get_settings
+
+HASH_BUFFER_SIZE = 1024 * 1024
+HASH_MAX_WORKERS = min(8, os.cpu_count() or 1)
+MERKLE_CHUNK_SIZE = 8 * HASH_BUFFER_SIZE
+# Long-running processes (daemon, workers, the API build pool) hash every build's artifacts;
+# entries are dropped when a build's staging dir goes away, and the LRU bound catches the rest.
+DIGEST_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class ChunkedDigest:
+    sha256: str
+    chunks: tuple[str, ...]
+
+
+_DIGEST_CACHE: OrderedDict[str, tuple[int, int, ChunkedDigest]] = OrderedDict()
+_DIGEST_CACHE_LOCK = threading.Lock()
+
+
+class _ChunkHasher:
+    def __init__(self, chunk_size: int = MERKLE_CHUNK_SIZE) -> None:
+        self.chunk_size = chunk_size
+        self._file = hashlib.sha256()
+        self._chunk = hashlib.sha256()
+        self._chunk_fill = 0
+        self._chunks: list[str] = []
+
+    def update(self, data: bytes | bytearray | memoryview) -> None:
+        view = memoryview(data).cast("B")
+        self._file.update(view)
+        while view:
+            take = min(len(view), self.chunk_size - self._chunk_fill)
+            self._chunk.update(view[:take])
+            self._chunk_fill += take
+            view = view[take:]
+            if self._chunk_fill == self.chunk_size:
+                self._chunks.append(self._chunk.hexdigest())
+                self._chunk = hashlib.sha256()
+                self._chunk_fill = 0
+
+    def finish(self) -> ChunkedDigest:
+        chunks = list(self._chunks)
+        if self._chunk_fill or not chunks:
+            chunks.append(self._chunk.hexdigest())
+        return ChunkedDigest(sha256=self._file.hexdigest(), chunks=tuple(chunks))
+
+
+def _stat_key(path: Path) -> tuple[str, int, int]:
+    stat = path.stat()
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def remember_digest(path: Path, digest: ChunkedDigest) -> None:
+    key, size, mtime_ns = _stat_key(path)
+    with _DIGEST_CACHE_LOCK:
+        _DIGEST_CACHE[key] = (size, mtime_ns, digest)
+        _DIGEST_CACHE.move_to_end(key)
+        while len(_DIGEST_CACHE) > DIGEST_CACHE_SIZE:
+            _DIGEST_CACHE.popitem(last=False)
+
+
+def forget_digests(root: Path) -> None:
+    prefix = os.path.abspath(root) + os.sep
+    with _DIGEST_CACHE_LOCK:
+        for key in [key for key in _DIGEST_CACHE if key.startswith(prefix)]:
+            del _DIGEST_CACHE[key]
+
+
+def cached_digest(path: Path) -> ChunkedDigest | None:
+    key, size, mtime_ns = _stat_key(path)
+    with _DIGEST_CACHE_LOCK:
+        entry = _DIGEST_CACHE.get(key)
+        if entry is not None:
+            _DIGEST_CACHE.move_to_end(key)
+    if entry is None or entry[:2] != (size, mtime_ns):
+        return None
+    return entry[2]
+
+
+def digest_file(path: Path) -> ChunkedDigest:
+    cached = cached_digest(path)
+    if cached is not None:
+        return cached
+    hasher = _ChunkHasher()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with path.open("rb", buffering=0) as handle:
+        while read := handle.readinto(buffer):
+            hasher.update(view[:read])
+    digest = hasher.finish()
+    remember_digest(path, digest)
+    return digest
+
 
 def sha256_file(path: Path) -> str:
+    return digest_file(path).sha256
+
+
+def sha256_chunk(path: Path, index: int, chunk_size: int = MERKLE_CHUNK_SIZE) -> str:
     hasher = hashlib.sha256()
-    with path.open("rb") as handle:
-        for chunk in iter(lambda: handle.read(8192), b""):
-            hasher.update(chunk)
+    remaining = chunk_size
+    with path.open("rb", buffering=0) as handle:
+        handle.seek(index * chunk_size)
+        while remaining and (data := handle.read(min(HASH_BUFFER_SIZE, remaining))):
+            hasher.update(data)
+            remaining -= len(data)
     return hasher.hexdigest()
 
 
+class HashingWriter:
+    mode = "wb"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._staging_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        self._handle = self._staging_path.open("wb")
+        self._hasher = _ChunkHasher()
+        self._position = 0
+        self._digest: ChunkedDigest | None = None
+
+    @property
+    def closed(self) -> bool:
+        return self._handle.closed
+
+    @property
+    def digest(self) -> ChunkedDigest:
+        if self._digest is None:
+            raise RuntimeError(f"digest not available before close: {self.path}")
+        return self._digest
+
+    @property
+    def sha256(self) -> str:
+        return self.digest.sha256
+
+    def write(self, data: bytes | bytearray | memoryview) -> int:
+        written = self._handle.write(data)
+        self._hasher.update(data)
+        self._position += len(data)
+        return written
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        raise io.UnsupportedOperation("HashingWriter is append-only")
+
+    def flush(self) -> None:
+        self._handle.flush()
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def readable(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        if self._handle.closed:
+            return
+        self._handle.close()
+        os.replace(self._staging_path, self.path)
+        self._digest = self._hasher.finish()
+        remember_digest(self.path, self._digest)
+
+    def __enter__(self) -> HashingWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._handle.close()
+            self._staging_path.unlink(missing_ok=True)
+
+
+def write_bytes_hashed(path: Path, data: bytes) -> str:
+    with HashingWriter(path) as writer:
+        writer.write(data)
+    return writer.sha256
+
+
+def write_text_hashed(path: Path, text: str) -> str:
+    return write_bytes_hashed(path, text.encode("utf-8"))
+
+
 @dataclass(frozen=True)
 class FileDigest:
     path: str
     sha256: str
 
 
-def build_digests(files: list[Path]) -> list[FileDigest]:
-    return [FileDigest(path=str(path), sha256=sha256_file(path)) for path in files]
+def _digest_files(files: list[Path], max_workers: int) -> list[ChunkedDigest]:
+    if len(files) <= 1 or max_workers <= 1:
+        return [digest_file(path) for path in files]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as pool:
+        return list(pool.map(digest_file, files))
+
+
+def build_digests(files: list[Path], max_workers: int = HASH_MAX_WORKERS) -> list[FileDigest]:
+    digests = _digest_files(files, max_workers)
+    return [
+        FileDigest(path=str(path), sha256=digest.sha256)
+        for path, digest in zip(files, digests, strict=True)
+    ]
+
+
+def merkle_node(chunks: list[str]) -> str:
+    return hashlib.sha256(b"".join(bytes.fromhex(chunk) for chunk in chunks)).hexdigest()
+
+
+def merkle_root(artifacts: list[dict[str, Any]]) -> str:
+    hasher = hashlib.sha256()
+    for artifact in sorted(artifacts, key=lambda item: str(item["path"])):
+        hasher.update(str(artifact["path"]).encode("utf-8") + b"\0")
+        hasher.update(bytes.fromhex(merkle_node(list(artifact["chunks"]))))
+    return hasher.hexdigest()
+
+
+def build_merkle_manifest(files: list[Path], max_workers: int = HASH_MAX_WORKERS) -> dict[str, Any]:
+    digests = _digest_files(files, max_workers)
+    artifacts: list[dict[str, Any]] = []
+    for path, digest in zip(files, digests, strict=True):
+        stat = path.stat()
+        artifacts.append(
+            {
+                "path": str(path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": digest.sha256,
+                "chunks": list(digest.chunks),
+            }
+        )
+    return {
+        "algorithm": "sha256",
+        "chunk_size": MERKLE_CHUNK_SIZE,
+        "root": merkle_root(artifacts),
+        "artifacts": artifacts,
+    }
 
 
-def write_manifest(manifest_path: Path, payload: dict[str, Any]) -> None:
+def write_manifest(
+    manifest_path: Path, payload: dict[str, Any], catalog_path: Path | None = None
+) -> None:
     manifest_path.parent.mkdir(parents=True, exist_ok=True)
-    manifest_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    staging_path = manifest_path.with_name(f".{manifest_path.name}.tmp")
+    staging_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    os.replace(staging_path, manifest_path)
+    record_manifest(catalog_path or get_settings().catalog_path, manifest_path, payload)
 
 
 def now_timestamp() -> str:
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from hdb.manifest import ChunkedDigest, digest_file, remember_digest
+
+
+@dataclass(frozen=True)
+class StoreResult:
+    path: str
+    sha256: str
+    deduplicated: bool
+    linked: bool
+
+
+def object_path(store_dir: Path, sha256: str) -> Path:
+    return store_dir / sha256[:2] / sha256
+
+
+def _link_existing(obj: Path, path: Path) -> bool:
+    staging = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.link")
+    try:
+        os.link(obj, staging)
+    except FileNotFoundError:
+        return False
+    os.replace(staging, path)
+    return True
+
+
+def store_artifact(path: Path, digest: ChunkedDigest, store_dir: Path) -> StoreResult:
+    obj = object_path(store_dir, digest.sha256)
+    obj.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        while True:
+            if obj.exists():
+                if os.path.samefile(obj, path):
+                    return StoreResult(str(path), digest.sha256, deduplicated=False, linked=True)
+                if _link_existing(obj, path):
+                    remember_digest(path, digest)
+                    return StoreResult(str(path), digest.sha256, deduplicated=True, linked=True)
+                continue
+            try:
+                os.link(path, obj)
+            except FileExistsError:
+                continue
+            return StoreResult(str(path), digest.sha256, deduplicated=False, linked=True)
+    except OSError:
+        # Cross-device or link-less filesystems keep a private copy in the run dir.
+        return StoreResult(str(path), digest.sha256, deduplicated=False, linked=False)
+
+
+def store_artifacts(files: list[Path], store_dir: Path) -> list[StoreResult]:
+    return [store_artifact(path, digest_file(path), store_dir) for path in files]
@@ -9,31 +9,14 @@ from typing import Any, cast
 
 from huggingface_hub import HfApi
 
+from hdb.catalog import latest_manifest_path, mark_published
 from hdb.settings import get_settings
 
 
-def _latest_manifest_path(dataset_id: str) -> Path:
-    settings = get_settings()
-    dataset_root = settings.manifest_dir / dataset_id
-    if not dataset_root.exists():
-        raise FileNotFoundError(f"No manifests found for dataset_id={dataset_id}")
-    run_dirs = sorted([item for item in dataset_root.iterdir() if item.is_dir()], reverse=True)
-    for run_dir in run_dirs:
-        path = run_dir / "manifest.json"
-        if path.exists():
-            return path
-    raise FileNotFoundError(f"No manifest file found for dataset_id={dataset_id}")
-
-
-def _load_manifest(dataset_id: str) -> dict[str, Any]:
-    path = _latest_manifest_path(dataset_id)
-    payload = json.loads(path.read_text(encoding="utf-8"))
-    return cast(dict[str, Any], payload)
-
-
 def _bundle_publish_assets(dataset_id: str, target: str) -> tuple[Path, dict[str, Any], str]:
     settings = get_settings()
-    manifest = _load_manifest(dataset_id)
+    manifest_path = latest_manifest_path(dataset_id)
+    manifest = cast(dict[str, Any], json.loads(manifest_path.read_text(encoding="utf-8")))
     timestamp = str(manifest["timestamp"])
     bundle_dir = settings.cache_dir / "publish" / target / dataset_id / timestamp
     if bundle_dir.exists():
@@ -45,12 +28,14 @@ def _bundle_publish_assets(dataset_id: str, target: str) -> tuple[Path, dict[str
         [
             Path(manifest["codebook"]["json"]),
             Path(manifest["codebook"]["markdown"]),
-            Path(manifest["exporters"]["fhir"]),
         ]
     )
+    # Older manifests recorded a single FHIR bundle path; newer ones list every page.
+    fhir = manifest["exporters"]["fhir"]
+    files_to_copy.extend(Path(path) for path in ([fhir] if isinstance(fhir, str) else fhir))
     files_to_copy.extend(Path(path) for path in manifest.get("models", {}).values())
     files_to_copy.extend(Path(path) for path in manifest["exporters"]["omop"].values())
-    files_to_copy.append(_latest_manifest_path(dataset_id))
+    files_to_copy.append(manifest_path)
 
     for file_path in files_to_copy:
         destination = bundle_dir / file_path.name
@@ -114,6 +99,7 @@ def publish_to_huggingface(dataset_id: str) -> dict[str, str]:
         path_in_repo=f"{dataset_id}/{timestamp}",
         commit_message=f"Publish baseline model for {dataset_id} ({timestamp})",
     )
+    mark_published(settings.catalog_path, dataset_id, timestamp, "huggingface")
     return {
         "dataset_repo": dataset_repo_id,
         "model_repo": model_repo_id,
@@ -184,6 +170,7 @@ def publish_to_kaggle(dataset_id: str) -> dict[str, str]:
 
     _run_kaggle_publish(dataset_dir, f"Publish dataset artifacts for {dataset_id} ({timestamp})")
     _run_kaggle_publish(model_dir, f"Publish model artifacts for {dataset_id} ({timestamp})")
+    mark_published(settings.catalog_path, dataset_id, timestamp, "kaggle")
 
     return {
         "dataset_slug": settings.kaggle_dataset_slug,
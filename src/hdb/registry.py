@@ -4,7 +4,9 @@ from pathlib import Path
 from typing import Any
 
 import yaml
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
+
+from hdb.cron import parse_cron
 
 
 class LicenseConfig(BaseModel):
@@ -27,6 +29,15 @@ class OutputSchemas(BaseModel):
 class ContinuousPolicy(BaseModel):
     enabled: bool = False
     min_interval_minutes: int = 60
+    max_interval_minutes: int | None = None
+    backoff_factor: float = Field(default=2.0, ge=1.0)
+
+
+class RetentionPolicy(BaseModel):
+    keep_last: int | None = None
+    keep_daily: int = 0
+    keep_weekly: int = 0
+    keep_published: bool = True
 
 
 class SourceConfig(BaseModel):
@@ -44,17 +55,49 @@ class DatasetConfig(BaseModel):
     validations_suite: str
     output_schemas: OutputSchemas
     continuous: ContinuousPolicy = Field(default_factory=ContinuousPolicy)
+    retention: RetentionPolicy = Field(default_factory=RetentionPolicy)
     sources: list[SourceConfig]
 
+    @field_validator("refresh_cron")
+    @classmethod
+    def _check_refresh_cron(cls, value: str) -> str:
+        parse_cron(value)
+        return value
+
 
 class RegistryConfig(BaseModel):
     html_allowlist: list[str] = Field(default_factory=list)
     datasets: list[DatasetConfig] = Field(default_factory=list)
+    _dataset_map: dict[str, DatasetConfig] | None = PrivateAttr(default=None)
 
     def dataset_map(self) -> dict[str, DatasetConfig]:
-        return {dataset.id: dataset for dataset in self.datasets}
+        if self._dataset_map is None:
+            self._dataset_map = {dataset.id: dataset for dataset in self.datasets}
+        return self._dataset_map
 
 
-def load_registry(path: Path) -> RegistryConfig:
+_RegistrySignature = tuple[int, int, int]
+_REGISTRY_CACHE: dict[Path, tuple[_RegistrySignature, RegistryConfig]] = {}
+
+
+def parse_registry(path: Path) -> RegistryConfig:
     content = yaml.safe_load(path.read_text(encoding="utf-8"))
     return RegistryConfig.model_validate(content)
+
+
+def load_registry(path: Path) -> RegistryConfig:
+    # Callers share the cached model, so treat it as read-only. Editing or replacing the file
+    # changes its signature and the next call reparses it.
+    resolved = path.resolve()
+    stat = resolved.stat()
+    signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+    cached = _REGISTRY_CACHE.get(resolved)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    registry = parse_registry(resolved)
+    _REGISTRY_CACHE[resolved] = (signature, registry)
+    return registry
+
+
+def clear_registry_cache() -> None:
+    _REGISTRY_CACHE.clear()
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import functools
 import os
 from dataclasses import dataclass
 from pathlib import Path
 
+RUN_LAYERS = ("bronze", "silver", "gold")
+
 
 @dataclass(frozen=True)
 class Settings:
     data_dir: Path
     manifest_dir: Path
+    catalog_path: Path
     registry_path: Path
     user_agent: str
     cache_dir: Path
@@ -18,13 +22,47 @@ class Settings:
     hf_dataset_repo_id: str
     hf_model_repo_id: str
     continuous_failure_threshold: int
+    breaker_cooldown_minutes: float
+    breaker_max_cooldown_minutes: float
     auto_publish_tb: bool
+    queue_path: Path
+    build_workers: int
+    omop_vocabulary_dir: Path | None
+    omop_db_path: Path
+    forecast_workers: int
+    forecast_budget_seconds: float
+
+    @property
+    def staging_dir(self) -> Path:
+        return self.data_dir / ".staging"
+
+    @property
+    def lock_dir(self) -> Path:
+        return self.data_dir / ".locks"
+
+    @property
+    def object_dir(self) -> Path:
+        return self.data_dir / "objects"
+
+    @property
+    def vocabulary_dir(self) -> Path:
+        # compile-vocab writes here by default, and exports pick it up once it has been compiled.
+        return self.omop_vocabulary_dir or self.data_dir / "vocabulary"
+
+    def run_dirs(self, dataset_id: str, timestamp: str) -> dict[str, Path]:
+        dirs = {layer: self.data_dir / layer / dataset_id / timestamp for layer in RUN_LAYERS}
+        dirs["manifest"] = self.manifest_dir / dataset_id / timestamp
+        return dirs
 
 
+@functools.cache
 def get_settings() -> Settings:
+    manifest_dir = Path(os.getenv("HDB_MANIFEST_DIR", "./manifests"))
+    data_dir = Path(os.getenv("HDB_DATA_DIR", "./data"))
     return Settings(
-        data_dir=Path(os.getenv("HDB_DATA_DIR", "./data")),
-        manifest_dir=Path(os.getenv("HDB_MANIFEST_DIR", "./manifests")),
+        data_dir=data_dir,
+        manifest_dir=manifest_dir,
+        catalog_path=Path(os.getenv("HDB_CATALOG_PATH", str(manifest_dir / "catalog.sqlite"))),
         registry_path=Path(os.getenv("HDB_REGISTRY_PATH", "./datasets/registry.yaml")),
         user_agent=os.getenv("HDB_USER_AGENT", "health-dataset-builder/0.1 (+https://example.org)"),
         cache_dir=Path(os.getenv("HDB_CACHE_DIR", ".cache/hdb")),
@@ -34,5 +72,15 @@ def get_settings() -> Settings:
         hf_dataset_repo_id=os.getenv("HDB_HF_DATASET_REPO_ID", ""),
         hf_model_repo_id=os.getenv("HDB_HF_MODEL_REPO_ID", ""),
         continuous_failure_threshold=int(os.getenv("HDB_CONTINUOUS_FAILURE_THRESHOLD", "3")),
+        breaker_cooldown_minutes=float(os.getenv("HDB_BREAKER_COOLDOWN_MINUTES", "15")),
+        breaker_max_cooldown_minutes=float(os.getenv("HDB_BREAKER_MAX_COOLDOWN_MINUTES", "1440")),
         auto_publish_tb=os.getenv("HDB_AUTO_PUBLISH_TB", "false").lower() == "true",
+        queue_path=Path(os.getenv("HDB_QUEUE_PATH", str(data_dir / "queue.sqlite"))),
+        build_workers=int(os.getenv("HDB_BUILD_WORKERS", "1")),
+        omop_vocabulary_dir=Path(os.environ["HDB_OMOP_VOCABULARY_DIR"])
+        if os.getenv("HDB_OMOP_VOCABULARY_DIR")
+        else None,
+        omop_db_path=Path(os.getenv("HDB_OMOP_DB_PATH", str(data_dir / "omop_cdm.sqlite"))),
+        forecast_workers=int(os.getenv("HDB_FORECAST_WORKERS", "4")),
+        forecast_budget_seconds=float(os.getenv("HDB_FORECAST_BUDGET_SECONDS", "600")),
     )
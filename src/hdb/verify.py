@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from hdb.manifest import HASH_MAX_WORKERS, merkle_root, sha256_chunk, sha256_file
+
+
+@dataclass(frozen=True)
+class ArtifactIssue:
+    path: str
+    problem: str
+    chunks: list[int] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class SnapshotReport:
+    dataset_id: str
+    timestamp: str
+    manifest: str
+    ok: bool
+    artifacts: int
+    rehashed_chunks: int
+    issues: list[ArtifactIssue]
+
+
+def snapshot_manifests(
+    manifest_dir: Path, dataset_id: str | None = None, timestamp: str | None = None
+) -> list[Path]:
+    if dataset_id is None:
+        if not manifest_dir.exists():
+            return []
+        dataset_dirs = sorted(item for item in manifest_dir.iterdir() if item.is_dir())
+    else:
+        dataset_dirs = [manifest_dir / dataset_id]
+    if timestamp is not None:
+        if dataset_id is None:
+            raise ValueError("timestamp requires a dataset_id")
+        path = manifest_dir / dataset_id / timestamp / "manifest.json"
+        if not path.exists():
+            raise FileNotFoundError(f"No manifest for dataset={dataset_id} timestamp={timestamp}")
+        return [path]
+    manifests: list[Path] = []
+    for dataset_dir in dataset_dirs:
+        if not dataset_dir.exists():
+            continue
+        manifests.extend(
+            run_dir / "manifest.json"
+            for run_dir in sorted(item for item in dataset_dir.iterdir() if item.is_dir())
+            if (run_dir / "manifest.json").exists()
+        )
+    return manifests
+
+
+def _verify_artifact(
+    artifact: dict[str, Any], chunk_size: int, full: bool
+) -> tuple[ArtifactIssue | None, int]:
+    path = Path(str(artifact["path"]))
+    if not path.exists():
+        return ArtifactIssue(path=str(path), problem="missing"), 0
+    stat = path.stat()
+    if stat.st_size != int(artifact["size"]):
+        return ArtifactIssue(path=str(path), problem="size_mismatch"), 0
+    if not full and stat.st_mtime_ns == int(artifact["mtime_ns"]):
+        return None, 0
+    chunks = list(artifact["chunks"])
+    corrupt = [
+        index
+        for index, expected in enumerate(chunks)
+        if sha256_chunk(path, index, chunk_size) != expected
+    ]
+    if corrupt:
+        return ArtifactIssue(path=str(path), problem="chunk_mismatch", chunks=corrupt), len(chunks)
+    return None, len(chunks)
+
+
+def _verify_legacy(hashes: list[dict[str, str]]) -> tuple[list[ArtifactIssue], int]:
+    issues: list[ArtifactIssue] = []
+    for item in hashes:
+        path = Path(item["path"])
+        if not path.exists():
+            issues.append(ArtifactIssue(path=str(path), problem="missing"))
+        elif sha256_file(path) != item["sha256"]:
+            issues.append(ArtifactIssue(path=str(path), problem="digest_mismatch"))
+    return issues, len(hashes)
+
+
+def verify_manifest(manifest_path: Path, full: bool = False) -> SnapshotReport:
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    merkle = manifest.get("merkle")
+    issues: list[ArtifactIssue] = []
+    rehashed = 0
+    if merkle is None:
+        issues, rehashed = _verify_legacy(list(manifest.get("hashes", [])))
+        artifact_count = len(manifest.get("hashes", []))
+    else:
+        artifacts = list(merkle["artifacts"])
+        artifact_count = len(artifacts)
+        if merkle_root(artifacts) != merkle["root"]:
+            issues.append(ArtifactIssue(path=str(manifest_path), problem="root_mismatch"))
+        for artifact in artifacts:
+            issue, count = _verify_artifact(artifact, int(merkle["chunk_size"]), full)
+            rehashed += count
+            if issue is not None:
+                issues.append(issue)
+    return SnapshotReport(
+        dataset_id=str(manifest.get("dataset_id", manifest_path.parent.parent.name)),
+        timestamp=str(manifest.get("timestamp", manifest_path.parent.name)),
+        manifest=str(manifest_path),
+        ok=not issues,
+        artifacts=artifact_count,
+        rehashed_chunks=rehashed,
+        issues=issues,
+    )
+
+
+def verify_snapshots(
+    manifest_paths: list[Path], full: bool = False, max_workers: int = HASH_MAX_WORKERS
+) -> list[SnapshotReport]:
+    if len(manifest_paths) <= 1 or max_workers <= 1:
+        return [verify_manifest(path, full=full) for path in manifest_paths]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(manifest_paths))) as pool:
+        return list(pool.map(lambda path: verify_manifest(path, full=full), manifest_paths))
+
+
+def summarize_reports(reports: list[SnapshotReport]) -> dict[str, Any]:
+    return {
+        "checked": len(reports),
+        "corrupt": sum(1 for report in reports if not report.ok),
+        "rehashed_chunks": sum(report.rehashed_chunks for report in reports),
+        "reports": [asdict(report) for report in reports],
+    }
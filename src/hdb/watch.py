@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+LOGGER = logging.getLogger(__name__)
+
+DEBOUNCE_SECONDS = 2.0
+SETTLE_SECONDS = 1.0
+POLL_FALLBACK_SECONDS = 5.0
+
+# inotify(7) event bits. Watching the parent directory catches editors and copy tools that
+# replace a file by renaming a temporary one over it.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+Signature = tuple[int, int]
+
+
+def file_signature(path: Path) -> Signature | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class WatchBackend(Protocol):
+    # set_paths returns the paths it could not watch; callers keep those on another trigger.
+    def set_paths(self, paths: set[Path]) -> set[Path]: ...
+
+    def read(self, timeout: float | None) -> set[Path]: ...
+
+    def close(self) -> None: ...
+
+
+class InotifyBackend:
+    def __init__(self) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths: set[Path] = set()
+        self._watches: dict[Path, int] = {}
+        self._dirs: dict[int, Path] = {}
+        # set_paths runs on the daemon's main thread while read() runs on the watch thread.
+        self._lock = threading.Lock()
+
+    def _add_watch(self, directory: Path) -> int:
+        wd: int = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self._watches[directory] = wd
+            self._dirs[wd] = directory
+        return wd
+
+    def set_paths(self, paths: set[Path]) -> set[Path]:
+        with self._lock:
+            self._paths = set(paths)
+            wanted = {path.parent for path in paths}
+            for directory in set(self._watches) - wanted:
+                self._dirs.pop(self._watches[directory], None)
+                self._libc.inotify_rm_watch(self._fd, self._watches.pop(directory))
+            for directory in wanted - set(self._watches):
+                if self._add_watch(directory) < 0:
+                    error = os.strerror(ctypes.get_errno())
+                    LOGGER.warning("cannot watch %s: %s", directory, error)
+            return {path for path in self._paths if path.parent not in self._watches}
+
+    def _rearm(self) -> set[Path]:
+        # Directories that were missing, or were deleted and recreated, get a fresh watch on
+        # the next wake-up; their files may have changed unseen, so report them.
+        with self._lock:
+            missing = {path.parent for path in self._paths} - set(self._watches)
+            armed = {directory for directory in missing if self._add_watch(directory) >= 0}
+            return {path for path in self._paths if path.parent in armed}
+
+    def read(self, timeout: float | None) -> set[Path]:
+        changed = self._rearm()
+        if changed:
+            timeout = 0
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return changed
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; every watched file may have changed.
+                changed |= self._paths
+                continue
+            if mask & IN_IGNORED:
+                # The directory was deleted or unmounted and the kernel dropped its watch.
+                with self._lock:
+                    directory = self._dirs.pop(wd, None)
+                    if directory is not None and self._watches.get(directory) == wd:
+                        del self._watches[directory]
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if path in self._paths:
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingBackend:
+    # Fallback where inotify is unavailable; costs one stat per file per interval.
+    def __init__(
+        self,
+        interval_seconds: float = POLL_FALLBACK_SECONDS,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._interval = interval_seconds
+        self._sleep = sleep
+        self._signatures: dict[Path, Signature | None] = {}
+
+    def set_paths(self, paths: set[Path]) -> set[Path]:
+        self._signatures = {
+            path: self._signatures.get(path, file_signature(path)) for path in paths
+        }
+        return set()
+
+    def read(self, timeout: float | None) -> set[Path]:
+        self._sleep(self._interval if timeout is None else min(timeout, self._interval))
+        changed: set[Path] = set()
+        for path, previous in self._signatures.items():
+            current = file_signature(path)
+            if current != previous:
+                self._signatures[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        self._signatures = {}
+
+
+def default_backend() -> WatchBackend:
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyBackend()
+        except (OSError, AttributeError) as exc:
+            LOGGER.warning("inotify unavailable (%s); falling back to polling", exc)
+    return PollingBackend()
+
+
+@dataclass
+class _Pending:
+    last_event: float
+    signature: Signature | None = None
+    checked_at: float | None = None
+
+
+class FileWatcher:
+    # Reports a file once events for it stop for debounce_seconds and its size and mtime then
+    # hold still for settle_seconds, so half-written copies never trigger a build.
+    def __init__(
+        self,
+        backend: WatchBackend | None = None,
+        debounce_seconds: float = DEBOUNCE_SECONDS,
+        settle_seconds: float = SETTLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._backend = backend or default_backend()
+        self._debounce = debounce_seconds
+        self._settle = settle_seconds
+        self._clock = clock
+        self._pending: dict[Path, _Pending] = {}
+
+    def set_paths(self, paths: Iterable[Path]) -> set[Path]:
+        # Returns the paths that cannot be watched yet; calling again retries them.
+        resolved = {Path(os.path.abspath(path)) for path in paths}
+        unwatched = self._backend.set_paths(resolved)
+        self._pending = {path: item for path, item in self._pending.items() if path in resolved}
+        return unwatched
+
+    def _next_deadline(self) -> float | None:
+        deadlines = [
+            item.last_event + self._debounce
+            if item.checked_at is None
+            else item.checked_at + self._settle
+            for item in self._pending.values()
+        ]
+        return min(deadlines, default=None)
+
+    def _settled(self, now: float) -> set[Path]:
+        ready: set[Path] = set()
+        for path, item in list(self._pending.items()):
+            if now - item.last_event < self._debounce:
+                continue
+            if item.checked_at is not None and now - item.checked_at < self._settle:
+                continue
+            signature = file_signature(path)
+            if item.checked_at is not None and signature == item.signature:
+                # A file still missing after a settle window was deleted, not replaced.
+                if signature is not None:
+                    ready.add(path)
+                del self._pending[path]
+                continue
+            # Missing (mid-replace) or still growing: look again after another settle window.
+            item.signature = signature
+            item.checked_at = now
+        return ready
+
+    def wait(self, timeout: float | None = None) -> set[Path]:
+        now = self._clock()
+        end = None if timeout is None else now + timeout
+        while True:
+            deadline = self._next_deadline()
+            if end is not None:
+                deadline = end if deadline is None else min(deadline, end)
+            for path in self._backend.read(None if deadline is None else max(deadline - now, 0)):
+                self._pending[path] = _Pending(last_event=self._clock())
+            now = self._clock()
+            ready = self._settled(now)
+            if ready or (end is not None and now >= end):
+                return ready
+
+    def close(self) -> None:
+        self._backend.close()
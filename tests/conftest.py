@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import pytest
+
+from hdb.catalog import clear_catalog_cache
+from hdb.jobs import clear_queue_cache
+from hdb.registry import clear_registry_cache
+from hdb.settings import get_settings
+
+
+@pytest.fixture(autouse=True)
+def _reset_cached_config() -> Iterator[None]:
+    get_settings.cache_clear()
+    clear_registry_cache()
+    clear_catalog_cache()
+    clear_queue_cache()
+    yield
+    get_settings.cache_clear()
+    clear_registry_cache()
+    clear_catalog_cache()
+    clear_queue_cache()
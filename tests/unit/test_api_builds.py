@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from apps.api.main import app
+from fastapi.testclient import TestClient
+from pytest import MonkeyPatch
+
+
+def test_build_endpoints_enqueue_deduplicate_and_cancel(
+    monkeypatch: MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("HDB_QUEUE_PATH", str(tmp_path / "queue.sqlite"))
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(Path("datasets/registry.yaml").resolve()))
+    client = TestClient(app)
+
+    first = client.post("/datasets/demo_dataset/builds")
+    assert first.status_code == 202
+    assert first.json()["deduplicated"] is False
+    second = client.post("/datasets/demo_dataset/builds", json={"full_refresh": True})
+    job = second.json()["job"]
+    assert second.json()["deduplicated"] is True
+    assert job["id"] == first.json()["job"]["id"] and job["full_refresh"] is True
+    assert client.post("/datasets/missing/builds").status_code == 404
+
+    assert client.get(f"/builds/{job['id']}").json()["status"] == "queued"
+    assert [item["id"] for item in client.get("/builds", params={"status": "queued"}).json()] == [
+        job["id"]
+    ]
+    cancelled = client.post(f"/builds/{job['id']}/cancel")
+    assert cancelled.status_code == 200 and cancelled.json()["status"] == "cancelled"
+    assert client.get("/builds/999").status_code == 404
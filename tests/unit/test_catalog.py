@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import closing
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from pytest import MonkeyPatch
+
+from hdb import catalog
+from hdb.catalog import (
+    acquire_breaker,
+    latest_catalog_entry,
+    poll_states,
+    rebuild_catalog,
+    record_breaker_result,
+    update_poll_state,
+)
+from hdb.manifest import write_manifest
+
+
+def _payload(timestamp: str, rows: int) -> dict[str, object]:
+    return {"dataset_id": "ds1", "timestamp": timestamp, "row_count": rows, "hashes": []}
+
+
+def test_write_manifest_updates_latest(tmp_path: Path) -> None:
+    manifest_dir = tmp_path / "manifests"
+    catalog_path = tmp_path / "catalog.sqlite"
+    for timestamp, rows in (("20260102T000000Z", 2), ("20260101T000000Z", 1)):
+        path = manifest_dir / "ds1" / timestamp / "manifest.json"
+        write_manifest(path, _payload(timestamp, rows), catalog_path=catalog_path)
+
+    entry = latest_catalog_entry(catalog_path, manifest_dir, "ds1")
+    assert entry is not None
+    assert entry.timestamp == "20260102T000000Z"
+    assert entry.row_count == 2
+    assert latest_catalog_entry(catalog_path, manifest_dir, "missing") is None
+
+
+def test_catalog_indexes_manifests_missing_from_catalog(tmp_path: Path) -> None:
+    manifest_dir = tmp_path / "manifests"
+    catalog_path = tmp_path / "catalog.sqlite"
+    for timestamp in ("20260101T000000Z", "20260103T000000Z"):
+        run_dir = manifest_dir / "ds1" / timestamp
+        run_dir.mkdir(parents=True)
+        (run_dir / "manifest.json").write_text(json.dumps(_payload(timestamp, 3)), encoding="utf-8")
+    (manifest_dir / "ds1" / "20260104T000000Z").mkdir()
+
+    entry = latest_catalog_entry(catalog_path, manifest_dir, "ds1")
+    assert entry is not None
+    assert entry.timestamp == "20260103T000000Z"
+    assert rebuild_catalog(catalog_path, manifest_dir) == 2
+
+
+def test_poll_state_backs_off_until_cap_and_resets_on_change(tmp_path: Path) -> None:
+    catalog_path = tmp_path / "catalog.sqlite"
+    now = datetime(2026, 1, 1, tzinfo=UTC)
+    intervals = []
+    for changed in (True, False, False, False, False, True):
+        state = update_poll_state(catalog_path, "ds1", changed, 60, 300, 2.0, now=now)
+        intervals.append(state.interval_minutes)
+    assert intervals == [60, 120, 240, 300, 300, 60]
+    assert state.unchanged_streak == 0
+    assert state.last_changed_at == now
+    assert poll_states(catalog_path) == [state]
+    assert state.next_poll_at == now + timedelta(minutes=60)
+
+
+def test_breaker_opens_half_opens_once_and_closes_on_success(tmp_path: Path) -> None:
+    catalog_path = tmp_path / "catalog.sqlite"
+    now = datetime(2026, 1, 1, tzinfo=UTC)
+    assert acquire_breaker(catalog_path, "ds1", now=now) == "closed"
+    for _ in range(2):
+        state = record_breaker_result(catalog_path, "ds1", "boom", 2, 15, 40, now=now)
+    assert (state.state, state.open_until) == ("open", now + timedelta(minutes=15))
+    assert acquire_breaker(catalog_path, "ds1", now=now + timedelta(minutes=5)) == "open"
+
+    later = now + timedelta(minutes=15)
+    assert acquire_breaker(catalog_path, "ds1", now=later) == "half_open"
+    assert acquire_breaker(catalog_path, "ds1", now=later) == "open"
+    cooldowns = []
+    for _ in range(2):
+        state = record_breaker_result(catalog_path, "ds1", "boom", 2, 15, 40, now=later)
+        cooldowns.append(state.cooldown_minutes)
+        later = state.open_until or later
+        assert acquire_breaker(catalog_path, "ds1", now=later) == "half_open"
+    assert cooldowns == [30, 40]
+
+    state = record_breaker_result(catalog_path, "ds1", None, 2, 15, 40, now=later)
+    assert (state.state, state.consecutive_failures, state.open_until) == ("closed", 0, None)
+    assert acquire_breaker(catalog_path, "ds1", now=later) == "closed"
+
+
+def test_missing_dataset_lookups_stay_read_only(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    manifest_dir = tmp_path / "manifests"
+    catalog_path = tmp_path / "catalog.sqlite"
+    manifest_dir.mkdir()
+    assert latest_catalog_entry(catalog_path, manifest_dir, "ds1") is None
+
+    def fail(*args: object) -> int:
+        raise AssertionError("read path reindexed the catalog")
+
+    monkeypatch.setattr(catalog, "_index_dataset", fail)
+    assert latest_catalog_entry(catalog_path, manifest_dir, "ds1") is None
+    monkeypatch.undo()
+
+    run_dir = manifest_dir / "ds1" / "20260101T000000Z"
+    run_dir.mkdir(parents=True)
+    (run_dir / "manifest.json").write_text(
+        json.dumps(_payload("20260101T000000Z", 1)), encoding="utf-8"
+    )
+    entry = latest_catalog_entry(catalog_path, manifest_dir, "ds1")
+    assert entry is not None and entry.timestamp == "20260101T000000Z"
+
+
+def test_catalog_uses_rollback_journal(tmp_path: Path) -> None:
+    catalog_path = tmp_path / "catalog.sqlite"
+    with closing(sqlite3.connect(catalog_path)) as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+    with closing(catalog.connect_catalog(catalog_path)) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 2
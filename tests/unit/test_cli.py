@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from hdb.cli import main
+
+HEAVY_MODULES = {"pandas", "pyarrow", "sklearn", "pandera", "uvicorn", "huggingface_hub"}
+IMPORT_BUDGET_US = 300_000
+
+
+def _import_times(module: str) -> dict[str, int]:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    times: dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_skips_heavy_modules_and_stays_in_budget() -> None:
+    times = _import_times("hdb.cli")
+    assert not HEAVY_MODULES & {name.split(".")[0] for name in times}
+    assert times["hdb.cli"] < IMPORT_BUDGET_US
+
+
+def test_list_command_prints_registry(capsys: pytest.CaptureFixture[str]) -> None:
+    assert main(["list"]) == 0
+    datasets = json.loads(capsys.readouterr().out)
+    assert "demo_dataset" in {item["id"] for item in datasets}
@@ -79,3 +79,14 @@ def test_connector_blocks_disallowed_html(tmp_path: Path) -> None:
             run_dir=tmp_path / "run",
             html_allowlist=["allowed.example"],
         )
+
+
+def test_http_probe_fingerprints_head_response(monkeypatch: Any, tmp_path: Path) -> None:
+    connector = HttpCsvConnector(cache_dir=tmp_path / "cache", user_agent="ua")
+
+    def fake_head(url: str, headers: dict[str, str]) -> FakeResponse:
+        return FakeResponse(status_code=200, content=b"", headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr(connector, "_head", fake_head)
+    assert connector.probe({"url": "https://example.org/file.tsv"}) == 'etag:"v1"'
+    assert connector.probe({"url": "https://x.org/", "access_type": "html"}) is None
@@ -54,6 +54,7 @@ datasets:
         return path
 
     monkeypatch.setattr("pipelines.engine.run_dataset_build", fake_run)
+    monkeypatch.setattr("pipelines.engine.probe_source", lambda dataset: None)
     result = run_continuous_ingestion()
     assert result["selected_count"] == 1
     assert result["executed_count"] == 1
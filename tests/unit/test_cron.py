@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+import pytest
+
+from hdb.cron import next_run, parse_cron
+
+
+def _at(text: str) -> datetime:
+    return datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=UTC)
+
+
+def test_next_run_handles_hourly_daily_and_steps() -> None:
+    assert next_run(parse_cron("0 * * * *"), _at("2026-01-01 10:00")) == _at("2026-01-01 11:00")
+    assert next_run(parse_cron("0 2 * * *"), _at("2026-01-01 02:30")) == _at("2026-01-02 02:00")
+    assert next_run(parse_cron("*/15 * * * *"), _at("2026-01-01 10:16")) == _at("2026-01-01 10:30")
+    assert next_run(parse_cron("30 23 31 12 *"), _at("2026-01-01 00:00")) == _at("2026-12-31 23:30")
+
+
+def test_next_run_matches_day_of_month_or_weekday() -> None:
+    # 2026-01-02 is a Friday; "1st of the month or Monday" fires on Monday the 5th.
+    schedule = parse_cron("0 0 1 * 1")
+    assert next_run(schedule, _at("2026-01-02 00:00")) == _at("2026-01-05 00:00")
+    assert next_run(parse_cron("0 0 * * 7"), _at("2026-01-02 00:00")) == _at("2026-01-04 00:00")
+
+
+def test_parse_cron_rejects_invalid_expressions() -> None:
+    for expression in ("* * * *", "60 * * * *", "*/0 * * * *", "0 0 31 2 x"):
+        with pytest.raises(ValueError):
+            parse_cron(expression)
+    with pytest.raises(ValueError):
+        next_run(parse_cron("0 0 31 2 *"), _at("2026-01-01 00:00"))
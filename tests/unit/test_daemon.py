@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import sys
+import threading
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import pytest
+from pipelines.daemon import ContinuousDaemon
+
+from hdb.watch import FileWatcher, InotifyBackend, PollingBackend
+
+DATASET = """
+  - id: {dataset_id}
+    title: "{dataset_id}"
+    description: "x"
+    refresh_cron: "{cron}"
+    continuous:
+      enabled: {enabled}
+    license:
+      name: "CC BY 4.0"
+      url: "https://creativecommons.org/licenses/by/4.0/"
+      attribution: "X"
+    pii_policy:
+      block_if_suspected: true
+      declared_deidentified: true
+    validations_suite: canonical_v1
+    output_schemas:
+      canonical: canonical_v1
+      omop: omop_subset_v1
+      fhir: fhir_r4_minimal_v1
+    sources:
+      - connector: http_csv
+        params:
+          url: "https://example.org/x.csv"
+"""
+
+
+def _registry(monkeypatch: Any, tmp_path: Path) -> None:
+    path = tmp_path / "registry.yaml"
+    path.write_text(
+        "html_allowlist: []\ndatasets:"
+        + DATASET.format(dataset_id="hourly", cron="0 * * * *", enabled="true")
+        + DATASET.format(dataset_id="daily", cron="0 2 * * *", enabled="true")
+        + DATASET.format(dataset_id="paused", cron="* * * * *", enabled="false"),
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(path))
+
+
+def test_daemon_runs_datasets_when_their_cron_is_due(monkeypatch: Any, tmp_path: Path) -> None:
+    _registry(monkeypatch, tmp_path)
+    now = [datetime(2026, 1, 1, 1, 30, tzinfo=UTC)]
+    built: list[str] = []
+
+    def build(dataset_id: str) -> dict[str, str]:
+        built.append(dataset_id)
+        return {"dataset_id": dataset_id, "status": "built"}
+
+    daemon = ContinuousDaemon(build=build, clock=lambda: now[0])
+    assert daemon.run_pending() == 30.0
+    assert [item for _, item in daemon.next_due()] == ["daily", "hourly"]
+
+    now[0] += timedelta(minutes=30)
+    assert daemon.run_pending() == 30.0
+    daemon.close(cancel_pending=False)
+    assert sorted(built) == ["daily", "hourly"]
+    assert daemon.next_due() == [
+        (datetime(2026, 1, 1, 3, 0, tzinfo=UTC), "hourly"),
+        (datetime(2026, 1, 2, 2, 0, tzinfo=UTC), "daily"),
+    ]
+
+
+def test_daemon_skips_dataset_while_previous_build_runs(monkeypatch: Any, tmp_path: Path) -> None:
+    _registry(monkeypatch, tmp_path)
+    now = [datetime(2026, 1, 1, 0, 59, tzinfo=UTC)]
+    release = threading.Event()
+    calls: list[str] = []
+
+    def build(dataset_id: str) -> dict[str, str]:
+        calls.append(dataset_id)
+        release.wait(5)
+        return {"dataset_id": dataset_id, "status": "built"}
+
+    daemon = ContinuousDaemon(dataset_id="hourly", build=build, clock=lambda: now[0])
+    daemon.run_pending()
+    now[0] += timedelta(minutes=1)
+    daemon.run_pending()
+    now[0] += timedelta(hours=1)
+    daemon.run_pending()
+    release.set()
+    daemon.close()
+    assert calls == ["hourly"]
+
+
+def test_daemon_stop_ends_run_forever(monkeypatch: Any, tmp_path: Path) -> None:
+    _registry(monkeypatch, tmp_path)
+    daemon = ContinuousDaemon(build=lambda dataset_id: {})
+    worker = threading.Thread(target=daemon.run_forever)
+    worker.start()
+    daemon.stop()
+    worker.join(5)
+    assert not worker.is_alive()
+
+
+def test_daemon_watch_mode_builds_local_sources_on_change(monkeypatch: Any, tmp_path: Path) -> None:
+    source = tmp_path / "raw.csv"
+    source.write_text("a\n", encoding="utf-8")
+    local = DATASET.format(dataset_id="local", cron="0 * * * *", enabled="true").replace(
+        'connector: http_csv\n        params:\n          url: "https://example.org/x.csv"',
+        f'connector: local_file\n        params:\n          path: "{source}"',
+    )
+    path = tmp_path / "registry.yaml"
+    path.write_text(
+        "html_allowlist: []\ndatasets:"
+        + local
+        + DATASET.format(dataset_id="hourly", cron="0 * * * *", enabled="true"),
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(path))
+    triggered: list[str] = []
+
+    def trigger_build(dataset_id: str) -> dict[str, str]:
+        triggered.append(dataset_id)
+        return {"dataset_id": dataset_id, "status": "built"}
+
+    watcher = FileWatcher(PollingBackend(interval_seconds=0.01), 0.01, 0.01)
+    daemon = ContinuousDaemon(watcher=watcher, trigger_build=trigger_build)
+    daemon.run_pending()
+    assert [item for _, item in daemon.next_due()] == ["hourly"]
+    source.write_text("a\nb\n", encoding="utf-8")
+    daemon.process_watch_events(timeout=1.0)
+    daemon.close(cancel_pending=False)
+    assert triggered == ["local", "local"]
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_daemon_watches_source_directory_created_later(monkeypatch: Any, tmp_path: Path) -> None:
+    source = tmp_path / "incoming" / "raw.csv"
+    local = DATASET.format(dataset_id="local", cron="0 * * * *", enabled="true").replace(
+        'connector: http_csv\n        params:\n          url: "https://example.org/x.csv"',
+        f'connector: local_file\n        params:\n          path: "{source}"',
+    )
+    path = tmp_path / "registry.yaml"
+    path.write_text("html_allowlist: []\ndatasets:" + local, encoding="utf-8")
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(path))
+    triggered: list[str] = []
+
+    def trigger_build(dataset_id: str) -> dict[str, str]:
+        triggered.append(dataset_id)
+        return {"dataset_id": dataset_id, "status": "built"}
+
+    watcher = FileWatcher(InotifyBackend(), 0.01, 0.01)
+    daemon = ContinuousDaemon(watcher=watcher, trigger_build=trigger_build)
+    daemon.run_pending()
+    # The directory does not exist yet, so the dataset stays on its cron schedule.
+    assert [item for _, item in daemon.next_due()] == ["local"]
+    assert triggered == []
+
+    source.parent.mkdir()
+    source.write_text("a\n", encoding="utf-8")
+    daemon.run_pending()
+    assert daemon.next_due() == []
+    source.write_text("a\nb\n", encoding="utf-8")
+    daemon.process_watch_events(timeout=1.0)
+    daemon.close(cancel_pending=False)
+    assert triggered == ["local", "local"]
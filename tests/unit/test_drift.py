@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import pandas as pd
+
+from hdb.drift import build_sketches, compare_sketches, load_sketches, write_sketches
+
+
+def _frame(values: list[float], codes: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({"observation_code": codes, "observation_value_num": values})
+
+
+def test_sketches_round_trip(tmp_path: Path) -> None:
+    sketches = build_sketches(_frame([1.0, 2.0, 3.0], ["a", "a", "b"]))
+    assert sketches["row_count"] == 3
+    assert sketches["observation_codes"]["a"]["count"] == 2
+    path = write_sketches(sketches, tmp_path)
+    assert load_sketches(path) == sketches
+
+
+def test_compare_sketches_baseline_and_stable() -> None:
+    current = build_sketches(_frame([1.0, 2.0, 3.0, 4.0], ["a", "a", "b", "b"]))
+    assert compare_sketches(None, current)["status"] == "baseline"
+    assert compare_sketches(current, current)["status"] == "ok"
+
+
+def test_compare_sketches_flags_shift_and_row_jump() -> None:
+    previous = build_sketches(_frame([10.0, 11.0, 12.0, 13.0], ["a", "a", "a", "a"]))
+    current = build_sketches(
+        _frame([50.0, 51.0, 52.0, 53.0, 54.0, 55.0], ["a", "a", "a", "a", "a", "a"])
+    )
+    report = compare_sketches(previous, current)
+    metrics = {(item["scope"], item["metric"]) for item in report["findings"]}
+    assert report["status"] == "drift"
+    assert report["row_count"]["flagged"] is True
+    assert ("observation_code", "mean_shift_stds") in metrics
+    assert ("observation_code", "quantile_shift") in metrics
+
+
+def test_compare_sketches_tolerates_constant_previous_values() -> None:
+    previous = build_sketches(_frame([100.0, 100.0, 100.0, 7.0], ["a", "a", "a", "b"]))
+    current = build_sketches(_frame([100.5, 100.5, 100.5, 9.0], ["a", "a", "a", "b"]))
+    metrics = {
+        (item["key"], item["metric"]) for item in compare_sketches(previous, current)["findings"]
+    }
+    assert ("a", "mean_shift_stds") not in metrics
+    assert ("b", "mean_shift_stds") not in metrics
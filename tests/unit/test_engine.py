@@ -1,11 +1,27 @@
 from __future__ import annotations
 
+import errno
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any
 
+import pytest
+import requests
 from connectors.http_file import HttpCsvConnector
-from pipelines.engine import run_dataset_build, validate_dataset_outputs
+from pipelines.engine import (
+    enqueue_all_datasets,
+    run_continuous_build_if_due,
+    run_continuous_ingestion,
+    run_dataset_build,
+    run_dataset_build_if_changed,
+    validate_dataset_outputs,
+)
+
+from hdb.catalog import acquire_breaker, breaker_states, poll_states, recent_probes
+from hdb.jobs import list_jobs
 
 
 class FakeResponse:
@@ -35,6 +51,8 @@ def test_run_dataset_build_writes_manifest(monkeypatch: Any, tmp_path: Path) ->
     assert payload["dataset_id"] == "demo_dataset"
     assert payload["row_count"] == 2
     assert "omop" in payload["exporters"]
+    assert payload["drift"]["status"] == "baseline"
+    assert Path(payload["sketches"]).exists()
 
 
 def test_validate_dataset_outputs(monkeypatch: Any, tmp_path: Path) -> None:
@@ -50,3 +68,155 @@ def test_validate_dataset_outputs(monkeypatch: Any, tmp_path: Path) -> None:
     run_dataset_build("demo_dataset", full_refresh=True)
     result = validate_dataset_outputs("demo_dataset")
     assert result["valid"] is True
+
+
+def test_concurrent_builds_publish_distinct_runs(monkeypatch: Any, tmp_path: Path) -> None:
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("HDB_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setenv("HDB_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(Path("datasets/registry.yaml").resolve()))
+
+    def fake_get(self: HttpCsvConnector, url: str, headers: dict[str, str]) -> FakeResponse:
+        return FakeResponse()
+
+    monkeypatch.setattr(HttpCsvConnector, "_get", fake_get)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        manifests = list(pool.map(lambda _: run_dataset_build("demo_dataset"), range(2)))
+
+    assert manifests[0] != manifests[1]
+    for manifest_path in manifests:
+        payload = json.loads(manifest_path.read_text(encoding="utf-8"))
+        assert Path(payload["gold_outputs"][0]).exists()
+        assert payload["timestamp"] in payload["gold_outputs"][0]
+    assert list((tmp_path / "data" / ".staging" / "demo_dataset").iterdir()) == []
+    gold_paths = [
+        Path(json.loads(path.read_text(encoding="utf-8"))["gold_outputs"][0]) for path in manifests
+    ]
+    assert os.path.samefile(gold_paths[0], gold_paths[1])
+
+
+def test_failed_build_leaves_no_partial_run(monkeypatch: Any, tmp_path: Path) -> None:
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("HDB_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setenv("HDB_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(Path("datasets/registry.yaml").resolve()))
+
+    def fake_get(self: HttpCsvConnector, url: str, headers: dict[str, str]) -> FakeResponse:
+        return FakeResponse()
+
+    def failing_export(*args: Any, **kwargs: Any) -> Path:
+        raise RuntimeError("export failed")
+
+    monkeypatch.setattr(HttpCsvConnector, "_get", fake_get)
+    monkeypatch.setattr("pipelines.engine.export_fhir_bundle", failing_export)
+    with pytest.raises(RuntimeError):
+        run_dataset_build("demo_dataset")
+
+    assert not (tmp_path / "data" / "gold" / "demo_dataset").exists()
+    assert not (tmp_path / "manifests" / "demo_dataset").exists()
+    assert list((tmp_path / "data" / ".staging" / "demo_dataset").iterdir()) == []
+
+
+def test_build_if_changed_skips_unchanged_source(monkeypatch: Any, tmp_path: Path) -> None:
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("HDB_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setenv("HDB_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(Path("datasets/registry.yaml").resolve()))
+
+    def fake_get(self: HttpCsvConnector, url: str, headers: dict[str, str]) -> FakeResponse:
+        return FakeResponse()
+
+    monkeypatch.setattr(HttpCsvConnector, "_get", fake_get)
+    monkeypatch.setattr(HttpCsvConnector, "_head", fake_get)
+    first = run_dataset_build_if_changed("demo_dataset")
+    assert first is not None
+    payload = json.loads(first.read_text(encoding="utf-8"))
+    assert payload["provenance"][0]["source_fingerprint"] == "etag:x"
+
+    assert run_dataset_build_if_changed("demo_dataset") is None
+    assert len(list((tmp_path / "manifests" / "demo_dataset").iterdir())) == 1
+    assert list((tmp_path / "data" / ".staging" / "demo_dataset").iterdir()) == []
+    probes = recent_probes(tmp_path / "manifests" / "catalog.sqlite", "demo_dataset")
+    assert [probe.outcome for probe in probes] == ["unchanged", "changed"]
+    state = poll_states(tmp_path / "manifests" / "catalog.sqlite", "demo_dataset")[0]
+    assert (state.interval_minutes, state.unchanged_streak) == (120, 1)
+
+
+def test_breaker_opens_and_half_open_probe_keeps_it_open(monkeypatch: Any, tmp_path: Path) -> None:
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("HDB_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setenv("HDB_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(Path("datasets/registry.yaml").resolve()))
+    monkeypatch.setenv("HDB_CONTINUOUS_FAILURE_THRESHOLD", "2")
+    calls: list[str] = []
+
+    def down(self: HttpCsvConnector, url: str, headers: dict[str, str]) -> FakeResponse:
+        calls.append(url)
+        raise requests.ConnectionError("connection refused")
+
+    monkeypatch.setattr(HttpCsvConnector, "_get", down)
+    monkeypatch.setattr(HttpCsvConnector, "_head", down)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            run_continuous_build_if_due("demo_dataset")
+    attempts = len(calls)
+    assert run_continuous_build_if_due("demo_dataset")["status"] == "breaker_open"
+    assert len(calls) == attempts
+
+    later = datetime.now(UTC) + timedelta(hours=1)
+    monkeypatch.setattr(
+        "pipelines.engine.acquire_breaker",
+        lambda catalog_path, dataset_id: acquire_breaker(catalog_path, dataset_id, now=later),
+    )
+    with pytest.raises(requests.ConnectionError):
+        run_continuous_build_if_due("demo_dataset")
+    assert len(calls) == attempts + 1
+    state = breaker_states(tmp_path / "manifests" / "catalog.sqlite", "demo_dataset")[0]
+    assert (state.state, state.consecutive_failures, state.cooldown_minutes) == ("open", 3, 30)
+
+
+def test_enqueue_modes_queue_jobs_instead_of_building(monkeypatch: Any, tmp_path: Path) -> None:
+    monkeypatch.setenv("HDB_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setenv("HDB_QUEUE_PATH", str(tmp_path / "queue.sqlite"))
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(Path("datasets/registry.yaml").resolve()))
+
+    queued = enqueue_all_datasets()
+    assert [item["deduplicated"] for item in queued] == [False, False, False]
+    assert all(item["deduplicated"] for item in enqueue_all_datasets())
+    result = run_continuous_ingestion(dataset_id="demo_dataset", enqueue=True)
+    assert result["results"][0]["status"] == "queued"
+
+    jobs = list_jobs(tmp_path / "queue.sqlite", status="queued")
+    assert sorted((job.dataset_id, job.kind) for job in jobs)[:2] == [
+        ("demo_dataset", "build"),
+        ("demo_dataset", "continuous"),
+    ]
+    assert len(jobs) == 4
+
+
+def test_build_publishes_across_filesystems(monkeypatch: Any, tmp_path: Path) -> None:
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("HDB_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setenv("HDB_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(Path("datasets/registry.yaml").resolve()))
+    rename = os.rename
+    refused: list[Path] = []
+
+    def cross_device(source: Any, target: Any) -> None:
+        if Path(target).is_relative_to(tmp_path / "manifests"):
+            refused.append(Path(target))
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        rename(source, target)
+
+    def fake_get(self: HttpCsvConnector, url: str, headers: dict[str, str]) -> FakeResponse:
+        return FakeResponse()
+
+    monkeypatch.setattr(HttpCsvConnector, "_get", fake_get)
+    monkeypatch.setattr(os, "rename", cross_device)
+    manifest_path = run_dataset_build("demo_dataset")
+
+    payload = json.loads(manifest_path.read_text(encoding="utf-8"))
+    assert refused == [manifest_path.parent]
+    assert Path(payload["sketches"]).exists()
+    assert [path.name for path in manifest_path.parent.parent.iterdir()] == [payload["timestamp"]]
+    assert list((tmp_path / "data" / ".staging" / "demo_dataset").iterdir()) == []
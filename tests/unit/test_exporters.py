@@ -1,8 +1,14 @@
+import json
 from pathlib import Path
 
 import pandas as pd
+import pytest
+from exporters import fhir
 from exporters.fhir import export_fhir_bundle
-from exporters.omop import export_omop_subset
+from exporters.omop import export_omop_from_parquet, export_omop_subset
+from pytest import MonkeyPatch
+
+from hdb.manifest import cached_digest, digest_file
 
 
 def _canonical_df() -> pd.DataFrame:
@@ -33,9 +39,88 @@ def test_export_omop_subset(tmp_path: Path) -> None:
     assert "person_id" in person.columns
 
 
+def test_streamed_omop_export_matches_in_memory_export(tmp_path: Path) -> None:
+    df = pd.concat([_canonical_df()] * 3, ignore_index=True)
+    df.loc[1, "condition_code"] = "A15"
+    df.loc[2, "sex"] = "female"
+    gold_path = tmp_path / "canonical.parquet"
+    df.to_parquet(gold_path, index=False, row_group_size=2)
+
+    in_memory = export_omop_subset(df, tmp_path / "memory")
+    streamed = export_omop_from_parquet(gold_path, tmp_path / "streamed", batch_rows=2)
+    for name, path in in_memory.items():
+        pd.testing.assert_frame_equal(pd.read_parquet(path), pd.read_parquet(streamed[name]))
+    person = pd.read_parquet(streamed["person"])
+    assert person["person_id"].tolist() == [
+        int("abc123abc123", 16),
+        int("def123def123", 16),
+        int("abc123abc123", 16),
+    ]
+    condition = pd.read_parquet(streamed["condition_occurrence"])
+    assert condition["condition_source_value"].tolist() == ["A15"]
+
+
 def test_export_fhir_bundle(tmp_path: Path) -> None:
-    bundle_path = export_fhir_bundle(_canonical_df(), tmp_path, dataset_id="demo")
-    content = bundle_path.read_text(encoding="utf-8")
-    assert '"resourceType": "Bundle"' in content
-    assert '"resourceType": "Patient"' in content
-    assert '"resourceType": "Observation"' in content
+    pages = export_fhir_bundle(_canonical_df(), tmp_path, dataset_id="demo")
+    assert [path.name for path in pages] == ["fhir_bundle-00001.json"]
+    content = pages[0].read_text(encoding="utf-8")
+    bundle = json.loads(content)
+    assert bundle["resourceType"] == "Bundle"
+    assert bundle["type"] == "transaction"
+    types = [entry["resource"]["resourceType"] for entry in bundle["entry"]]
+    assert types == ["Patient", "Observation", "Patient", "Observation"]
+    assert bundle["entry"][0]["request"] == {"method": "PUT", "url": "Patient/abc123abc1230000"}
+    assert "\n" not in content
+
+
+def test_fhir_bundles_are_paged_with_self_contained_references(tmp_path: Path) -> None:
+    df = pd.concat([_canonical_df()] * 6, ignore_index=True)
+    df["record_id"] = [f"r{index}" for index in range(len(df))]
+    df.loc[1, "condition_code"] = "A15"
+    pages = export_fhir_bundle(
+        df, tmp_path, dataset_id="demo", max_entries=5, workers=2, task_rows=4
+    )
+    bundles = [json.loads(path.read_text(encoding="utf-8")) for path in pages]
+
+    assert len(bundles) > 2
+    observations: list[str] = []
+    for index, bundle in enumerate(bundles):
+        links = {link["relation"]: link["url"] for link in bundle["link"]}
+        assert links["self"] == pages[index].name
+        assert links.get("next") == (pages[index + 1].name if index + 1 < len(pages) else None)
+        assert len(bundle["entry"]) <= 5
+        resources = [entry["resource"] for entry in bundle["entry"]]
+        patients = {
+            f"Patient/{item['id']}" for item in resources if item["resourceType"] == "Patient"
+        }
+        for item in resources:
+            if item["resourceType"] != "Patient":
+                assert item["subject"]["reference"] in patients
+        observations.extend(
+            item["id"] for item in resources if item["resourceType"] == "Observation"
+        )
+    assert sorted(observations) == sorted(df["record_id"])
+
+
+def test_fhir_reexport_keeps_pages_until_replaced(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    df = pd.concat([_canonical_df()] * 6, ignore_index=True)
+    df["record_id"] = [f"r{index}" for index in range(len(df))]
+    pages = export_fhir_bundle(df, tmp_path, dataset_id="demo", max_entries=4, workers=1)
+    assert len(pages) > 2
+    # Pages are hashed as they are written, so the manifest need not reread them.
+    for page in pages:
+        cached = cached_digest(page)
+        assert cached is not None and cached.sha256 == digest_file(page).sha256
+
+    def fail(*args: object) -> None:
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(fhir, "_finish_page", fail)
+    with pytest.raises(RuntimeError):
+        export_fhir_bundle(df, tmp_path, dataset_id="demo", max_entries=4, workers=1)
+    assert all(page.exists() for page in pages)
+    assert not list(tmp_path.glob(".*.part"))
+
+    monkeypatch.undo()
+    fewer = export_fhir_bundle(df, tmp_path, dataset_id="demo", workers=1)
+    assert sorted(tmp_path.glob("fhir_bundle*.json")) == fewer and len(fewer) == 1
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import gzip
+import json
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa  # type: ignore[import-untyped]
+from exporters.fhir_bulk import export_fhir_bulk, quoted_ids
+from pytest import MonkeyPatch
+
+
+def _gold(tmp_path: Path, rows: int) -> Path:
+    df = pd.DataFrame(
+        {
+            "record_id": [f"{index:016x}" for index in range(rows)],
+            "patient_id": [f"{index % 3:016x}" for index in range(rows)],
+            "sex": ["female", "male", 'odd "value"'] * (rows // 3),
+            "condition_code": ["A15", ""] * (rows // 2),
+            "condition_code_system": ["ICD-10", ""] * (rows // 2),
+            "observation_code": ['metric "quoted"'] * rows,
+            "observation_code_system": ["local"] * rows,
+            "observation_value_num": [float("nan")] + [1.5] * (rows - 1),
+            "observation_unit": ["percent"] * rows,
+            "event_date": pd.date_range("2000-01-01", periods=rows, freq="D"),
+        }
+    )
+    path = tmp_path / "canonical.parquet"
+    df.to_parquet(path, index=False, row_group_size=4)
+    return path
+
+
+def _resources(output_dir: Path, manifest: dict[str, Any], kind: str) -> list[dict[str, Any]]:
+    resources: list[dict[str, Any]] = []
+    for item in manifest["output"]:
+        if item["type"] != kind:
+            continue
+        path = output_dir / item["url"]
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as handle:
+            lines = handle.read().splitlines()
+        assert len(lines) == item["count"]
+        resources.extend(json.loads(line) for line in lines)
+    return resources
+
+
+def test_bulk_export_covers_every_row_in_capped_parts(tmp_path: Path) -> None:
+    output_dir = tmp_path / "bulk"
+    manifest_path = export_fhir_bulk(
+        _gold(tmp_path, 24), output_dir, "demo", workers=2, max_file_bytes=1024
+    )
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    observations = _resources(output_dir, manifest, "Observation")
+    assert sorted(item["id"] for item in observations) == [f"{i:016x}" for i in range(24)]
+    first = next(item for item in observations if item["id"] == f"{0:016x}")
+    assert "valueQuantity" not in first
+    assert observations[1]["code"]["text"] == 'metric "quoted"'
+    assert len(_resources(output_dir, manifest, "Condition")) == 12
+    patients = _resources(output_dir, manifest, "Patient")
+    assert [item["gender"] for item in patients] == ["female", "male", "unknown"]
+    parts = [output_dir / item["url"] for item in manifest["output"]]
+    assert len(parts) > 3
+    assert all(path.stat().st_size <= 1024 for path in parts)
+
+
+def test_bulk_export_gzip_matches_plain(tmp_path: Path) -> None:
+    gold = _gold(tmp_path, 6)
+    plain = json.loads(export_fhir_bulk(gold, tmp_path / "plain", "demo", workers=1).read_text())
+    packed = json.loads(
+        export_fhir_bulk(gold, tmp_path / "gz", "demo", workers=1, compress=True).read_text()
+    )
+    assert all(item["url"].endswith(".ndjson.gz") for item in packed["output"])
+    for kind in ("Patient", "Observation", "Condition"):
+        assert _resources(tmp_path / "plain", plain, kind) == _resources(
+            tmp_path / "gz", packed, kind
+        )
+
+
+def test_ids_are_quoted_without_per_row_encoding() -> None:
+    assert quoted_ids(pa.array(["00ff", "a1"]), "Patient/").to_pylist() == [
+        '"Patient/00ff"',
+        '"Patient/a1"',
+    ]
+    assert quoted_ids(pa.array(['a"b', "é"])).to_pylist() == ['"a\\"b"', '"\\u00e9"']
+
+
+def test_patients_are_distinct_across_batches(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr("exporters.fhir_bulk.BATCH_ROWS", 4)
+    output_dir = tmp_path / "bulk"
+    manifest = json.loads(
+        export_fhir_bulk(_gold(tmp_path, 12), output_dir, "demo", workers=1).read_text()
+    )
+    patients = _resources(output_dir, manifest, "Patient")
+    assert [item["id"] for item in patients] == [f"{index:016x}" for index in range(3)]
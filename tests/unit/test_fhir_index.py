@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa  # type: ignore[import-untyped]
+import pyarrow.parquet as pq  # type: ignore[import-untyped]
+import pytest
+from apps.api.main import app
+from exporters.fhir_index import build_fhir_index, load_fhir_index, search_observations
+from fastapi.testclient import TestClient
+from pytest import MonkeyPatch
+
+from hdb.manifest import write_manifest
+
+
+def _gold(path: Path) -> Path:
+    rows = 12
+    df = pd.DataFrame(
+        {
+            "record_id": [f"r{index:02d}" for index in range(rows)],
+            "patient_id": [f"p{index % 4}" for index in range(rows)],
+            "sex": ["female"] * rows,
+            "condition_code": ["A15", ""] * (rows // 2),
+            "condition_code_system": ["ICD-10", ""] * (rows // 2),
+            "observation_code": ["early"] * 6 + ["late"] * 6,
+            "observation_code_system": ["local"] * rows,
+            "observation_value_num": [float(index) for index in range(rows)],
+            "observation_unit": ["years"] * rows,
+            "event_date": pd.date_range("2000-01-01", periods=rows, freq="MS"),
+        }
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, index=False, row_group_size=3)
+    return path
+
+
+def test_index_reads_only_matching_rows(tmp_path: Path) -> None:
+    gold = _gold(tmp_path / "canonical.parquet")
+    build_fhir_index(gold, tmp_path / "index", row_group_rows=2)
+    index = load_fhir_index(tmp_path / "index")
+
+    assert index.patient_range("p1") == [(3, 6)]
+    assert index.code_range("late") == (6, 12)
+    by_subject, total = search_observations(index, subject="Patient/p1", dates=["ge2000-06"])
+    assert [item["id"] for item in by_subject] == ["r05", "r09"] and total == 2
+    by_code, total = search_observations(index, code="late", dates=["2000-08"])
+    assert [item["id"] for item in by_code] == ["r07"] and total == 1
+    with pytest.raises(ValueError):
+        search_observations(index)
+
+
+def test_search_stops_reading_at_count(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    gold = _gold(tmp_path / "canonical.parquet")
+    build_fhir_index(gold, tmp_path / "index", row_group_rows=2)
+    index = load_fhir_index(tmp_path / "index")
+    reads: list[list[str]] = []
+    read_row_group = pq.ParquetFile.read_row_group
+
+    def counting(self: pq.ParquetFile, group: int, columns: list[str]) -> pa.Table:
+        reads.append(columns)
+        return read_row_group(self, group, columns=columns)
+
+    monkeypatch.setattr(pq.ParquetFile, "read_row_group", counting)
+    resources, total = search_observations(index, code="late", count=1)
+    assert [item["id"] for item in resources] == ["r06"] and total == 6
+    assert len(reads) == 1
+
+    reads.clear()
+    resources, total = search_observations(index, code="late", dates=["ge2000-09"], count=1)
+    assert [item["id"] for item in resources] == ["r08"] and total == 4
+    # The remaining row groups are only read for the columns the filters need.
+    assert len(reads) == 3 and "record_id" not in reads[-1]
+
+
+def test_fhir_endpoints(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    run = "20260101T000000Z"
+    gold = _gold(tmp_path / "data" / "gold" / "demo_dataset" / run / "canonical.parquet")
+    build_fhir_index(gold, gold.parent / "fhir" / "index")
+    monkeypatch.setenv("HDB_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(Path("datasets/registry.yaml").resolve()))
+    manifest = {"dataset_id": "demo_dataset", "timestamp": run, "gold_outputs": [str(gold)]}
+    write_manifest(tmp_path / "manifests" / "demo_dataset" / run / "manifest.json", manifest)
+    client = TestClient(app)
+    catalog = tmp_path / "manifests" / "catalog.sqlite"
+    before = catalog.stat().st_mtime_ns
+
+    patient = client.get("/fhir/Patient/p2")
+    assert patient.status_code == 200
+    assert patient.headers["content-type"].startswith("application/fhir+json")
+    assert patient.json()["id"] == "p2"
+    assert client.get("/fhir/Patient/missing").status_code == 404
+
+    search = client.get("/fhir/Observation", params={"code": "early", "_count": 2}).json()
+    assert search["total"] == 6 and len(search["entry"]) == 2
+    assert client.get("/fhir/Observation").status_code == 400
+
+    everything = client.get("/fhir/Patient/p0/$everything").json()
+    types = [entry["resource"]["resourceType"] for entry in everything["entry"]]
+    assert types == ["Patient"] + ["Observation"] * 3 + ["Condition"] * 3
+    # Index resolution only reads the catalog.
+    assert catalog.stat().st_mtime_ns == before
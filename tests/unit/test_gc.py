@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any
+
+from hdb.catalog import latest_catalog_entry, mark_published
+from hdb.gc import collect_garbage, select_runs_to_keep
+from hdb.manifest import write_manifest
+from hdb.objects import store_artifacts
+from hdb.registry import RetentionPolicy
+from hdb.settings import Settings, get_settings
+
+
+def test_select_runs_to_keep_applies_daily_weekly_and_published() -> None:
+    timestamps = [
+        "20260105T120000Z",
+        "20260105T060000Z",
+        "20260104T120000Z",
+        "20260103T120000Z",
+        "20251220T120000Z",
+        "20251201T120000Z",
+    ]
+    policy = RetentionPolicy(keep_last=1, keep_daily=2, keep_weekly=3)
+    keep = select_runs_to_keep(timestamps, policy, published={"20251201T120000Z"})
+    assert keep == {
+        "20260105T120000Z",
+        "20260104T120000Z",
+        "20251220T120000Z",
+        "20251201T120000Z",
+    }
+    assert select_runs_to_keep(timestamps, RetentionPolicy()) == set(timestamps)
+    assert select_runs_to_keep(timestamps, RetentionPolicy(keep_last=0)) == {"20260105T120000Z"}
+
+
+def _settings(monkeypatch: Any, tmp_path: Path) -> Settings:
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("HDB_MANIFEST_DIR", str(tmp_path / "manifests"))
+    return get_settings()
+
+
+def _run(settings: Settings, timestamp: str, payload: bytes) -> None:
+    dirs = settings.run_dirs("ds1", timestamp)
+    gold = dirs["gold"] / "canonical.parquet"
+    gold.parent.mkdir(parents=True)
+    gold.write_bytes(payload)
+    store_artifacts([gold], settings.object_dir)
+    write_manifest(
+        dirs["manifest"] / "manifest.json",
+        {"dataset_id": "ds1", "timestamp": timestamp, "hashes": []},
+        catalog_path=settings.catalog_path,
+    )
+
+
+def test_collect_garbage_dry_run_then_prune(monkeypatch: Any, tmp_path: Path) -> None:
+    settings = _settings(monkeypatch, tmp_path)
+    _run(settings, "20260101T000000Z", b"a" * 100)
+    _run(settings, "20260102T000000Z", b"b" * 10)
+    _run(settings, "20260103T000000Z", b"b" * 10)
+    _run(settings, "20260104T000000Z", b"c" * 1)
+    (settings.data_dir / "silver" / "ds1" / "20251231T000000Z").mkdir(parents=True)
+    mark_published(settings.catalog_path, "ds1", "20260101T000000Z", "huggingface")
+    policies = {"ds1": RetentionPolicy(keep_last=1)}
+
+    preview = collect_garbage(settings, policies, dry_run=True)
+    assert preview.datasets[0].pruned == [
+        "20251231T000000Z",
+        "20260102T000000Z",
+        "20260103T000000Z",
+    ]
+    pruned_manifests = sum(
+        (settings.manifest_dir / "ds1" / timestamp / "manifest.json").stat().st_size
+        for timestamp in ("20260102T000000Z", "20260103T000000Z")
+    )
+    assert preview.bytes_reclaimed == 10 + pruned_manifests
+    assert preview.objects_removed == 1
+    assert (settings.data_dir / "gold" / "ds1" / "20260102T000000Z").exists()
+
+    report = collect_garbage(settings, policies)
+    assert report.bytes_reclaimed == preview.bytes_reclaimed
+    assert report.objects_removed == 1
+    remaining = sorted(path.name for path in (settings.manifest_dir / "ds1").iterdir())
+    assert remaining == ["20260101T000000Z", "20260104T000000Z"]
+    assert len(list(settings.object_dir.glob("*/*"))) == 2
+    assert all(path.stat().st_nlink == 2 for path in settings.object_dir.glob("*/*"))
+    entry = latest_catalog_entry(settings.catalog_path, settings.manifest_dir, "ds1")
+    assert entry is not None and entry.timestamp == "20260104T000000Z"
+
+
+def test_collect_garbage_removes_stale_staging(monkeypatch: Any, tmp_path: Path) -> None:
+    settings = _settings(monkeypatch, tmp_path)
+    stale = settings.staging_dir / "ds1" / "20260101T000000Z-deadbeef"
+    fresh = settings.staging_dir / "ds1" / "20260102T000000Z-cafebabe"
+    for path in (stale, fresh):
+        path.mkdir(parents=True)
+        (path / "raw.csv").write_bytes(b"x" * 5)
+    old = stale.stat().st_mtime - 2 * 24 * 60 * 60
+    os.utime(stale, (old, old))
+
+    report = collect_garbage(settings, {"ds1": RetentionPolicy(keep_last=1)})
+    assert report.staging_removed == [str(stale)]
+    assert report.bytes_reclaimed == 5
+    assert not stale.exists() and fresh.exists()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+from pytest import MonkeyPatch
+
+from hdb.jobs import (
+    cancel_job,
+    claim_next_job,
+    connect_queue,
+    enqueue_build,
+    finish_job,
+    get_job,
+    heartbeat,
+    list_jobs,
+)
+
+
+def test_enqueue_deduplicates_queued_builds_per_dataset(tmp_path: Path) -> None:
+    queue_path = tmp_path / "queue.sqlite"
+    first, created = enqueue_build(queue_path, "ds1")
+    again, created_again = enqueue_build(queue_path, "ds1", full_refresh=True)
+    assert (created, created_again) == (True, False)
+    assert again.id == first.id and again.full_refresh
+
+    claimed = claim_next_job(queue_path, "w1")
+    assert claimed is not None and claimed.status == "running"
+    # Once the build has started, a new request queues a follow-up build.
+    follow_up, created = enqueue_build(queue_path, "ds1")
+    assert created and follow_up.id != first.id
+    assert claim_next_job(queue_path, "w1") is None
+
+    finished = finish_job(queue_path, first.id, "w1", {"status": "built"}, None)
+    assert finished is not None and finished.status == "succeeded"
+    assert finished.result == {"status": "built"}
+    assert [job.id for job in list_jobs(queue_path, status="queued")] == [follow_up.id]
+
+
+def test_cancel_only_affects_queued_jobs(tmp_path: Path) -> None:
+    queue_path = tmp_path / "queue.sqlite"
+    running, _ = enqueue_build(queue_path, "ds1")
+    claim_next_job(queue_path, "w1")
+    queued, _ = enqueue_build(queue_path, "ds2")
+
+    cancelled = cancel_job(queue_path, queued.id)
+    assert cancelled is not None and cancelled.status == "cancelled"
+    still_running = cancel_job(queue_path, running.id)
+    assert still_running is not None and still_running.status == "running"
+    assert cancel_job(queue_path, 999) is None
+    assert claim_next_job(queue_path, "w1") is None
+    failed = finish_job(queue_path, running.id, "w1", None, "boom")
+    assert failed is not None and (failed.status, failed.error) == ("failed", "boom")
+    assert get_job(queue_path, queued.id) == cancelled
+
+
+def test_expired_leases_are_requeued_then_failed(tmp_path: Path) -> None:
+    queue_path = tmp_path / "queue.sqlite"
+    job, _ = enqueue_build(queue_path, "ds1")
+    claimed = claim_next_job(queue_path, "crashed", lease_seconds=0.05)
+    assert claimed is not None and claimed.attempts == 1
+    assert heartbeat(queue_path, job.id, "crashed", lease_seconds=0.05)
+    time.sleep(0.1)
+
+    assert claim_next_job(queue_path, "w2", lease_seconds=0.05) is None
+    reclaimed = claim_next_job(queue_path, "w2", lease_seconds=0.05, skew_seconds=0)
+    assert reclaimed is not None and reclaimed.id == job.id
+    assert (reclaimed.worker_id, reclaimed.attempts) == ("w2", 2)
+    # The crashed worker no longer holds the lease and cannot finish the job.
+    assert not heartbeat(queue_path, job.id, "crashed")
+    stale = finish_job(queue_path, job.id, "crashed", {"status": "built"}, None)
+    assert stale is not None and stale.status == "running"
+
+    time.sleep(0.1)
+    claim_next_job(queue_path, "w3", lease_seconds=0.05, skew_seconds=0)
+    time.sleep(0.1)
+    assert claim_next_job(queue_path, "w4", skew_seconds=0) is None
+    failed = get_job(queue_path, job.id)
+    assert failed is not None and failed.status == "failed"
+    assert failed.error == "lease expired after 3 attempts"
+
+
+def test_queue_uses_rollback_journal(tmp_path: Path) -> None:
+    queue_path = tmp_path / "queue.sqlite"
+    with closing(sqlite3.connect(queue_path)) as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+    with closing(connect_queue(queue_path)) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+
+def test_queue_schema_is_set_up_once_per_file(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    statements: list[str] = []
+    connect = sqlite3.connect
+
+    def traced(*args: Any, **kwargs: Any) -> sqlite3.Connection:
+        connection: sqlite3.Connection = connect(*args, **kwargs)
+        connection.set_trace_callback(statements.append)
+        return connection
+
+    monkeypatch.setattr(sqlite3, "connect", traced)
+    queue_path = tmp_path / "queue.sqlite"
+    enqueue_build(queue_path, "ds1")
+    assert any("CREATE TABLE" in item for item in statements)
+    statements.clear()
+    enqueue_build(queue_path, "ds2")
+    claim_next_job(queue_path, "w1")
+    assert not any("CREATE" in item or "ALTER" in item for item in statements)
@@ -23,3 +23,14 @@ def test_local_file_connector_missing_file(tmp_path: Path) -> None:
             html_allowlist=[],
         )
 
+
+def test_local_file_probe_matches_fetch_until_source_changes(tmp_path: Path) -> None:
+    source = tmp_path / "source.csv"
+    source.write_text("a,b\n1,2\n", encoding="utf-8")
+    connector = LocalFileConnector(cache_dir=tmp_path / "cache", user_agent="ua")
+    result = connector.fetch({"path": str(source)}, run_dir=tmp_path / "run", html_allowlist=[])
+    assert connector.probe({"path": str(source)}) == result.fingerprint
+
+    source.write_text("a,b\n1,2\n3,4\n", encoding="utf-8")
+    assert connector.probe({"path": str(source)}) != result.fingerprint
+    assert connector.probe({"path": str(tmp_path / "missing.csv")}) is None
@@ -1,6 +1,19 @@
+import hashlib
+from collections import OrderedDict
 from pathlib import Path
 
-from hdb.manifest import build_digests, license_record_text
+from pytest import MonkeyPatch
+
+from hdb import manifest
+from hdb.manifest import (
+    HashingWriter,
+    build_digests,
+    cached_digest,
+    forget_digests,
+    license_record_text,
+    sha256_file,
+    write_text_hashed,
+)
 
 
 def test_build_digests(tmp_path: Path) -> None:
@@ -11,8 +24,47 @@ def test_build_digests(tmp_path: Path) -> None:
     assert len(digests[0].sha256) == 64
 
 
+def test_build_digests_parallel_matches_sequential(tmp_path: Path) -> None:
+    files = []
+    for index in range(5):
+        path = tmp_path / f"part-{index}.bin"
+        path.write_bytes(bytes([index]) * (3 * 1024 * 1024 + index))
+        files.append(path)
+    parallel = build_digests(files, max_workers=4)
+    sequential = build_digests(files, max_workers=1)
+    assert parallel == sequential
+    assert parallel[2].sha256 == hashlib.sha256(files[2].read_bytes()).hexdigest()
+
+
+def test_hashing_writer_digest_matches_file(tmp_path: Path) -> None:
+    path = tmp_path / "out.bin"
+    with HashingWriter(path) as sink:
+        sink.write(b"abc")
+        sink.write(b"def")
+    assert sink.sha256 == hashlib.sha256(b"abcdef").hexdigest()
+    assert sha256_file(path) == sink.sha256
+
+    path.write_bytes(b"changed")
+    assert sha256_file(path) == hashlib.sha256(b"changed").hexdigest()
+
+
 def test_license_record_contains_fields() -> None:
     text = license_record_text("CC BY 4.0", "https://license.example", "Publisher")
     assert "CC BY 4.0" in text
     assert "https://license.example" in text
     assert "Publisher" in text
+
+
+def test_digest_cache_is_bounded_and_forgets_staging_roots(
+    monkeypatch: MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(manifest, "_DIGEST_CACHE", OrderedDict())
+    monkeypatch.setattr(manifest, "DIGEST_CACHE_SIZE", 2)
+    stage = tmp_path / "stage"
+    stage.mkdir()
+    for name in ("a", "b", "c"):
+        write_text_hashed(stage / name, name)
+    assert len(manifest._DIGEST_CACHE) == 2
+    assert cached_digest(stage / "a") is None
+    forget_digests(stage)
+    assert not manifest._DIGEST_CACHE
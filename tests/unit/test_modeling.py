@@ -1,7 +1,19 @@
+import json
 from pathlib import Path
+from typing import Any
 
+import numpy as np
 import pandas as pd
-from pipelines.modeling import train_baseline_model, train_tb_forecast_artifacts
+from pipelines import modeling
+from pipelines.modeling import (
+    backtest_tb_forecasts,
+    fit_grouped_ols,
+    train_baseline_model,
+    train_tb_forecast_artifacts,
+)
+from pytest import MonkeyPatch
+from sklearn.linear_model import LinearRegression  # type: ignore[import-untyped]
+from sklearn.metrics import mean_absolute_error, r2_score  # type: ignore[import-untyped]
 
 
 def test_train_baseline_model_outputs(tmp_path: Path) -> None:
@@ -43,3 +55,158 @@ def test_train_tb_forecast_artifacts_outputs(tmp_path: Path) -> None:
     outputs = train_tb_forecast_artifacts(df, tmp_path, horizon_years=2)
     assert Path(outputs["forecast"]).exists()
     assert Path(outputs["forecast_metrics"]).exists()
+
+
+def test_fit_grouped_ols_matches_sklearn_per_group() -> None:
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame(
+        {
+            "state": rng.choice(["ka", "mh"], 200),
+            "drug": rng.choice(["inh", "rif", "emb"], 200),
+            "year": rng.integers(2010, 2020, 200).astype(float),
+            "value": rng.normal(50.0, 10.0, 200),
+        }
+    )
+    flat = pd.DataFrame({"state": ["ka"] * 3, "drug": ["one_year"] * 3, "year": [2015.0] * 3})
+    df = pd.concat([df, flat.assign(value=[1.0, 2.0, 3.0])], ignore_index=True)
+    fit = fit_grouped_ols(df, ["state", "drug"], "year", "value")
+
+    expected = []
+    for (state, drug), group in df.groupby(["state", "drug"]):
+        if group["year"].nunique() < 2:
+            continue
+        model = LinearRegression().fit(group[["year"]], group["value"])
+        pred = model.predict(group[["year"]])
+        mae = mean_absolute_error(group["value"], pred)
+        expected.append((state, drug, model.coef_[0], mae, r2_score(group["value"], pred)))
+    assert fit.keys.values.tolist() == [[state, drug] for state, drug, *_ in expected]
+    np.testing.assert_allclose(fit.slope, [row[2] for row in expected])
+    np.testing.assert_allclose(fit.mae, [row[3] for row in expected])
+    np.testing.assert_allclose(fit.r2, [row[4] for row in expected])
+    groups, years, _ = fit.predict(2)
+    assert groups.tolist() == [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+    assert years[:2].tolist() == [fit.max_x[0] + 1, fit.max_x[0] + 2]
+
+
+def _per_group_forecast(df: pd.DataFrame, horizon_years: int) -> tuple[pd.DataFrame, list[Any]]:
+    # The per-code LinearRegression loop train_tb_forecast_artifacts replaced.
+    df = df.assign(year=pd.to_datetime(df["event_date"]).dt.year)
+    forecast_rows: list[dict[str, object]] = []
+    metric_rows: list[dict[str, object]] = []
+    for code, group in df.groupby("observation_code"):
+        group = group.sort_values("year")
+        if group["year"].nunique() < 2:
+            continue
+        x = group[["year"]].astype(float)
+        y = group["observation_value_num"].astype(float)
+        model = LinearRegression().fit(x, y)
+        pred = model.predict(x)
+        metric_rows.append(
+            {
+                "observation_code": str(code),
+                "samples": int(len(group)),
+                "mae": float(mean_absolute_error(y, pred)),
+                "r2": float(r2_score(y, pred)),
+            }
+        )
+        max_year = int(group["year"].max())
+        for year in range(max_year + 1, max_year + horizon_years + 1):
+            predicted = float(model.predict(pd.DataFrame({"year": [float(year)]}))[0])
+            forecast_rows.append(
+                {
+                    "observation_code": str(code),
+                    "forecast_year": int(year),
+                    "predicted_value": max(0.0, predicted),
+                }
+            )
+    return pd.DataFrame(forecast_rows), metric_rows
+
+
+def test_tb_forecast_matches_per_group_regression(tmp_path: Path) -> None:
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame(
+        {
+            "observation_code": rng.choice(["mdr_new", "rr_new", "xdr", "falling"], 300),
+            "event_date": pd.to_datetime(
+                [f"{year}-03-01" for year in rng.integers(2005, 2020, 300)]
+            ),
+            "observation_value_num": rng.normal(500.0, 80.0, 300),
+        }
+    )
+    falling = df["observation_code"] == "falling"
+    df.loc[falling, "observation_value_num"] = 3000.0 - 200.0 * (
+        df.loc[falling, "event_date"].dt.year - 2005
+    )
+    extra = pd.DataFrame(
+        {
+            "observation_code": ["single_year"] * 2 + ["flat"] * 3,
+            "event_date": pd.to_datetime(
+                ["2010-01-01", "2010-06-01", "2010-01-01", "2011-01-01", "2012-01-01"]
+            ),
+            "observation_value_num": [1.0, 2.0, 7.0, 7.0, 7.0],
+        }
+    )
+    df = pd.concat([df, extra], ignore_index=True)
+    expected_forecast, expected_metrics = _per_group_forecast(df, horizon_years=3)
+
+    # A row without a date is dropped rather than spreading NaN through its group's fit.
+    undated = pd.DataFrame(
+        {"observation_code": ["rr_new"], "event_date": [pd.NaT], "observation_value_num": [1e6]}
+    )
+    outputs = train_tb_forecast_artifacts(pd.concat([df, undated], ignore_index=True), tmp_path)
+    forecast = pd.read_parquet(outputs["forecast"])
+    metrics = json.loads(Path(outputs["forecast_metrics"]).read_text(encoding="utf-8"))
+
+    pd.testing.assert_frame_equal(forecast, expected_forecast, check_dtype=False, rtol=1e-9)
+    assert [(row["observation_code"], row["samples"]) for row in metrics] == [
+        (row["observation_code"], row["samples"]) for row in expected_metrics
+    ]
+    for column in ("mae", "r2"):
+        np.testing.assert_allclose(
+            [row[column] for row in metrics], [row[column] for row in expected_metrics], atol=1e-9
+        )
+
+
+def _series_df() -> pd.DataFrame:
+    years = list(range(2000, 2012))
+    values = {
+        "trend": [100.0 + 5.0 * index for index in range(12)],
+        "shift": [10.0] * 6 + [50.0] * 6,
+        "short": [1.0, 2.0, 3.0],
+    }
+    return pd.DataFrame(
+        [
+            {"observation_code": code, "event_date": f"{year}-06-01", "observation_value_num": v}
+            for code, series in values.items()
+            for year, v in zip(years, series, strict=False)
+        ]
+    )
+
+
+def test_backtest_selects_model_per_series(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(modeling, "PARALLEL_MIN_SERIES", 0)
+    serial = backtest_tb_forecasts(_series_df(), tmp_path / "serial", workers=1)
+    pooled = backtest_tb_forecasts(_series_df(), tmp_path / "pooled", workers=2)
+    metrics = json.loads(Path(serial["backtest_metrics"]).read_text(encoding="utf-8"))
+    # Byte-identical across runs, so the object store can deduplicate the artifact.
+    assert Path(serial["backtest_metrics"]).read_bytes() == (
+        Path(pooled["backtest_metrics"]).read_bytes()
+    )
+
+    series = {item["observation_code"]: item for item in metrics["series"]}
+    assert series["trend"]["selected"] == "linear"
+    assert series["trend"]["mae"]["linear"] < 1e-9
+    assert series["trend"]["folds"] == 5
+    assert series["shift"]["selected"] != "linear"
+    assert series["short"]["status"] == "insufficient_history"
+    forecast = pd.read_parquet(serial["selected_forecast"])
+    trend = forecast[forecast["observation_code"] == "trend"]
+    assert trend["forecast_year"].tolist() == [2012, 2013, 2014]
+    np.testing.assert_allclose(trend["predicted_value"], [160.0, 165.0, 170.0])
+
+
+def test_backtest_falls_back_to_linear_past_budget(tmp_path: Path) -> None:
+    outputs = backtest_tb_forecasts(_series_df(), tmp_path, workers=1, budget_seconds=0)
+    metrics = json.loads(Path(outputs["backtest_metrics"]).read_text(encoding="utf-8"))
+    assert metrics["status_counts"] == {"budget_exceeded": 3}
+    assert set(pd.read_parquet(outputs["selected_forecast"])["model"]) == {"linear"}
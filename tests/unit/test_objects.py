@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from hdb.manifest import HashingWriter, sha256_file
+from hdb.objects import object_path, store_artifacts
+
+
+def test_store_artifacts_deduplicates_identical_files(tmp_path: Path) -> None:
+    store_dir = tmp_path / "objects"
+    first = tmp_path / "run1" / "gold.parquet"
+    second = tmp_path / "run2" / "gold.parquet"
+    for path in (first, second):
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"same-bytes")
+
+    results = store_artifacts([first, second], store_dir)
+    assert [item.deduplicated for item in results] == [False, True]
+    obj = object_path(store_dir, sha256_file(first))
+    assert os.path.samefile(obj, first)
+    assert os.path.samefile(obj, second)
+
+
+def test_rewriting_linked_artifact_leaves_object_intact(tmp_path: Path) -> None:
+    store_dir = tmp_path / "objects"
+    path = tmp_path / "run" / "bundle.json"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"v1")
+    store_artifacts([path], store_dir)
+    obj = object_path(store_dir, sha256_file(path))
+
+    with HashingWriter(path) as sink:
+        sink.write(b"v2")
+    assert obj.read_bytes() == b"v1"
+    assert path.read_bytes() == b"v2"
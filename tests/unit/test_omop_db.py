@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+from exporters.omop import export_omop_subset
+from exporters.omop_db import CDM_INDEXES, load_omop_tables
+
+
+def _canonical_df(rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "record_id": [f"{index:04x}{0:012x}" for index in range(1, rows + 1)],
+            "patient_id": [f"{index % 2:04x}{0:012x}" for index in range(rows)],
+            "sex": ["female"] * rows,
+            "condition_code": ["A15"] * rows,
+            "condition_code_system": ["ICD-10"] * rows,
+            "observation_code": ["life_expectancy_years"] * rows,
+            "observation_code_system": ["local"] * rows,
+            "observation_value_num": [float(index) for index in range(rows)],
+            "observation_unit": ["years"] * rows,
+            "event_date": pd.date_range("2000-01-01", periods=rows, freq="YS"),
+        }
+    )
+
+
+def test_cdm_load_is_incremental_and_indexed(tmp_path: Path) -> None:
+    db_path = tmp_path / "cdm.sqlite"
+    first = export_omop_subset(_canonical_df(3), tmp_path / "first")
+    loads = load_omop_tables(db_path, first, "demo", "20240101T000000Z", batch_rows=2)
+    assert {load.table: load.rows for load in loads}["observation"] == 3
+
+    again = load_omop_tables(db_path, first, "demo", "20240101T000000Z")
+    assert all(load.skipped for load in again)
+
+    second = export_omop_subset(_canonical_df(4), tmp_path / "second")
+    load_omop_tables(db_path, second, "demo", "20240102T000000Z")
+    with closing(sqlite3.connect(db_path)) as connection:
+        count = connection.execute("SELECT COUNT(*) FROM observation").fetchone()[0]
+        cohort = connection.execute(
+            "SELECT COUNT(DISTINCT p.person_id) FROM person p "
+            "JOIN condition_occurrence c ON c.person_id = p.person_id "
+            "WHERE c.condition_source_value = 'A15' AND c.condition_start_date >= '2001-01-01'"
+        ).fetchone()[0]
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+    assert count == 4
+    assert cohort == 2
+    assert set(CDM_INDEXES) <= indexes
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import copy
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+import pytest
+import requests
+import yaml
+from connectors.http_file import HttpCsvConnector
+from connectors.policy import (
+    BackoffWait,
+    RateLimitPolicy,
+    RetryAfterTooLong,
+    RetryPolicy,
+    TokenBucket,
+    configure_host_limits,
+    host_bucket,
+    is_retryable,
+    retry_after_seconds,
+)
+from pipelines.engine import _configure_rate_limits
+from pytest import MonkeyPatch
+from tenacity import RetryCallState
+
+from hdb.registry import clear_registry_cache
+
+
+def _http_error(status: int, headers: dict[str, str] | None = None) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(response=response)
+
+
+def test_is_retryable_classifies_errors() -> None:
+    assert is_retryable(_http_error(503))
+    assert is_retryable(_http_error(429))
+    assert is_retryable(requests.ConnectionError())
+    assert not is_retryable(_http_error(404))
+    assert not is_retryable(ValueError())
+
+
+def test_backoff_wait_honors_retry_after_and_grows_exponentially() -> None:
+    wait = BackoffWait(RetryPolicy(base_delay_seconds=1, max_delay_seconds=5), rng=lambda: 0.5)
+    state = RetryCallState(retry_object=None, fn=None, args=(), kwargs={})  # type: ignore[arg-type]
+    delays = []
+    for attempt in (1, 2, 3, 4):
+        state.attempt_number = attempt
+        state.set_exception((requests.HTTPError, _http_error(503), None))
+        delays.append(wait(state))
+    assert delays == [0.5, 1.0, 2.0, 2.5]
+
+    state.set_exception((requests.HTTPError, _http_error(429, {"Retry-After": "3"}), None))
+    assert wait(state) == 3.0
+    state.set_exception((requests.HTTPError, _http_error(429, {"Retry-After": "120"}), None))
+    assert wait(state) == 120.0
+    date_error = _http_error(503, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert retry_after_seconds(date_error) == 0.0
+
+
+def test_token_bucket_spaces_requests_after_burst() -> None:
+    now = [0.0]
+    sleeps: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(4):
+        bucket.acquire()
+    assert sleeps == [0.5, 0.5]
+
+
+class FakeSession:
+    def __init__(self, statuses: list[int], headers: dict[str, str] | None = None) -> None:
+        self.statuses = statuses
+        self.headers = headers or {}
+        self.calls = 0
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.statuses[self.calls]
+        response.headers.update(self.headers)
+        self.calls += 1
+        return response
+
+
+def test_get_retries_transient_errors_only(monkeypatch: Any, tmp_path: Path) -> None:
+    policy = RetryPolicy(max_attempts=3, base_delay_seconds=0)
+    connector = HttpCsvConnector(tmp_path / "cache", user_agent="ua", retry_policy=policy)
+    session = FakeSession([503, 502, 200])
+    monkeypatch.setattr("connectors.base.http_session", lambda: session)
+    assert connector._get("https://example.org/x.csv", {}).status_code == 200
+    assert session.calls == 3
+
+    session = FakeSession([404, 200])
+    monkeypatch.setattr("connectors.base.http_session", lambda: session)
+    with pytest.raises(requests.HTTPError):
+        connector._get("https://example.org/x.csv", {})
+    assert session.calls == 1
+
+
+def test_get_stops_when_retry_after_exceeds_limit(monkeypatch: Any, tmp_path: Path) -> None:
+    policy = RetryPolicy(max_attempts=3, max_retry_after_seconds=300)
+    connector = HttpCsvConnector(tmp_path / "cache", user_agent="ua", retry_policy=policy)
+    session = FakeSession([429, 200], headers={"Retry-After": "3600"})
+    monkeypatch.setattr("connectors.base.http_session", lambda: session)
+    with pytest.raises(RetryAfterTooLong) as raised:
+        connector._get("https://example.org/x.csv", {})
+    assert raised.value.retry_after == 3600.0
+    assert session.calls == 1
+
+
+def test_host_limits_follow_the_current_registry(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    registry = yaml.safe_load(Path("datasets/registry.yaml").read_text(encoding="utf-8"))
+    first = registry["datasets"][0]
+    second = copy.deepcopy(first)
+    second["id"] = "mirror"
+    registry["datasets"] = [first, second]
+    host = urlparse(first["sources"][0]["params"]["url"]).netloc.lower()
+    path = tmp_path / "registry.yaml"
+    monkeypatch.setenv("HDB_REGISTRY_PATH", str(path))
+
+    def write(*limits: tuple[float, int]) -> None:
+        for dataset, (rate, burst) in zip(registry["datasets"], limits, strict=True):
+            dataset["sources"][0]["params"]["rate_limit"] = {
+                "requests_per_second": rate,
+                "burst": burst,
+            }
+        path.write_text(yaml.safe_dump(registry), encoding="utf-8")
+        clear_registry_cache()
+
+    try:
+        write((1.0, 4), (5.0, 2))
+        _configure_rate_limits()
+        bucket = host_bucket(host, RateLimitPolicy(requests_per_second=5.0, burst=4))
+        assert (bucket.rate, bucket.capacity) == (1.0, 2)
+
+        # Loosening every source on the host loosens the shared bucket after a reload.
+        write((4.0, 4), (5.0, 3))
+        _configure_rate_limits()
+        assert (bucket.rate, bucket.capacity) == (4.0, 3)
+        assert host_bucket(host, RateLimitPolicy(requests_per_second=1.0)) is bucket
+        assert bucket.rate == 4.0
+    finally:
+        configure_host_limits([])
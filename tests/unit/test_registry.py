@@ -13,3 +13,15 @@ def test_registry_parses_dataset() -> None:
 def test_registry_html_allowlist_present() -> None:
     registry = load_registry(Path("datasets/registry.yaml"))
     assert "ourworldindata.org" in registry.html_allowlist
+
+
+def test_registry_cache_reloads_when_file_changes(tmp_path: Path) -> None:
+    path = tmp_path / "registry.yaml"
+    path.write_text("html_allowlist: [a.org]\n", encoding="utf-8")
+    first = load_registry(path)
+    assert load_registry(path) is first
+
+    replacement = tmp_path / "registry.yaml.new"
+    replacement.write_text("html_allowlist: [a.org, b.org]\n", encoding="utf-8")
+    replacement.replace(path)
+    assert load_registry(path).html_allowlist == ["a.org", "b.org"]
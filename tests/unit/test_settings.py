@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+from hdb.settings import get_settings
+
+
+def test_get_settings_is_memoized_until_cleared(monkeypatch: Any, tmp_path: Path) -> None:
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "one"))
+    settings = get_settings()
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "two"))
+    assert get_settings() is settings
+
+    get_settings.cache_clear()
+    assert get_settings().data_dir == tmp_path / "two"
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from hdb.manifest import build_merkle_manifest, merkle_root
+from hdb.verify import snapshot_manifests, verify_manifest, verify_snapshots
+
+
+def _snapshot(root: Path, timestamp: str, payload: bytes) -> Path:
+    run_dir = root / "ds1" / timestamp
+    run_dir.mkdir(parents=True, exist_ok=True)
+    artifact = run_dir / "artifact.bin"
+    artifact.write_bytes(payload)
+    manifest = {
+        "dataset_id": "ds1",
+        "timestamp": timestamp,
+        "merkle": build_merkle_manifest([artifact]),
+    }
+    path = run_dir / "manifest.json"
+    path.write_text(json.dumps(manifest), encoding="utf-8")
+    return path
+
+
+def test_verify_skips_unchanged_and_detects_corrupt_chunk(tmp_path: Path) -> None:
+    manifest_path = _snapshot(tmp_path, "20260101T000000Z", b"a" * (9 * 1024 * 1024))
+    report = verify_manifest(manifest_path)
+    assert report.ok is True
+    assert report.rehashed_chunks == 0
+
+    artifact = manifest_path.parent / "artifact.bin"
+    stat = artifact.stat()
+    with artifact.open("r+b") as handle:
+        handle.seek(8 * 1024 * 1024 + 10)
+        handle.write(b"b")
+    os.utime(artifact, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    report = verify_manifest(manifest_path)
+    assert report.ok is False
+    assert report.issues[0].problem == "chunk_mismatch"
+    assert report.issues[0].chunks == [1]
+
+
+def test_verify_snapshots_reports_missing_and_tampered_root(tmp_path: Path) -> None:
+    first = _snapshot(tmp_path, "20260101T000000Z", b"one")
+    second = _snapshot(tmp_path, "20260102T000000Z", b"two")
+    (second.parent / "artifact.bin").unlink()
+
+    manifest = json.loads(first.read_text(encoding="utf-8"))
+    manifest["merkle"]["artifacts"][0]["chunks"] = ["00" * 32]
+    assert merkle_root(manifest["merkle"]["artifacts"]) != manifest["merkle"]["root"]
+    first.write_text(json.dumps(manifest), encoding="utf-8")
+
+    paths = snapshot_manifests(tmp_path, "ds1")
+    assert paths == [first, second]
+    reports = verify_snapshots(paths, max_workers=2)
+    assert [issue.problem for issue in reports[0].issues] == ["root_mismatch"]
+    assert [issue.problem for issue in reports[1].issues] == ["missing"]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import ctypes
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa  # type: ignore[import-untyped]
+import pytest
+from exporters.omop import export_omop_subset
+from exporters.vocabulary import compile_vocabulary, load_vocabulary
+from pipelines.engine import _omop_vocabulary
+from pytest import MonkeyPatch
+
+from hdb.cli import main
+
+CONCEPTS = [
+    # concept_id, concept_name, domain_id, vocabulary_id, concept_class_id, standard, code, invalid
+    ("8507", "MALE", "Gender", "Gender", "Gender", "S", "M", ""),
+    ("8532", "FEMALE", "Gender", "Gender", "Gender", "S", "F", ""),
+    ("9448", "year", "Unit", "UCUM", "Unit", "S", "a", ""),
+    ("45590000", 'TB "block"', "Condition", "ICD10", "ICD10 Hierarchy", "", "A15-A19", ""),
+    ("45590001", "Old TB", "Condition", "ICD10", "ICD10 code", "", "A15", "D"),
+    ("45590002", "Respiratory TB", "Condition", "ICD10", "ICD10 code", "", "A15", ""),
+    ("434557", "Tuberculosis", "Condition", "SNOMED", "Clinical Finding", "S", "56717001", ""),
+]
+RELATIONSHIPS = [
+    ("45590000", "434557", "Maps to", ""),
+    ("45590002", "434557", "Maps to", ""),
+    ("45590002", "1", "Maps to", "D"),
+    ("434557", "434557", "Maps to", ""),
+    ("45590000", "434557", "Is a", ""),
+]
+
+
+def _write_athena(source_dir: Path) -> None:
+    source_dir.mkdir()
+    concept_header = (
+        "concept_id\tconcept_name\tdomain_id\tvocabulary_id\tconcept_class_id\t"
+        "standard_concept\tconcept_code\tvalid_start_date\tvalid_end_date\tinvalid_reason"
+    )
+    lines = [concept_header]
+    for row in CONCEPTS:
+        lines.append("\t".join([*row[:7], "19700101", "20991231", row[7]]))
+    (source_dir / "CONCEPT.csv").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    lines = [
+        "concept_id_1\tconcept_id_2\trelationship_id\tvalid_start_date\tvalid_end_date\t"
+        "invalid_reason"
+    ]
+    for c1, c2, relationship, invalid in RELATIONSHIPS:
+        lines.append("\t".join([c1, c2, relationship, "19700101", "20991231", invalid]))
+    (source_dir / "CONCEPT_RELATIONSHIP.csv").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def test_compiled_index_resolves_codes_to_standard_concepts(tmp_path: Path) -> None:
+    _write_athena(tmp_path / "athena")
+    meta = compile_vocabulary(tmp_path / "athena", tmp_path / "index")
+    assert meta["concepts"] == 6
+    vocabulary = load_vocabulary(tmp_path / "index")
+    assert isinstance(vocabulary.keys, np.memmap)
+
+    codes = pa.array(["A15", "A15-A19", "Z99", None, "A15"])
+    source, standard = vocabulary.lookup("ICD10", codes)
+    assert source.tolist() == [45590002, 45590000, 0, 0, 45590002]
+    assert standard.tolist() == [434557, 434557, 0, 0, 434557]
+    _, standard = vocabulary.lookup(pa.array(["SNOMED", "ICD10"]), pa.array(["56717001", "a"]))
+    assert standard.tolist() == [434557, 0]
+
+
+def test_missing_index_fails_loudly(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        load_vocabulary(tmp_path)
+
+
+def test_omop_export_maps_concepts(tmp_path: Path) -> None:
+    _write_athena(tmp_path / "athena")
+    compile_vocabulary(tmp_path / "athena", tmp_path / "index")
+    df = pd.DataFrame(
+        {
+            "record_id": ["0000000000000001", "0000000000000002"],
+            "patient_id": ["abc123abc1230000", "def123def1230000"],
+            "sex": ["female", "unknown"],
+            "condition_code": ["A15-A19", ""],
+            "condition_code_system": ["ICD-10", ""],
+            "observation_code": ["life_expectancy_years", "life_expectancy_years"],
+            "observation_code_system": ["local", "local"],
+            "observation_value_num": [70.2, 71.0],
+            "observation_unit": ["years", "years"],
+            "event_date": pd.to_datetime(["2000-01-01", "2001-01-01"]),
+        }
+    )
+    outputs = export_omop_subset(
+        df, tmp_path / "omop", vocabulary=load_vocabulary(tmp_path / "index")
+    )
+
+    person = pd.read_parquet(outputs["person"])
+    assert person["gender_concept_id"].tolist() == [8532, 0]
+    observation = pd.read_parquet(outputs["observation"])
+    assert observation["observation_concept_id"].tolist() == [0, 0]
+    assert observation["unit_concept_id"].tolist() == [9448, 9448]
+    condition = pd.read_parquet(outputs["condition_occurrence"])
+    assert condition["condition_concept_id"].tolist() == [434557]
+    assert condition["condition_source_concept_id"].tolist() == [45590000]
+
+
+def test_default_compile_location_is_used_by_exports(
+    monkeypatch: MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("HDB_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.delenv("HDB_OMOP_VOCABULARY_DIR", raising=False)
+    assert _omop_vocabulary() is None
+    _write_athena(tmp_path / "athena")
+    assert main(["compile-vocab", str(tmp_path / "athena")]) == 0
+    vocabulary = _omop_vocabulary()
+    assert vocabulary is not None and len(vocabulary.keys) > 0
+
+
+@pytest.mark.parametrize("exchange", [True, False])
+def test_recompile_swaps_the_whole_index(
+    monkeypatch: MonkeyPatch, tmp_path: Path, exchange: bool
+) -> None:
+    _write_athena(tmp_path / "athena")
+    compile_vocabulary(tmp_path / "athena", tmp_path / "index")
+    live = load_vocabulary(tmp_path / "index")
+    if not exchange:
+        # Platforms without renameat2 fall back to renaming the old index aside.
+        monkeypatch.setattr(ctypes, "CDLL", lambda *args, **kwargs: object())
+    concepts = (tmp_path / "athena" / "CONCEPT.csv").read_text(encoding="utf-8")
+    (tmp_path / "athena" / "CONCEPT.csv").write_text(
+        "".join(concepts.splitlines(keepends=True)[:3]), encoding="utf-8"
+    )
+    meta = compile_vocabulary(tmp_path / "athena", tmp_path / "index")
+
+    assert meta["concepts"] == 2
+    assert len(load_vocabulary(tmp_path / "index").concept_ids) == 2
+    # The index loaded before the recompile stays whole and consistent.
+    assert live.lookup("ICD10", pa.array(["A15"]))[1].tolist() == [434557]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["athena", "index"]
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+from hdb.watch import FileWatcher, InotifyBackend
+
+
+class ScriptedBackend:
+    def __init__(self, clock: list[float], events: dict[float, set[Path]]) -> None:
+        self.clock = clock
+        self.events = events
+
+    def set_paths(self, paths: set[Path]) -> set[Path]:
+        return set()
+
+    def read(self, timeout: float | None) -> set[Path]:
+        due = [at for at in self.events if at <= self.clock[0] + (timeout or 0)]
+        if due:
+            self.clock[0] = max(self.clock[0], min(due))
+            return self.events.pop(min(due))
+        self.clock[0] += timeout or 0
+        return set()
+
+    def close(self) -> None:
+        return None
+
+
+def test_watcher_debounces_bursts_and_waits_for_size_to_settle(tmp_path: Path) -> None:
+    path = tmp_path / "raw.csv"
+    path.write_text("a\n", encoding="utf-8")
+    clock = [0.0]
+    backend = ScriptedBackend(clock, {0.0: {path}, 1.0: {path}, 1.5: {path}})
+    watcher = FileWatcher(backend, debounce_seconds=2.0, settle_seconds=1.0, clock=lambda: clock[0])
+    watcher.set_paths([path])
+
+    assert watcher.wait(timeout=3.0) == set()
+    # Quiet since 1.5s; the first stat is taken at 3.5s, then the file grows before 4.5s.
+    assert watcher.wait(timeout=0.6) == set()
+    path.write_text("a\nb\n", encoding="utf-8")
+    assert watcher.wait(timeout=1.0) == set()
+    assert watcher.wait(timeout=1.5) == {path}
+    assert clock[0] == pytest.approx(5.5)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_reports_atomic_replace(tmp_path: Path) -> None:
+    path = tmp_path / "raw.csv"
+    path.write_text("a\n", encoding="utf-8")
+    watcher = FileWatcher(InotifyBackend(), debounce_seconds=0.05, settle_seconds=0.05)
+    watcher.set_paths([path])
+    try:
+        (tmp_path / "other.csv").write_text("x\n", encoding="utf-8")
+        assert watcher.wait(timeout=0.3) == set()
+        partial = tmp_path / "raw.csv.part"
+        partial.write_text("a\nb\n", encoding="utf-8")
+        os.replace(partial, path)
+        assert watcher.wait(timeout=2.0) == {path}
+    finally:
+        watcher.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_rearms_watch_on_recreated_directory(tmp_path: Path) -> None:
+    source_dir = tmp_path / "incoming"
+    path = source_dir / "raw.csv"
+    watcher = FileWatcher(InotifyBackend(), debounce_seconds=0.05, settle_seconds=0.05)
+    try:
+        assert watcher.set_paths([path]) == {path}
+        source_dir.mkdir()
+        assert watcher.set_paths([path]) == set()
+        path.write_text("a\n", encoding="utf-8")
+        assert watcher.wait(timeout=2.0) == {path}
+
+        shutil.rmtree(source_dir)
+        assert watcher.wait(timeout=0.3) == set()
+        source_dir.mkdir()
+        path.write_text("b\n", encoding="utf-8")
+        # The dropped watch is re-armed on the next wake-up and the file reported.
+        assert watcher.wait(timeout=2.0) == {path}
+        path.write_text("c\n", encoding="utf-8")
+        assert watcher.wait(timeout=2.0) == {path}
+    finally:
+        watcher.close()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from pipelines.worker import BuildWorkerPool
+
+from hdb.jobs import Job, enqueue_build, get_job, list_jobs
+
+
+def test_worker_pool_runs_queued_jobs_and_records_failures(tmp_path: Path) -> None:
+    queue_path = tmp_path / "queue.sqlite"
+
+    def build(job: Job) -> dict[str, str]:
+        if job.dataset_id == "broken":
+            raise RuntimeError("source down")
+        return {"dataset_id": job.dataset_id, "status": "built"}
+
+    pool = BuildWorkerPool(queue_path, workers=2, build=build, idle_seconds=5.0)
+    pool.start()
+    try:
+        ok, _ = enqueue_build(queue_path, "ds1")
+        broken, _ = enqueue_build(queue_path, "broken")
+        pool.wake()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            jobs = [get_job(queue_path, job.id) for job in (ok, broken)]
+            statuses = [job.status if job else None for job in jobs]
+            if statuses == ["succeeded", "failed"]:
+                break
+            time.sleep(0.02)
+    finally:
+        pool.stop(timeout=5)
+    assert statuses == ["succeeded", "failed"]
+    failed = get_job(queue_path, broken.id)
+    assert failed is not None and failed.error == "source down"
+
+
+def _node(queue_path: Path, log_path: Path, start: Any) -> None:
+    def build(job: Job) -> dict[str, str]:
+        with log_path.open("a", encoding="utf-8") as handle:
+            handle.write(f"{os.getpid()} {job.dataset_id}\n")
+        time.sleep(0.05)
+        return {"dataset_id": job.dataset_id, "status": "built"}
+
+    start.wait(10)
+    BuildWorkerPool(queue_path, build=build, lease_seconds=5.0).drain()
+
+
+def test_worker_processes_share_the_queue_without_double_claims(tmp_path: Path) -> None:
+    queue_path = tmp_path / "queue.sqlite"
+    log_path = tmp_path / "builds.log"
+    for index in range(12):
+        enqueue_build(queue_path, f"ds{index}")
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    nodes = [context.Process(target=_node, args=(queue_path, log_path, start)) for _ in range(3)]
+    for node in nodes:
+        node.start()
+    start.set()
+    for node in nodes:
+        node.join(30)
+    assert all(node.exitcode == 0 for node in nodes)
+
+    lines = [line.split() for line in log_path.read_text(encoding="utf-8").splitlines()]
+    assert sorted(dataset for _, dataset in lines) == sorted(f"ds{index}" for index in range(12))
+    assert len({pid for pid, _ in lines}) > 1
+    assert {job.status for job in list_jobs(queue_path)} == {"succeeded"}